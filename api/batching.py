@@ -0,0 +1,107 @@
+"""
+Dynamic Micro-Batching
+Groups CNN inputs from concurrent requests into a single forward pass
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class CNNBatcher:
+    """
+    Collects single CNN inputs from concurrent callers and runs them as one batch.
+
+    A background thread waits for the first input, then keeps gathering until
+    ``max_batch_size`` inputs are queued, as many inputs are queued as there
+    are active callers, or ``max_wait_ms`` has passed since the first one
+    arrived. Each caller gets back its own probability row.
+
+    Args:
+        max_batch_size: Maximum inputs per forward pass
+        max_wait_ms: Maximum time the first input waits for others
+        on_batch: Optional callback receiving each batch size (for metrics)
+        active_callers: Optional callable returning how many callers can
+            currently submit inputs (e.g. busy inference workers); the batch
+            runs as soon as all of them are queued
+    """
+
+    def __init__(self, max_batch_size=8, max_wait_ms=5.0, on_batch=None, active_callers=None):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.on_batch = on_batch
+        self.active_callers = active_callers
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="cnn-batcher", daemon=True)
+                self._thread.start()
+
+    def predict(self, model, cnn_input):
+        """
+        Queue one input and block until its prediction is ready.
+
+        Args:
+            model: CNN model to run the batch through (inputs are only
+                batched with others for the same model)
+            cnn_input: Single input without batch dim, e.g. (256, 256, 1)
+
+        Returns:
+            Probability row for this input
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((model, cnn_input, future))
+        return future.result()
+
+    def _batch_limit(self):
+        if self.active_callers is None:
+            return self.max_batch_size
+        return max(1, min(self.max_batch_size, self.active_callers()))
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self._batch_limit():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # Around a model reload, queued inputs can belong to different models
+            groups = {}
+            for item in batch:
+                groups.setdefault(id(item[0]), []).append(item)
+
+            for group in groups.values():
+                self._run_group(group)
+
+    def _run_group(self, group):
+        model = group[0][0]
+        try:
+            stacked = np.stack([item[1] for item in group])
+            proba = model.predict(stacked, verbose=0)
+            if self.on_batch is not None:
+                self.on_batch(len(group))
+            for i, (_, _, future) in enumerate(group):
+                future.set_result(proba[i])
+        except Exception as e:
+            for _, _, future in group:
+                future.set_exception(e)
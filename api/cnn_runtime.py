@@ -0,0 +1,141 @@
+"""
+CNN Runtimes
+One predict interface over Keras, TFLite and ONNX Runtime models
+"""
+import threading
+from pathlib import Path
+
+import numpy as np
+
+CNN_RUNTIMES = ("keras", "tflite", "onnx")
+
+CNN_MODEL_FILES = {
+    "keras": "coin_classifier_cnn_8class.keras",
+    "tflite": "coin_classifier_cnn_8class.tflite",
+    "onnx": "coin_classifier_cnn_8class.onnx",
+}
+
+
+class KerasRuntime:
+    """Keras model; small batches go through a direct call instead of predict()"""
+
+    name = "keras"
+
+    def __init__(self, path):
+        from tensorflow import keras
+
+        self.path = Path(path)
+        self._model = keras.models.load_model(self.path)
+
+    def predict(self, batch, verbose=0):
+        # model.predict() builds a data pipeline per call; a direct call is
+        # much cheaper for the handful of images a request carries
+        return np.asarray(self._model(batch, training=False))
+
+
+class TFLiteRuntime:
+    """
+    TFLite interpreter (LiteRT, tflite-runtime or TensorFlow, whichever is installed).
+
+    Quantized int8/uint8 inputs and outputs are (de)quantized with the
+    model's own scale and zero point, so callers always pass and get float32.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path, num_threads=None):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                from tensorflow.lite import Interpreter
+
+        self.path = Path(path)
+        self._interpreter = Interpreter(model_path=str(self.path), num_threads=num_threads)
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        # The interpreter is not thread-safe
+        self._lock = threading.Lock()
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self._interpreter.allocate_tensors()
+                self._input = self._interpreter.get_input_details()[0]
+                self._output = self._interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+            self._interpreter.set_tensor(self._input["index"], _quantize(batch, self._input))
+            self._interpreter.invoke()
+            output = self._interpreter.get_tensor(self._output["index"])
+        return _dequantize(output, self._output)
+
+
+class OnnxRuntime:
+    """ONNX Runtime CPU session"""
+
+    name = "onnx"
+
+    def __init__(self, path, num_threads=None):
+        import onnxruntime as ort
+
+        self.path = Path(path)
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self._session = ort.InferenceSession(
+            str(self.path), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+    def predict(self, batch, verbose=0):
+        batch = np.asarray(batch, dtype=np.float32)
+        return self._session.run(None, {self._input_name: batch})[0]
+
+
+RUNTIME_CLASSES = {"keras": KerasRuntime, "tflite": TFLiteRuntime, "onnx": OnnxRuntime}
+
+
+def _quantize(values, details):
+    dtype = details["dtype"]
+    if dtype == np.float32:
+        return values
+    scale, zero_point = details["quantization"]
+    info = np.iinfo(dtype)
+    return np.clip(np.round(values / scale + zero_point), info.min, info.max).astype(dtype)
+
+
+def _dequantize(values, details):
+    if values.dtype == np.float32:
+        return values
+    scale, zero_point = details["quantization"]
+    return (values.astype(np.float32) - zero_point) * scale
+
+
+def load_cnn_runtime(models_dir, runtime="keras", num_threads=None, filename=None):
+    """
+    Load the CNN with the selected runtime
+
+    Args:
+        models_dir: Directory with the model files
+        runtime: 'keras', 'tflite' or 'onnx'
+        num_threads: CPU threads for TFLite / ONNX Runtime (None = runtime default)
+        filename: Model file name (default: CNN_MODEL_FILES[runtime])
+
+    Returns:
+        Runtime object with predict(batch) -> probabilities, or None if the file is missing
+    """
+    if runtime not in RUNTIME_CLASSES:
+        raise ValueError(f"Unknown CNN runtime: {runtime}")
+
+    path = Path(models_dir) / (filename or CNN_MODEL_FILES[runtime])
+    if not path.exists():
+        return None
+    if runtime == "keras":
+        return KerasRuntime(path)
+    return RUNTIME_CLASSES[runtime](path, num_threads=num_threads)
@@ -0,0 +1,198 @@
+"""
+Bounded Inference Worker Pool
+Runs blocking prediction work off the asyncio event loop
+"""
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Seconds each warm-up job waits for the other workers to pick up theirs
+WARM_UP_TIMEOUT = 600
+
+# Started-job counter and warm-up barrier of this worker process, inherited
+# through the initializer (multiprocessing objects cannot be sent with a job)
+_process_state = {}
+
+
+class PoolSaturatedError(Exception):
+    """Raised when the pool queue is full and a request must be rejected"""
+
+    def __init__(self, retry_after):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceTimeoutError(Exception):
+    """Raised when a job does not finish within the per-request timeout"""
+
+
+class _JobCounter:
+    """Number of jobs that have started and not yet finished, for threads or processes"""
+
+    def __init__(self, value=None):
+        self._value = value
+        self._lock = threading.Lock()
+        self._count = 0
+
+    @property
+    def value(self):
+        return self._value.value if self._value is not None else self._count
+
+    def add(self, delta):
+        if self._value is not None:
+            with self._value.get_lock():
+                self._value.value += delta
+        else:
+            with self._lock:
+                self._count += delta
+
+
+def _init_process(initializer, started, barrier):
+    _process_state["started"] = _JobCounter(started)
+    _process_state["barrier"] = barrier
+    if initializer is not None:
+        initializer()
+
+
+def _run_counted(counter, fn, *args, **kwargs):
+    # counter is None in worker processes; theirs came with the initializer
+    counter = counter or _process_state["started"]
+    counter.add(1)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        counter.add(-1)
+
+
+def _warm_up_job(barrier, fn):
+    # A worker runs one job at a time, so max_workers jobs meeting at the
+    # barrier are running in max_workers different workers
+    (barrier or _process_state["barrier"]).wait(WARM_UP_TIMEOUT)
+    return fn()
+
+
+class InferencePool:
+    """
+    Executor wrapper with a bounded queue, backpressure and timeouts.
+
+    Jobs beyond ``max_workers + max_queue`` outstanding are rejected with
+    PoolSaturatedError instead of piling up. A timed-out job keeps its slot
+    until the worker actually finishes, so the bound reflects real load.
+
+    Args:
+        kind: 'thread' (default, OpenCV/TF release the GIL) or 'process'
+        max_workers: Number of concurrent inference workers
+        max_queue: Number of jobs allowed to wait for a free worker
+        timeout: Per-request timeout in seconds (None disables)
+        retry_after: Seconds suggested to clients when saturated
+        initializer: Called once in each worker process (process pools only),
+            e.g. to load the models
+    """
+
+    def __init__(self, kind="thread", max_workers=2, max_queue=8, timeout=30.0,
+                 retry_after=1, initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.retry_after = retry_after
+
+        if kind == "process":
+            context = multiprocessing.get_context()
+            started = context.Value("i", 0)
+            self._started = _JobCounter(started)
+            self._barrier = None
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=context, initializer=_init_process,
+                initargs=(initializer, started, context.Barrier(max_workers)),
+            )
+        else:
+            self._started = _JobCounter()
+            self._barrier = threading.Barrier(max_workers)
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        """Jobs currently running or waiting for a worker"""
+        return self._pending
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    @property
+    def in_flight(self):
+        """Jobs a worker has started and not yet finished"""
+        return self._started.value
+
+    def stats(self):
+        """Snapshot of pool state for health reporting"""
+        pending = self._pending
+        in_flight = min(self.in_flight, pending)
+        return {
+            "executor": self.kind,
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "pending": pending,
+            "in_flight": in_flight,
+            "queued": pending - in_flight,
+        }
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` in the pool and await its result.
+
+        Raises:
+            PoolSaturatedError: the queue is full
+            InferenceTimeoutError: the job exceeded the timeout
+        """
+        with self._lock:
+            if self._pending >= self.capacity:
+                raise PoolSaturatedError(self.retry_after)
+            self._pending += 1
+
+        try:
+            counter = self._started if self.kind == "thread" else None
+            future = self._executor.submit(_run_counted, counter, fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            raise
+        future.add_done_callback(self._release)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            # Only frees the slot if the job is still queued; a running job
+            # holds it until it completes.
+            future.cancel()
+            raise InferenceTimeoutError(f"Inference timed out after {self.timeout}s")
+
+    async def warm_up(self, fn):
+        """
+        Run ``fn()`` once in every worker, bypassing the queue bound and timeout.
+
+        Worker processes load their models in the initializer before they
+        take a job. The jobs wait at a barrier until every worker holds one,
+        so no worker runs two of them while another is still starting, and
+        this returns once all workers are ready.
+
+        Returns:
+            One result (or exception) per worker
+        """
+        futures = [asyncio.wrap_future(self._executor.submit(_warm_up_job, self._barrier, fn))
+                   for _ in range(self.max_workers)]
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -1,14 +1,36 @@
 """
 FastAPI Backend for Coin Classification
 """
+import asyncio
+import hmac
+import json
 import os
+import time
 from dotenv import load_dotenv
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Header, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 import uvicorn
+from functools import partial
 
-from .predictor import predict, load_models
+from .predictor import (
+    predict, predict_batch, predict_multi, predict_frame, configure_cnn_batching, init_worker,
+    configure_cnn_runtime, configure_image_decode, configure_image_limits, ImageTooLargeError,
+    reload_models, start_model_watcher,
+    parse_steps, STEP_FORMATS, preprocessing_settings,
+    get_model_version, get_model_info, load_model_info, add_model_listener,
+)
+from preprocessing import set_circle_detector, set_gradient_precision, set_percentile_mode
+from .step_store import StepStore
+from .tracking import CoinTracker
+from .streaming import FrameBuffer, StreamStats, compact_message, next_session_id
+from .result_cache import ResultCache, create_backend
+from .uploads import (
+    BodySizeLimitMiddleware, TooManyImagesError, UploadTooLargeError, collect_images, read_upload,
+)
+from .metrics import render_metrics, ERRORS, INFERENCE_QUEUED, INFERENCE_IN_FLIGHT, STREAM_DROPPED_FRAMES
+from .inference_pool import InferencePool, PoolSaturatedError, InferenceTimeoutError
 
 # Load environment variables
 load_dotenv()
@@ -19,7 +41,22 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS - allow React frontend
+# Upload limits: bytes per image / request body (batch requests may carry
+# several images or an archive), checked while the body streams in
+max_upload_bytes = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+batch_max_bytes = int(os.getenv("BATCH_MAX_BYTES", str(100 * 1024 * 1024)))
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=max_upload_bytes + 64 * 1024,  # multipart headers and boundaries
+    path_limits={"/predict/batch": batch_max_bytes},
+)
+
+# Decoded pixel limit (0 disables): larger JPEGs are downscaled at decode or rejected
+max_image_pixels = int(os.getenv("MAX_IMAGE_PIXELS", "50000000"))
+oversized_images = os.getenv("OVERSIZED_IMAGES", "downscale")
+configure_image_limits(max_image_pixels, oversized_images)
+
+# CORS - allow React frontend (added last so 413 responses carry CORS headers)
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://localhost:3000")
 allowed_origins = [origin.strip() for origin in cors_origins.split(",")]
 
@@ -31,13 +68,138 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Inference worker pool: thread or process workers (the pool is created below)
+inference_executor = os.getenv("INFERENCE_EXECUTOR", "thread")
+inference_workers = int(os.getenv("INFERENCE_WORKERS", "2"))
+
+# CNN micro-batching across concurrent requests (max size 1 disables). Each
+# worker has at most one input waiting, so batches are clamped to the worker
+# count; a process worker only ever has one, so process workers don't batch.
+cnn_batch_size = int(os.getenv("CNN_BATCH_MAX_SIZE", "8"))
+cnn_batch_wait_ms = float(os.getenv("CNN_BATCH_MAX_WAIT_MS", "5"))
+if inference_executor == "process":
+    cnn_batch_size = 1
+else:
+    cnn_batch_size = min(cnn_batch_size, inference_workers)
+
+# CNN runtime: keras, tflite or onnx (exported with export_cnn.py)
+cnn_runtime = os.getenv("CNN_RUNTIME", "keras")
+cnn_threads = int(os.getenv("CNN_THREADS", "0")) or None
+cnn_file = os.getenv("CNN_MODEL_FILE") or None
+configure_cnn_runtime(cnn_runtime, cnn_threads, cnn_file)
+
+# Sobel/feature gradient precision: float64 (exact) or float32 (faster, see feature_parity.py)
+gradient_precision = os.getenv("GRADIENT_PRECISION", "float64")
+set_gradient_precision(gradient_precision)
+
+# RF feature percentiles: exact (np.percentile) or approx (histogram-located exact selection)
+percentile_mode = os.getenv("PERCENTILE_MODE", "exact")
+set_percentile_mode(percentile_mode)
+
+# Coin circle detection: full (one full-resolution Hough) or pyramid (coarse-to-fine)
+circle_detector = os.getenv("CIRCLE_DETECTOR", "full")
+set_circle_detector(circle_detector)
+
+# Upload decoding: full or reduced (JPEGs decoded at 1/2-1/8 scale when downscaled anyway)
+image_decode = os.getenv("IMAGE_DECODE", "full")
+configure_image_decode(image_decode)
+
+# Hot model reload: poll the model files every N seconds (0 disables) and/or
+# POST /admin/reload-models with the X-Admin-Token header (unset disables)
+model_watch_interval = float(os.getenv("MODEL_WATCH_INTERVAL_S", "0"))
+admin_token = os.getenv("ADMIN_TOKEN") or None
+
+# Inference worker pool - keeps blocking prediction work off the event loop
+inference_pool = InferencePool(
+    kind=inference_executor,
+    max_workers=inference_workers,
+    max_queue=int(os.getenv("INFERENCE_QUEUE_SIZE", "8")),
+    timeout=float(os.getenv("INFERENCE_TIMEOUT_S", "30")),
+    retry_after=int(os.getenv("INFERENCE_RETRY_AFTER_S", "1")),
+    initializer=partial(
+        init_worker, cnn_batch_size, cnn_batch_wait_ms, gradient_precision, percentile_mode,
+        cnn_runtime=cnn_runtime, cnn_threads=cnn_threads, cnn_file=cnn_file,
+        model_watch_interval=model_watch_interval, circle_detector=circle_detector,
+        image_decode=image_decode, max_image_pixels=max_image_pixels,
+        oversized_images=oversized_images,
+    ),
+)
+
+# A batch runs as soon as every busy worker has queued its input
+configure_cnn_batching(cnn_batch_size, cnn_batch_wait_ms,
+                       active_callers=lambda: inference_pool.stats()["in_flight"])
+
+# Inference queue depth and running jobs on /metrics
+INFERENCE_QUEUED.set_function(lambda: inference_pool.stats()["queued"])
+INFERENCE_IN_FLIGHT.set_function(lambda: inference_pool.stats()["in_flight"])
+
+# Step images returned by reference (step_delivery=ref)
+step_store = StepStore(
+    ttl=float(os.getenv("STEP_CACHE_TTL_S", "60")),
+    max_entries=int(os.getenv("STEP_CACHE_MAX_ENTRIES", "64")),
+)
+
+# Maximum images per /predict/batch request (after archive expansion)
+batch_max_images = int(os.getenv("BATCH_MAX_IMAGES", "64"))
+
+# Multi-coin detection (/predict/multi)
+multi_detect_size = int(os.getenv("MULTI_DETECT_SIZE", "1024"))
+multi_max_coins = int(os.getenv("MULTI_MAX_COINS", "50"))
+
+# Camera streams (/ws/stream): circle search window and prediction reuse per session
+stream_tracker_options = {
+    "search_margin": float(os.getenv("STREAM_SEARCH_MARGIN", "0.5")),
+    "change_threshold": float(os.getenv("STREAM_CHANGE_THRESHOLD", "1.5")),
+    "max_reuse_frames": int(os.getenv("STREAM_MAX_REUSE_FRAMES", "30")),
+    "jitter_tolerance": int(os.getenv("STREAM_CIRCLE_JITTER_PX", "2")),
+}
+# Frames waiting per connection before the oldest is dropped, and frames in the stats window
+stream_max_pending = int(os.getenv("STREAM_MAX_PENDING_FRAMES", "1"))
+stream_stats_window = int(os.getenv("STREAM_STATS_WINDOW", "100"))
+
+# Open /ws/stream connections: session id -> {"client", "stats"}
+stream_sessions = {}
+
+# Content-addressed cache of prediction results for byte-identical images
+result_cache = ResultCache(create_backend(
+    kind=os.getenv("RESULT_CACHE_BACKEND", "memory"),
+    max_entries=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "256")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL_S", "300")),
+    redis_url=os.getenv("RESULT_CACHE_REDIS_URL"),
+))
+add_model_listener(result_cache.clear)
+
+# Model status reported by each worker after startup warmup (see /ready)
+worker_model_info = []
+
+
+async def warm_up_models():
+    """Load and warm up the models in every inference worker"""
+    global worker_model_info
+    
+    print("Loading models...")
+    # Process workers load their own copy through the pool initializer
+    results = await inference_pool.warm_up(load_model_info)
+    worker_model_info = [
+        {"ready": False, "error": str(result)} if isinstance(result, Exception) else result
+        for result in results
+    ]
+    print("Models loaded!" if all(info["ready"] for info in worker_model_info) else "✗ Models not ready")
+    
+    if inference_pool.kind == "thread" and model_watch_interval > 0:
+        start_model_watcher(model_watch_interval)
+
 
 @app.on_event("startup")
 async def startup_event():
-    """Load models on startup"""
-    print("Loading models...")
-    load_models()
-    print("Models loaded!")
+    """Load and warm up models in the background; /ready reports when done"""
+    app.state.warmup_task = asyncio.create_task(warm_up_models())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop inference workers"""
+    inference_pool.shutdown()
 
 
 @app.get("/")
@@ -49,16 +211,89 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check for deployment"""
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "model_version": get_model_version(),
+        "models": get_model_info(),
+        "inference": inference_pool.stats(),
+        "result_cache": result_cache.stats(),
+    }
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness for traffic: models loaded and warmed up
+    
+    Returns 200 when ready, 503 otherwise, with per-model load/warmup status
+    and load times (per worker process for INFERENCE_EXECUTOR=process).
+    """
+    if inference_pool.kind == "thread":
+        # Threads share the current models, which may have been reloaded since startup
+        body = get_model_info() if worker_model_info else {"ready": False, "models": {}}
+    else:
+        ready = bool(worker_model_info) and all(info["ready"] for info in worker_model_info)
+        body = {"ready": ready, "workers": worker_model_info}
+    
+    return JSONResponse(status_code=200 if body["ready"] else 503, content=body)
+
+
+@app.post("/admin/reload-models")
+async def reload_models_endpoint(
+    force: bool = Query(False, description="Reload even if the model files are unchanged"),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Load the model files again and swap them in without a restart
+    
+    The new models are loaded and warmed up in a background thread while
+    requests keep being served; requests already running finish on the
+    previous models.
+    
+    Returns:
+    - previous_version / model_version: model versions before and after
+    - reloaded: false when the model files are unchanged
+    """
+    if admin_token is None:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (set ADMIN_TOKEN)")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    if inference_pool.kind != "thread":
+        raise HTTPException(
+            status_code=409,
+            detail="Worker processes hold their own models; use MODEL_WATCH_INTERVAL_S to reload them",
+        )
+    
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, reload_models, force)
+    except RuntimeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics"""
+    return render_metrics()
 
 
 @app.post("/predict")
-async def predict_coin(file: UploadFile = File(...)):
+async def predict_coin(
+    file: UploadFile = File(...),
+    steps: Optional[str] = Query(None, description="'all' (default), 'none' or comma-separated step names"),
+    step_format: str = Query("png", description="png, jpeg or webp"),
+    step_quality: int = Query(85, ge=1, le=100, description="JPEG/WebP quality"),
+    step_delivery: str = Query("inline", description="'inline' (base64) or 'ref' (fetch via GET)"),
+    x_preprocessing_steps: Optional[str] = Header(None),
+):
     """
     Predict coin class from uploaded image
     
+    Step images are selected with the `steps` query parameter or the
+    `X-Preprocessing-Steps` header. `steps=none` skips image encoding entirely.
+    
     Returns:
-    - preprocessing_steps: images of each preprocessing step (base64)
+    - preprocessing_steps: images of the requested preprocessing steps (base64)
+    - preprocessing_steps_ref: step image URLs instead, when step_delivery=ref
     - predictions: results from CNN and Random Forest models
     - circle_detected: whether a coin circle was detected
     """
@@ -67,15 +302,328 @@ async def predict_coin(file: UploadFile = File(...)):
         raise HTTPException(status_code=400, detail="File must be an image")
     
     try:
+        selected_steps = parse_steps(steps if steps is not None else x_preprocessing_steps)
+        step_format = step_format.upper()
+        if step_format not in STEP_FORMATS:
+            raise ValueError(f"step_format must be one of: {', '.join(STEP_FORMATS).lower()}")
+        if step_delivery not in ("inline", "ref"):
+            raise ValueError("step_delivery must be 'inline' or 'ref'")
+        by_reference = step_delivery == "ref"
+        
         # Read image bytes
-        image_bytes = await file.read()
+        image_bytes = await read_upload(file, max_upload_bytes)
+        
+        # Inline results are cacheable; by-reference ones hold per-request step ids
+        cache_key = None
+        if not by_reference:
+            cache_key = result_cache.make_key(
+                image_bytes, "predict", get_model_version(), preprocessing_settings(),
+                selected_steps, step_format, step_quality,
+            )
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return cached
         
-        # Run prediction
-        result = predict(image_bytes)
+        # Run prediction in the inference pool (raw arrays when returned by reference)
+        result = await inference_pool.run(
+            predict, image_bytes, selected_steps,
+            None if by_reference else step_format, step_quality,
+        )
+        
+        if cache_key is not None:
+            result_cache.set(cache_key, result)
+        
+        if by_reference:
+            step_images = result.pop("preprocessing_steps")
+            steps_id = step_store.put(step_images, step_format, step_quality)
+            result["preprocessing_steps_ref"] = {
+                "id": steps_id,
+                "expires_in_s": step_store.ttl,
+                "steps": {name: f"/predict/steps/{steps_id}/{name}" for name in step_images},
+            }
         
         return result
     
+    except PoolSaturatedError as e:
+        ERRORS.labels(type="saturated").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, try again later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except InferenceTimeoutError as e:
+        ERRORS.labels(type="timeout").inc()
+        raise HTTPException(status_code=504, detail=str(e))
+    except (UploadTooLargeError, ImageTooLargeError) as e:
+        ERRORS.labels(type="too_large").inc()
+        raise HTTPException(status_code=413, detail=str(e))
     except ValueError as e:
+        ERRORS.labels(type="invalid_request").inc()
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        ERRORS.labels(type="internal").inc()
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+
+@app.post("/predict/batch")
+async def predict_coin_batch(
+    files: List[UploadFile] = File(...),
+    steps: Optional[str] = Query("none", description="'none' (default), 'all' or comma-separated step names"),
+    step_format: str = Query("png", description="png, jpeg or webp"),
+    step_quality: int = Query(85, ge=1, le=100, description="JPEG/WebP quality"),
+):
+    """
+    Predict many coin images in one request
+    
+    Accepts several image files and/or zip/tar archives of images. Images are
+    preprocessed in parallel and each model runs once on the whole batch.
+    
+    Returns:
+    - results: one entry per image in input order, with predictions or an error
+    """
+    try:
+        selected_steps = parse_steps(steps)
+        step_format = step_format.upper()
+        if step_format not in STEP_FORMATS:
+            raise ValueError(f"step_format must be one of: {', '.join(STEP_FORMATS).lower()}")
+        
+        # Count and size limits are checked before archives are decompressed
+        images = await collect_images(
+            files, max_upload_bytes, max_images=batch_max_images, max_total_bytes=batch_max_bytes,
+        )
+        if not images:
+            raise ValueError("No images found in upload")
+        
+        batch_result = await inference_pool.run(
+            predict_batch, images, selected_steps, step_format, step_quality
+        )
+        
+        return {"count": len(batch_result["results"]), **batch_result}
+    
+    except HTTPException:
+        raise
+    except PoolSaturatedError as e:
+        ERRORS.labels(type="saturated").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, try again later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except InferenceTimeoutError as e:
+        ERRORS.labels(type="timeout").inc()
+        raise HTTPException(status_code=504, detail=str(e))
+    except (UploadTooLargeError, TooManyImagesError, ImageTooLargeError) as e:
+        ERRORS.labels(type="too_large").inc()
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        ERRORS.labels(type="invalid_request").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        ERRORS.labels(type="internal").inc()
+        raise HTTPException(status_code=500, detail=f"Batch prediction failed: {str(e)}")
+
+
+@app.post("/predict/multi")
+async def predict_coins_multi(file: UploadFile = File(...)):
+    """
+    Detect and classify every coin in one image
+    
+    Returns:
+    - coins: bounding circle plus label, confidence and value per model for each coin
+    - total_value: summed rupiah value per model
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="File must be an image")
+    
+    try:
+        image_bytes = await read_upload(file, max_upload_bytes)
+        
+        cache_key = result_cache.make_key(
+            image_bytes, "multi", get_model_version(), preprocessing_settings(),
+            multi_detect_size, multi_max_coins,
+        )
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        result = await inference_pool.run(
+            predict_multi, image_bytes, multi_detect_size, multi_max_coins
+        )
+        result_cache.set(cache_key, result)
+        
+        return result
+    
+    except PoolSaturatedError as e:
+        ERRORS.labels(type="saturated").inc()
+        raise HTTPException(
+            status_code=503,
+            detail="Server busy, try again later",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except InferenceTimeoutError as e:
+        ERRORS.labels(type="timeout").inc()
+        raise HTTPException(status_code=504, detail=str(e))
+    except (UploadTooLargeError, ImageTooLargeError) as e:
+        ERRORS.labels(type="too_large").inc()
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        ERRORS.labels(type="invalid_request").inc()
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        ERRORS.labels(type="internal").inc()
+        raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+
+
+@app.websocket("/ws/stream")
+async def stream_predict(
+    websocket: WebSocket,
+    format: str = Query("compact", description="'compact' (label/confidence/circle) or 'full'"),
+):
+    """
+    Live camera prediction session
+    
+    The client sends encoded frames (JPEG/PNG/WebP) as binary messages and gets
+    one JSON message per processed frame. When frames arrive faster than they
+    are processed, the oldest waiting frames are dropped. The coin circle is
+    tracked across frames and the last prediction is reused while the coin
+    barely changes (`reused`).
+    
+    Text commands: `{"type": "reset"}` forgets the tracked coin,
+    `{"type": "stats"}` returns the connection's frame rate, latency and
+    tracking counters.
+    """
+    if format not in ("compact", "full"):
+        await websocket.close(code=1008, reason="format must be 'compact' or 'full'")
+        return
+    
+    await websocket.accept()
+    session_id = next_session_id()
+    stats = StreamStats(stream_stats_window)
+    stream_sessions[session_id] = {"client": websocket.client.host if websocket.client else None, "stats": stats}
+    frames = FrameBuffer(stream_max_pending)
+    send_lock = asyncio.Lock()
+    reset_requested = False
+    
+    async def send(message):
+        async with send_lock:
+            await websocket.send_json(message)
+    
+    async def receive_frames():
+        nonlocal reset_requested
+        frame_id = 0
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                
+                if message.get("bytes") is not None:
+                    frame_id += 1
+                    stats.frame_received()
+                    if len(message["bytes"]) > max_upload_bytes:
+                        ERRORS.labels(type="too_large").inc()
+                        stats.frame_failed()
+                        await send({"type": "error", "frame": frame_id,
+                                    "error": str(UploadTooLargeError(max_upload_bytes, "Frame"))})
+                        continue
+                    dropped = frames.put((frame_id, message["bytes"], time.monotonic()))
+                    if dropped:
+                        stats.frames_dropped(dropped)
+                        STREAM_DROPPED_FRAMES.inc(dropped)
+                    continue
+                
+                try:
+                    command = json.loads(message["text"]).get("type")
+                except (ValueError, AttributeError):
+                    command = None
+                if command == "reset":
+                    # Applied between frames; a frame in flight still uses the tracker
+                    reset_requested = True
+                    await send({"type": "reset"})
+                elif command == "stats":
+                    await send({"type": "stats", "session": session_id, **stats.snapshot()})
+                else:
+                    await send({"type": "error", "error": "Unknown command"})
+        finally:
+            frames.close()
+    
+    receiver = asyncio.create_task(receive_frames())
+    tracker = CoinTracker(**stream_tracker_options)
+    
+    try:
+        while (item := await frames.get()) is not None:
+            frame_id, image_bytes, received_at = item
+            if reset_requested:
+                tracker.reset()
+                reset_requested = False
+            
+            try:
+                result, tracker = await inference_pool.run(predict_frame, image_bytes, tracker)
+            except PoolSaturatedError as e:
+                ERRORS.labels(type="saturated").inc()
+                stats.frame_failed()
+                await send({
+                    "type": "error", "frame": frame_id,
+                    "error": "Server busy, try again later", "retry_after": e.retry_after,
+                })
+                continue
+            except InferenceTimeoutError as e:
+                ERRORS.labels(type="timeout").inc()
+                stats.frame_failed()
+                # The timed-out job may still update the old tracker; keep its counters
+                counts = dict(tracker.counts)
+                tracker = CoinTracker(**stream_tracker_options)
+                tracker.counts = counts
+                await send({"type": "error", "frame": frame_id, "error": str(e)})
+                continue
+            except ImageTooLargeError as e:
+                ERRORS.labels(type="too_large").inc()
+                stats.frame_failed()
+                await send({"type": "error", "frame": frame_id, "error": str(e)})
+                continue
+            except ValueError as e:
+                ERRORS.labels(type="invalid_request").inc()
+                stats.frame_failed()
+                await send({"type": "error", "frame": frame_id, "error": str(e)})
+                continue
+            except Exception as e:
+                ERRORS.labels(type="internal").inc()
+                stats.frame_failed()
+                await send({"type": "error", "frame": frame_id, "error": f"Prediction failed: {str(e)}"})
+                continue
+            
+            latency = time.monotonic() - received_at
+            stats.frame_done(latency, result["reused"], tracker.counts)
+            if format == "compact":
+                await send(compact_message(frame_id, result, latency))
+            else:
+                await send({"type": "prediction", "frame": frame_id, **result,
+                            "latency_ms": round(latency * 1000, 1)})
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away while a result was being sent
+        pass
+    finally:
+        receiver.cancel()
+        stream_sessions.pop(session_id, None)
+
+
+@app.get("/stream/sessions")
+async def stream_session_stats():
+    """Frame rate, latency, frame and tracking counters of the open /ws/stream connections"""
+    return {
+        "sessions": [
+            {"id": session_id, "client": session["client"], **session["stats"].snapshot()}
+            for session_id, session in stream_sessions.items()
+        ]
+    }
+
+
+@app.get("/predict/steps/{steps_id}/{step}")
+async def get_step_image(steps_id: str, step: str):
+    """Fetch a preprocessing step image returned by reference"""
+    found = step_store.get(steps_id, step)
+    if found is None:
+        raise HTTPException(status_code=404, detail="Step image not found or expired")
+    
+    content, media_type = found
+    return Response(content=content, media_type=media_type)
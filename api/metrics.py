@@ -0,0 +1,240 @@
+"""
+Prometheus-style Metrics
+Minimal in-process metric types rendered in the Prometheus text format
+"""
+import threading
+from abc import ABC, abstractmethod
+
+
+class _Metric(ABC):
+    """
+    Shared name/label handling and rendering
+
+    A metric declared with ``labelnames`` is a family: ``labels(...)`` returns
+    the child for one combination of label values, created on first use.
+    Each metric type implements ``_child`` (a new child with the same
+    definition) and ``_samples`` (its sample lines).
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), labelvalues=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._labelvalues = labelvalues
+        self._children = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def _child(self, labelvalues):
+        """New metric of the same type and definition for one set of label values"""
+
+    def labels(self, *values, **kwargs):
+        """Child metric for the given label values (positional or by name)"""
+        if kwargs:
+            values = tuple(kwargs[name] for name in self.labelnames)
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        with self._lock:
+            child = self._children.get(values)
+            if child is None:
+                child = self._children[values] = self._child(values)
+        return child
+
+    def _label_string(self, extra=None):
+        pairs = list(zip(self.labelnames, self._labelvalues or ()))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+    @abstractmethod
+    def _samples(self):
+        """Prometheus text lines of this metric (one child for families)"""
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        if self.labelnames:
+            with self._lock:
+                children = sorted(self._children.items())
+            for _, child in children:
+                lines.extend(child._samples())
+        else:
+            lines.extend(self._samples())
+        return lines
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed upper bounds"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labelnames=(), labelvalues=None):
+        super().__init__(name, documentation, labelnames, labelvalues)
+        self.buckets = sorted(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+
+    def _child(self, labelvalues):
+        return Histogram(self.name, self.documentation, self.buckets, self.labelnames, labelvalues)
+
+    def observe(self, value):
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+            self._sum += value
+            self._count += 1
+
+    def _samples(self):
+        with self._lock:
+            lines = []
+            for bound, count in zip(self.buckets, self._counts):
+                labels = self._label_string(("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f'{self.name}_bucket{self._label_string(("le", "+Inf"))} {self._count}')
+            lines.append(f"{self.name}_sum{self._label_string()} {_format_value(self._sum)}")
+            lines.append(f"{self.name}_count{self._label_string()} {self._count}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), labelvalues=None):
+        super().__init__(name, documentation, labelnames, labelvalues)
+        self._value = 0
+
+    def _child(self, labelvalues):
+        return Counter(self.name, self.documentation, self.labelnames, labelvalues)
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self):
+        return self._value
+
+    def _samples(self):
+        return [f"{self.name}{self._label_string()} {self._value}"]
+
+
+class Gauge(_Metric):
+    """Current value, either set directly or read from a function at render time"""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), labelvalues=None):
+        super().__init__(name, documentation, labelnames, labelvalues)
+        self._value = 0
+        self._function = None
+
+    def _child(self, labelvalues):
+        return Gauge(self.name, self.documentation, self.labelnames, labelvalues)
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        """Report function() instead of the set value"""
+        self._function = function
+
+    @property
+    def value(self):
+        return self._function() if self._function is not None else self._value
+
+    def _samples(self):
+        return [f"{self.name}{self._label_string()} {_format_value(self.value)}"]
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Pipeline stages timed by the predictor (see predictor.add_stage_hook)
+STAGES = ("decode", "resize", "clahe", "sobel", "hough", "crop", "features", "cnn", "rf", "encode")
+
+CNN_BATCH_SIZE = Histogram(
+    "coin_cnn_batch_size",
+    "Number of images per CNN forward pass",
+    buckets=[1, 2, 4, 8, 16, 32, 64],
+)
+
+STAGE_DURATION = Histogram(
+    "coin_stage_duration_seconds",
+    "Time spent in each prediction pipeline stage",
+    buckets=[0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5],
+    labelnames=("stage",),
+)
+
+CIRCLE_DETECTIONS = Counter(
+    "coin_circle_detections_total",
+    "Preprocessed images by whether a coin circle was detected",
+    labelnames=("result",),
+)
+
+ERRORS = Counter(
+    "coin_errors_total",
+    "Failed requests, images and model calls by error type",
+    labelnames=("type",),
+)
+
+INFERENCE_QUEUED = Gauge(
+    "coin_inference_queued",
+    "Inference jobs waiting for a free worker",
+)
+
+INFERENCE_IN_FLIGHT = Gauge(
+    "coin_inference_in_flight",
+    "Inference jobs currently running",
+)
+
+STREAM_FRAMES = Counter(
+    "coin_stream_frames_total",
+    "Camera stream frames by whether they were classified or reused the last prediction",
+    labelnames=("classification",),
+)
+
+STREAM_DROPPED_FRAMES = Counter(
+    "coin_stream_dropped_frames_total",
+    "Camera stream frames dropped because newer frames arrived before they were processed",
+)
+
+RESULT_CACHE_HITS = Counter(
+    "coin_result_cache_hits_total",
+    "Prediction results served from the result cache",
+)
+
+RESULT_CACHE_MISSES = Counter(
+    "coin_result_cache_misses_total",
+    "Prediction results not found in the result cache",
+)
+
+REGISTRY = [
+    CNN_BATCH_SIZE, STAGE_DURATION, CIRCLE_DETECTIONS, ERRORS,
+    INFERENCE_QUEUED, INFERENCE_IN_FLIGHT, STREAM_FRAMES, STREAM_DROPPED_FRAMES,
+    RESULT_CACHE_HITS, RESULT_CACHE_MISSES,
+]
+
+
+def observe_stage(stage, seconds):
+    """Stage hook recording a pipeline stage duration"""
+    STAGE_DURATION.labels(stage=stage).observe(seconds)
+
+
+def render_metrics():
+    """Render all registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,56 @@
+"""
+Model File Watcher
+Reloads the models in the background when the model files change
+"""
+import threading
+
+
+class ModelWatcher:
+    """
+    Polls a fingerprint of the model files and calls ``on_change`` when it changes.
+
+    Copying a large model takes a while, so a new fingerprint is only acted on
+    once it has been the same for two consecutive polls. A failed reload is
+    not retried until the files change again.
+
+    Args:
+        fingerprint: Callable returning the current model files fingerprint
+        on_change: Called in the watcher thread once a new fingerprint is stable
+        interval: Seconds between polls
+    """
+
+    def __init__(self, fingerprint, on_change, interval=10.0):
+        self.fingerprint = fingerprint
+        self.on_change = on_change
+        self.interval = interval
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        last = self.fingerprint()
+        pending = None
+
+        while not self._stop.wait(self.interval):
+            try:
+                current = self.fingerprint()
+                if current == last:
+                    pending = None
+                    continue
+                if current != pending:
+                    # Changed since the last poll; wait until the files settle
+                    pending = current
+                    continue
+
+                last, pending = current, None
+                self.on_change()
+            except Exception as e:
+                print(f"✗ Model reload failed: {e}")
@@ -2,8 +2,14 @@
 Coin Prediction Module
 Loads models and handles preprocessing + prediction
 """
+import os
 import sys
+import time
 import base64
+import hashlib
+import threading
+import warnings
+from contextlib import contextmanager
 from pathlib import Path
 from io import BytesIO
 import numpy as np
@@ -12,13 +18,117 @@ from PIL import Image
 
 # Add parent directory to path for importing preprocessing
 sys.path.insert(0, str(Path(__file__).parent.parent))
-from preprocessing import crop_coin_to_circle
+from preprocessing import (
+    ImageGradients,
+    crop_coin_to_circle,
+    detect_coin_circle,
+    detect_coins,
+    extract_coin_features,
+    get_circle_detector,
+    get_gradient_precision,
+    get_percentile_mode,
+    resize_with_aspect_ratio,
+    segment_coin,
+    set_circle_detector,
+    set_gradient_precision,
+    set_percentile_mode,
+)
+from compiled_forest import CompiledForest
+from model_bundle import BundleError, load_bundle
 
-# Lazy load models (loaded on first prediction)
-_cnn_model = None
-_rf_model = None
-_rf_scaler = None
-_class_names = None
+from .batching import CNNBatcher
+from .model_watcher import ModelWatcher
+from .cnn_runtime import CNN_MODEL_FILES, load_cnn_runtime
+from . import metrics
+
+MODELS_DIR = Path(__file__).parent.parent / "models"
+# RF model bundle directory (see model_bundle.py); preferred over the pickles
+RF_BUNDLE = "coin_classifier_8class_rf"
+RF_FEATURE_SCHEMA = {"pipeline": "api", "n_features": 35}
+
+MODEL_FILES = (
+    *CNN_MODEL_FILES.values(),
+    f"{RF_BUNDLE}/manifest.json",
+    "coin_classifier_8class_model.pkl",
+    "coin_classifier_8class_scaler.pkl",
+)
+
+# Fixed parameters that change preprocessing output; preprocessing_settings()
+# adds the configurable ones (result cache keys)
+PREPROCESSING_PARAMS = {
+    "image_size": (256, 256),
+    "clahe": {"clip_limit": 2.0, "tile_grid_size": (8, 8)},
+    "hough": {"dp": 1, "min_dist": 50, "param1": 100, "param2": 30, "min_radius": 20},
+}
+
+# Lazy load models (loaded on first prediction). The current ModelSet is
+# replaced as a whole on reload; requests keep the set they started with.
+_models = None
+_models_lock = threading.Lock()  # first load and swaps
+_reload_lock = threading.Lock()  # one reload at a time
+
+# Callbacks notified when the loaded model version changes
+_model_listeners = []
+
+# CNN micro-batcher (None = one forward pass per request)
+_cnn_batcher = None
+
+# CNN runtime used by load_models (see configure_cnn_runtime)
+_cnn_runtime = "keras"
+_cnn_threads = None
+_cnn_filename = None
+
+# Upload decoding: 'full' decodes at full resolution; 'reduced' lets libjpeg
+# decode JPEGs at 1/2, 1/4 or 1/8 scale when the pipeline downscales anyway
+IMAGE_DECODE_MODES = ("full", "reduced")
+_image_decode = "full"
+
+# libjpeg DCT scaling factors and the matching imdecode flags, largest first
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# EXIF orientations that rotate the image by 90 degrees (width and height swap)
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Decoded pixel limit (None disables), checked on the header before decoding.
+# Larger JPEGs are decoded at reduced scale ('downscale') or rejected ('reject').
+OVERSIZED_IMAGE_POLICIES = ("downscale", "reject")
+_max_image_pixels = None
+_oversized_images = "downscale"
+
+# Shared thread pool for preprocessing images of a batch request
+_preprocess_executor = None
+
+# Callbacks receiving (stage, seconds) for each timed pipeline stage (see metrics.STAGES)
+_stage_hooks = [metrics.observe_stage]
+_stage_local = threading.local()  # .suspended: skip hooks (warmup)
+
+# Preprocessing step images that can be returned, in pipeline order
+STEP_NAMES = ("original", "resized", "clahe", "sobel", "hough_circle", "cropped", "edge_final")
+STEP_FORMATS = ("PNG", "JPEG", "WEBP")
+
+
+def add_stage_hook(callback):
+    """Register callback(stage, seconds) called after every timed pipeline stage"""
+    _stage_hooks.append(callback)
+
+
+@contextmanager
+def _timed(stage):
+    """Time a pipeline stage and report it to the stage hooks (not when it raises)"""
+    start_time = time.perf_counter()
+    yield
+    if not getattr(_stage_local, "suspended", False):
+        elapsed = time.perf_counter() - start_time
+        for callback in _stage_hooks:
+            callback(stage, elapsed)
+
+
+class ImageTooLargeError(ValueError):
+    """Raised when an image exceeds the decoded pixel limit"""
 
 
 def get_class_names():
@@ -35,27 +145,151 @@ def get_class_names():
     ]
 
 
-def load_models():
-    """Load CNN and Random Forest models"""
-    global _cnn_model, _rf_model, _rf_scaler, _class_names
+def get_coin_value(label):
+    """Rupiah value of a class label, e.g. 'Koin Rp 1000 - angka' -> 1000"""
+    return int(label.split("Rp ")[1].split(" ")[0])
+
+
+def model_files_fingerprint(models_dir=None):
+    """Short hash of model file names, sizes and modification times, and the CNN runtime"""
+    models_dir = models_dir or MODELS_DIR
+    digest = hashlib.sha1()
+    cnn_file = _cnn_filename or CNN_MODEL_FILES[_cnn_runtime]
+    digest.update(f"cnn={_cnn_runtime}:{cnn_file};".encode())
+    for name in dict.fromkeys((*MODEL_FILES, cnn_file)):
+        path = Path(models_dir) / name
+        if path.exists():
+            stat = path.stat()
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()[:12]
+
+
+class ModelSet:
+    """
+    One loaded version of the CNN and Random Forest
     
-    models_dir = Path(__file__).parent.parent / "models"
+    Args:
+        version: Model files fingerprint the set was loaded from
+        cnn: CNN runtime (see cnn_runtime.py), or None
+        rf_forest: Scaler + RF compiled into one array-backed object, or None
+        rf_model, rf_scaler: Pickled scikit-learn fallback, or None
+    """
+    
+    def __init__(self, version, cnn=None, rf_forest=None, rf_model=None, rf_scaler=None):
+        self.version = version
+        self.cnn = cnn
+        self.rf_forest = rf_forest
+        self.rf_model = rf_model
+        self.rf_scaler = rf_scaler
+        self.class_names = get_class_names()
+        self.loaded_at = time.time()
+        # Per-model load / warmup status, reported by /ready
+        self.status = {
+            name: {"loaded": False, "load_time_ms": None, "warmed_up": False,
+                   "warmup_time_ms": None, "error": None}
+            for name in ("cnn", "random_forest")
+        }
+    
+    @property
+    def rf_available(self):
+        """Whether the Random Forest can predict (bundle, compiled or pickled model)"""
+        return self.rf_forest is not None or (self.rf_model is not None and self.rf_scaler is not None)
+    
+    def loaded(self):
+        """Names of the models in this set"""
+        names = []
+        if self.cnn is not None:
+            names.append("cnn")
+        if self.rf_available:
+            names.append("random_forest")
+        return names
+    
+    @property
+    def ready(self):
+        """Whether at least one model is loaded and every loaded model is warmed up"""
+        loaded = [status for status in self.status.values() if status["loaded"]]
+        return bool(loaded) and all(status["warmed_up"] for status in loaded)
+
+
+def get_model_version():
+    """Version of the loaded models (or of the model files, before loading)"""
+    models = _models
+    return models.version if models is not None else model_files_fingerprint()
+
+
+def preprocessing_settings():
+    """PREPROCESSING_PARAMS plus the active decode and feature settings that change results"""
+    return {
+        **PREPROCESSING_PARAMS,
+        "image_decode": _image_decode,
+        "max_image_pixels": _max_image_pixels,
+        "oversized_images": _oversized_images,
+        "gradient_precision": get_gradient_precision(),
+        "percentile_mode": get_percentile_mode(),
+        "circle_detector": get_circle_detector(),
+    }
+
+
+def get_model_info():
+    """Version, load time, readiness and per-model status of the currently served models"""
+    models = _models
+    if models is None:
+        return {"version": model_files_fingerprint(), "loaded_at": None, "ready": False, "models": {}}
+    return {
+        "version": models.version,
+        "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(models.loaded_at)),
+        "ready": models.ready,
+        "models": models.status,
+    }
+
+
+def load_model_info():
+    """Load (and warm up) the models if needed, then return get_model_info()"""
+    get_models()
+    return get_model_info()
+
+
+def add_model_listener(callback):
+    """Register callback(version) called whenever a new model version is loaded"""
+    _model_listeners.append(callback)
+
+
+def _load_model_set(models_dir):
+    """Load CNN and Random Forest models from disk into a new ModelSet"""
+    # Fingerprint first: files replaced while loading show up as a new version
+    models = ModelSet(model_files_fingerprint(models_dir))
+    cnn_status, rf_status = models.status["cnn"], models.status["random_forest"]
     
     # Load CNN model
-    if _cnn_model is None:
+    start_time = time.time()
+    try:
+        models.cnn = load_cnn_runtime(models_dir, _cnn_runtime, _cnn_threads, _cnn_filename)
+        if models.cnn is not None:
+            print(f"✓ CNN model loaded from {models.cnn.path} ({_cnn_runtime})")
+        else:
+            cnn_file = _cnn_filename or CNN_MODEL_FILES[_cnn_runtime]
+            cnn_status["error"] = f"{cnn_file} not found"
+            print(f"✗ CNN model not found at {models_dir / cnn_file}")
+    except Exception as e:
+        cnn_status["error"] = str(e)
+        print(f"✗ Error loading CNN model: {e}")
+    cnn_status.update(loaded=models.cnn is not None, load_time_ms=round((time.time() - start_time) * 1000, 2))
+    
+    # Load Random Forest bundle (memory-mapped, checksummed, no pickle)
+    start_time = time.time()
+    bundle_dir = models_dir / RF_BUNDLE
+    if bundle_dir.exists():
         try:
-            from tensorflow import keras
-            cnn_path = models_dir / "coin_classifier_cnn_8class.keras"
-            if cnn_path.exists():
-                _cnn_model = keras.models.load_model(cnn_path)
-                print(f"✓ CNN model loaded from {cnn_path}")
-            else:
-                print(f"✗ CNN model not found at {cnn_path}")
-        except Exception as e:
-            print(f"✗ Error loading CNN model: {e}")
+            models.rf_forest, manifest = load_bundle(bundle_dir, expected_schema=RF_FEATURE_SCHEMA)
+            print(f"✓ RF bundle loaded from {bundle_dir} ({manifest['n_trees']} trees)")
+            if manifest["classes"] != models.class_names:
+                print(f"✗ RF bundle classes differ from the API classes: {manifest['classes']}")
+        except BundleError as e:
+            rf_status["error"] = str(e)
+            print(f"✗ Error loading RF bundle: {e}")
     
-    # Load Random Forest model
-    if _rf_model is None:
+    # Fall back to the pickled Random Forest model
+    if models.rf_forest is None:
         try:
             import pickle
             rf_path = models_dir / "coin_classifier_8class_model.pkl"
@@ -63,77 +297,277 @@ def load_models():
             
             if rf_path.exists():
                 with open(rf_path, 'rb') as f:
-                    _rf_model = pickle.load(f)
+                    models.rf_model = pickle.load(f)
                 print(f"✓ RF model loaded from {rf_path}")
             
             if scaler_path.exists():
                 with open(scaler_path, 'rb') as f:
-                    _rf_scaler = pickle.load(f)
+                    models.rf_scaler = pickle.load(f)
                 print(f"✓ RF scaler loaded from {scaler_path}")
         except Exception as e:
+            rf_status["error"] = str(e)
             print(f"✗ Error loading RF model: {e}")
     
-    _class_names = get_class_names()
+    # Compile scaler + forest for single-traversal inference (bit-identical to sklearn)
+    if models.rf_forest is None and models.rf_model is not None and models.rf_scaler is not None:
+        try:
+            models.rf_forest = CompiledForest.from_sklearn(models.rf_model, models.rf_scaler)
+            print(f"✓ RF model compiled ({models.rf_forest.n_trees} trees)")
+        except Exception as e:
+            print(f"✗ Error compiling RF model, using scikit-learn: {e}")
+    
+    if models.rf_available:
+        rf_status["error"] = None
+    elif rf_status["error"] is None:
+        rf_status["error"] = "model/scaler not found"
+    rf_status.update(loaded=models.rf_available, load_time_ms=round((time.time() - start_time) * 1000, 2))
     
-    return _cnn_model is not None or _rf_model is not None
+    return models
 
 
-def apply_clahe(image, clip_limit=2.0, tile_grid_size=(8, 8)):
-    """Apply CLAHE normalization"""
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
+def warmup_batch_sizes():
+    """Batch sizes requests run the models with: single images and full CNN micro-batches"""
+    sizes = {1}
+    if _cnn_batcher is not None:
+        sizes.add(_cnn_batcher.max_batch_size)
+    return sorted(sizes)
+
+
+def _synthetic_edge(image_size=(256, 256)):
+    """Edge image of a centered coin rim, so warmup runs the full feature extraction"""
+    edge = np.zeros((image_size[1], image_size[0]), dtype=np.uint8)
+    center = (image_size[0] // 2, image_size[1] // 2)
+    radius = min(image_size) // 2 - 4
+    cv2.circle(edge, center, radius, 255, 2)
+    cv2.circle(edge, center, radius // 2, 128, 1)
+    return edge
+
+
+def warmup_models(models, image_size=(256, 256)):
+    """
+    Run synthetic inputs through each loaded model at every batch size used
     
-    clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tile_grid_size)
-    return clahe.apply(gray)
+    The first calls pay for graph tracing, tensor allocation and page faults;
+    doing them here keeps that cost off the first real requests.
+    """
+    edge = _synthetic_edge(image_size)
+    _stage_local.suspended = True  # keep warmup out of the stage metrics
+    try:
+        for name, run_batch in _batch_model_runs(models):
+            status = models.status[name]
+            start_time = time.time()
+            try:
+                for batch_size in warmup_batch_sizes():
+                    run_batch([edge] * batch_size, models)
+                status["warmed_up"] = True
+            except Exception as e:
+                status["error"] = f"warmup failed: {e}"
+                print(f"✗ Warmup of {name} failed: {e}")
+            status["warmup_time_ms"] = round((time.time() - start_time) * 1000, 2)
+    finally:
+        _stage_local.suspended = False
+
 
+def _notify_model_listeners(version):
+    # New model files invalidate anything derived from the previous ones
+    for callback in _model_listeners:
+        callback(version)
 
-def apply_sobel_edge(image):
-    """Apply Sobel edge detection"""
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+def get_models():
+    """Current ModelSet, loading the models on first use"""
+    global _models
+    
+    if _models is None:
+        with _models_lock:
+            if _models is None:
+                models = _load_model_set(MODELS_DIR)
+                warmup_models(models)
+                _models = models
+                _notify_model_listeners(models.version)
+    return _models
+
+
+def load_models():
+    """Load CNN and Random Forest models (once); returns whether any model is available"""
+    return bool(get_models().loaded())
+
+
+def reload_models(force=False):
+    """
+    Load the model files again and swap them in atomically
+    
+    Loading and warmup run in the calling thread while requests keep being
+    served; requests already running finish on the previous models. A new
+    set that is missing a model the previous set had is rejected.
+    
+    Args:
+        force: Reload even if the model files fingerprint is unchanged
+    
+    Returns:
+        dict with previous_version, model_version, reloaded and models
+    
+    Raises:
+        RuntimeError: The new set was rejected (previous models stay active)
+    """
+    global _models
+    
+    with _reload_lock:
+        previous = _models
+        if previous is None:
+            models = get_models()
+            return {"previous_version": None, "model_version": models.version,
+                    "reloaded": True, "models": models.loaded()}
+        
+        if not force and model_files_fingerprint() == previous.version:
+            return {"previous_version": previous.version, "model_version": previous.version,
+                    "reloaded": False, "models": previous.loaded()}
+        
+        models = _load_model_set(MODELS_DIR)
+        missing = [name for name in previous.loaded() if name not in models.loaded()]
+        if missing:
+            raise RuntimeError(f"Reload rejected, failed to load: {', '.join(missing)}")
+        warmup_models(models)
+        
+        with _models_lock:
+            _models = models
+        if models.version != previous.version:
+            _notify_model_listeners(models.version)
+        print(f"✓ Models reloaded: {previous.version} -> {models.version}")
+        
+        return {"previous_version": previous.version, "model_version": models.version,
+                "reloaded": True, "models": models.loaded()}
+
+
+def configure_cnn_batching(max_batch_size=8, max_wait_ms=5.0, active_callers=None):
+    """
+    Enable dynamic micro-batching of CNN inputs across concurrent requests.
+    
+    Args:
+        max_batch_size: Maximum images per forward pass (<= 1 disables batching)
+        max_wait_ms: Maximum time a request waits for others to join its batch
+        active_callers: Optional callable returning the number of requests that
+            can currently join a batch (see CNNBatcher)
+    """
+    global _cnn_batcher
+    
+    if max_batch_size <= 1:
+        _cnn_batcher = None
     else:
-        gray = image
+        _cnn_batcher = CNNBatcher(
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            on_batch=metrics.CNN_BATCH_SIZE.observe,
+            active_callers=active_callers,
+        )
+
+
+def configure_cnn_runtime(runtime="keras", num_threads=None, filename=None):
+    """
+    Select the runtime and model file load_models uses for the CNN.
     
-    # Apply CLAHE first
-    gray = apply_clahe(gray)
+    Args:
+        runtime: 'keras', 'tflite' or 'onnx' (see export_cnn.py)
+        num_threads: CPU threads for TFLite / ONNX Runtime (None = runtime default)
+        filename: Model file in MODELS_DIR, e.g. a quantized variant
+            'coin_classifier_cnn_8class_int8.tflite' (None = runtime default)
+    """
+    global _cnn_runtime, _cnn_threads, _cnn_filename
     
-    sobel_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    sobel_combined = np.sqrt(sobel_x**2 + sobel_y**2)
-    sobel_combined = np.uint8(sobel_combined / sobel_combined.max() * 255)
-    return sobel_combined
+    if runtime not in CNN_MODEL_FILES:
+        raise ValueError(f"Unknown CNN runtime: {runtime}")
+    _cnn_runtime = runtime
+    _cnn_threads = num_threads
+    _cnn_filename = filename
+
+
+def configure_image_decode(mode="full"):
+    """
+    Select how uploads are decoded: 'full' or 'reduced' (see decode_image)
+    """
+    global _image_decode
+    
+    if mode not in IMAGE_DECODE_MODES:
+        raise ValueError(f"Unknown image decode mode: {mode}")
+    _image_decode = mode
+
+
+def configure_image_limits(max_pixels=None, oversized="downscale"):
+    """
+    Limit the decoded size of uploaded images (see decode_image)
+    
+    Args:
+        max_pixels: Maximum decoded width x height (None or 0 disables)
+        oversized: 'downscale' decodes larger JPEGs at 1/2, 1/4 or 1/8 scale
+            to fit (other formats are rejected); 'reject' rejects them all
+    """
+    global _max_image_pixels, _oversized_images
+    
+    if oversized not in OVERSIZED_IMAGE_POLICIES:
+        raise ValueError(f"Unknown oversized image policy: {oversized}")
+    _max_image_pixels = max_pixels or None
+    _oversized_images = oversized
+
+
+def init_worker(cnn_batch_size=8, cnn_batch_wait_ms=5.0, gradient_precision="float64",
+                percentile_mode="exact", cnn_runtime="keras", cnn_threads=None, cnn_file=None,
+                model_watch_interval=0, circle_detector="full", image_decode="full",
+                max_image_pixels=None, oversized_images="downscale"):
+    """Initialize an inference worker process: batching/preprocessing config + models"""
+    configure_cnn_batching(cnn_batch_size, cnn_batch_wait_ms)
+    configure_cnn_runtime(cnn_runtime, cnn_threads, cnn_file)
+    configure_image_decode(image_decode)
+    configure_image_limits(max_image_pixels, oversized_images)
+    set_gradient_precision(gradient_precision)
+    set_percentile_mode(percentile_mode)
+    set_circle_detector(circle_detector)
+    load_models()
+    
+    # Each worker process holds its own models, so each watches the files itself
+    if model_watch_interval > 0:
+        start_model_watcher(model_watch_interval)
+
+
+def start_model_watcher(interval=10.0):
+    """Reload the models in the background whenever the model files change"""
+    watcher = ModelWatcher(model_files_fingerprint, reload_models, interval)
+    watcher.start()
+    return watcher
 
 
 def detect_circle(image):
     """Detect coin circle using Hough Transform"""
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    
-    gray_blurred = cv2.GaussianBlur(gray, (9, 9), 2)
-    
-    circles = cv2.HoughCircles(
-        gray_blurred,
-        cv2.HOUGH_GRADIENT,
-        dp=1,
-        minDist=50,
-        param1=100,
-        param2=30,
-        minRadius=20,
-        maxRadius=min(gray.shape) // 2
-    )
+    gray = ImageGradients(image).gray
+    return detect_coin_circle(gray, max_radius=min(gray.shape) // 2)
+
+
+def parse_steps(value):
+    """
+    Parse a step selection: 'all', 'none' or a comma-separated list of step names
+    
+    Returns:
+        Tuple of selected step names in pipeline order
+    """
+    if value is None or value.strip().lower() == "all":
+        return STEP_NAMES
+    
+    names = [name.strip().lower() for name in value.split(",") if name.strip()]
+    if names == ["none"]:
+        return ()
     
-    if circles is not None:
-        circles = np.uint16(np.around(circles))
-        return circles[0, 0]  # Return first detected circle (x, y, radius)
-    return None
+    unknown = [name for name in names if name not in STEP_NAMES]
+    if unknown:
+        raise ValueError(f"Unknown preprocessing steps: {', '.join(unknown)}")
+    
+    return tuple(name for name in STEP_NAMES if name in names)
 
 
-def image_to_base64(image, format="PNG"):
-    """Convert numpy image to base64 string"""
+def encode_image(image, format="PNG", quality=None):
+    """Encode numpy image (BGR or grayscale) to PNG/JPEG/WebP bytes"""
+    format = format.upper()
+    if format not in STEP_FORMATS:
+        raise ValueError(f"Unsupported image format: {format}")
+    
     if len(image.shape) == 2:
         # Grayscale
         pil_image = Image.fromarray(image)
@@ -141,248 +575,612 @@ def image_to_base64(image, format="PNG"):
         # BGR to RGB
         pil_image = Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
     
+    save_kwargs = {}
+    if quality is not None and format in ("JPEG", "WEBP"):
+        save_kwargs["quality"] = quality
+    
     buffer = BytesIO()
-    pil_image.save(buffer, format=format)
-    return base64.b64encode(buffer.getvalue()).decode('utf-8')
+    pil_image.save(buffer, format=format, **save_kwargs)
+    return buffer.getvalue()
+
+
+def image_to_base64(image, format="PNG", quality=None):
+    """Convert numpy image to base64 string"""
+    return base64.b64encode(encode_image(image, format, quality)).decode('utf-8')
+
 
+def probe_image(image_bytes):
+    """
+    Read format and dimensions from the image header without decoding pixels
+    
+    Returns:
+        (format, (width, height)) with width/height as displayed, i.e. after
+        EXIF orientation; (None, None) when the header cannot be parsed
+    
+    Raises:
+        ImageTooLargeError: beyond Pillow's own decompression bomb limit
+    """
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", Image.DecompressionBombWarning)
+            with Image.open(BytesIO(image_bytes)) as img:
+                width, height = img.size
+                orientation = img.getexif().get(0x0112) if img.format == "JPEG" else None
+                image_format = img.format
+    except Image.DecompressionBombError as e:
+        raise ImageTooLargeError(str(e))
+    except Exception:
+        return None, None
+    
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return image_format, (width, height)
 
-def resize_with_aspect_ratio(image, target_size=(256, 256)):
+
+def reduced_decode_factor(size, min_size):
     """
-    Resize image while maintaining aspect ratio by zooming to fit and center-cropping.
-    This prevents circular coins from becoming oval when the input image is not square.
+    Largest libjpeg scale factor (8, 4, 2 or 1) whose output still covers min_size
     
     Args:
-        image: Input image (BGR or grayscale)
-        target_size: Target (width, height) tuple
+        size: (width, height) of the full image
+        min_size: (width, height) the decoded image must at least have
+    """
+    width, height = size
+    min_width, min_height = min_size
+    for factor, _ in _REDUCED_DECODE_FLAGS:
+        # libjpeg rounds scaled dimensions up
+        if -(-width // factor) >= min_width and -(-height // factor) >= min_height:
+            return factor
+    return 1
+
+
+def _limit_decode_factor(image_format, size, factor):
+    """Decode factor (>= factor) keeping the decoded image within the pixel limit"""
+    width, height = size
     
-    Returns:
-        Resized and center-cropped image with maintained aspect ratio
+    def decoded_pixels(f):
+        return -(-width // f) * -(-height // f)
+    
+    if decoded_pixels(factor) <= _max_image_pixels:
+        return factor
+    if _oversized_images == "downscale" and image_format == "JPEG":
+        for candidate, _ in reversed(_REDUCED_DECODE_FLAGS):
+            if candidate > factor and decoded_pixels(candidate) <= _max_image_pixels:
+                return candidate
+    raise ImageTooLargeError(
+        f"Image is {width}x{height} ({width * height / 1e6:.1f} MP), "
+        f"the limit is {_max_image_pixels / 1e6:.1f} MP"
+    )
+
+
+def decode_image(image_bytes, min_size=None):
     """
-    target_w, target_h = target_size
-    h, w = image.shape[:2]
+    Decode an uploaded image to BGR, at reduced resolution when possible
     
-    # Calculate scale to fill target (zoom to fit, crop excess)
-    scale = max(target_w / w, target_h / h)
+    In the 'reduced' decode mode a JPEG that is larger than needed is decoded
+    by libjpeg at 1/2, 1/4 or 1/8 scale (IMREAD_REDUCED_COLOR_*, DCT-domain
+    scaling): the smallest scale that still covers ``min_size``, chosen from
+    the header dimensions. This skips most of the IDCT work and never
+    allocates the full-resolution image. Other formats, and the 'full' mode,
+    decode at full size. imdecode applies EXIF orientation in the same pass
+    in both cases.
     
-    # New dimensions after scaling
-    new_w = int(w * scale)
-    new_h = int(h * scale)
+    With a pixel limit (configure_image_limits) the header dimensions are
+    checked before any pixel is decoded. A larger JPEG is decoded at the
+    scale that fits, or rejected, so a small but highly compressible upload
+    cannot expand to gigabytes.
     
-    # Resize with aspect ratio maintained
-    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    Args:
+        image_bytes: Encoded image
+        min_size: (width, height) the decoded image must cover, e.g. the
+            resize target; None always decodes at full size
     
-    # Calculate crop offsets to center-crop to target size
-    x_offset = (new_w - target_w) // 2
-    y_offset = (new_h - target_h) // 2
+    Returns:
+        (image, factor) - factor is full size / decoded size (1, 2, 4 or 8)
     
-    # Center-crop to target size
-    cropped = resized[y_offset:y_offset + target_h, x_offset:x_offset + target_w]
+    Raises:
+        ImageTooLargeError: the image exceeds the pixel limit
+        ValueError: the image cannot be decoded
+    """
+    factor = 1
+    reduce = min_size is not None and _image_decode == "reduced"
+    if reduce or _max_image_pixels:
+        image_format, size = probe_image(image_bytes)
+        if size is None:
+            if _max_image_pixels:
+                raise ValueError("Could not decode image")
+        else:
+            if reduce and image_format == "JPEG":
+                factor = reduced_decode_factor(size, min_size)
+            if _max_image_pixels:
+                factor = _limit_decode_factor(image_format, size, factor)
     
-    return cropped
+    flag = dict(_REDUCED_DECODE_FLAGS).get(factor, cv2.IMREAD_COLOR)
+    image = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+    if image is None:
+        raise ValueError("Could not decode image")
+    return image, factor
 
 
-def preprocess_image(image_bytes, image_size=(256, 256)):
+def preprocess_image(image_bytes, image_size=(256, 256), steps=STEP_NAMES,
+                     step_format="PNG", step_quality=None, locate_circle=None):
     """
     Run full preprocessing pipeline and return step images
     
+    Step images that are not requested are neither computed (when they are
+    display-only) nor encoded.
+    
+    Args:
+        image_bytes: Raw uploaded image bytes
+        image_size: Target (width, height)
+        steps: Step names to return (see STEP_NAMES); empty for none
+        step_format: 'PNG', 'JPEG' or 'WEBP'; None returns raw numpy arrays
+        step_quality: JPEG/WebP quality (1-100)
+        locate_circle: Callable(gray) -> circle replacing detect_circle
+            (e.g. CoinTracker.locate for camera streams)
+    
     Returns:
-        steps: dict of preprocessing step images (base64)
+        steps: dict of requested preprocessing step images (base64 or arrays)
         final_image: processed image ready for prediction
         circle_info: detected circle (x, y, radius) or None
     """
-    # Decode image
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    original = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    # Decode image (at reduced resolution when it is only downscaled anyway)
+    with _timed("decode"):
+        original, _ = decode_image(image_bytes, min_size=image_size)
     
-    if original is None:
-        raise ValueError("Could not decode image")
+    step_images = {}
     
     # Step 1: Resize with aspect ratio preservation (prevents circular coins from becoming oval)
-    resized = resize_with_aspect_ratio(original, image_size)
+    with _timed("resize"):
+        resized = resize_with_aspect_ratio(original, image_size)
     
-    # Step 2: CLAHE
-    clahe_img = apply_clahe(resized)
+    # Grayscale, CLAHE and Sobel of the resized image, each computed at most once
+    gradients = ImageGradients(resized)
     
-    # Step 3: Sobel Edge (on resized, before crop)
-    sobel_img = apply_sobel_edge(resized)
+    # Step 2: CLAHE (display only)
+    if "clahe" in steps or "sobel" in steps:
+        with _timed("clahe"):
+            step_images["clahe"] = gradients.clahe
     
-    # Step 4: Hough Circle Detection
-    circle = detect_circle(resized)
+    # Step 3: Sobel Edge (on resized, before crop - display only)
+    if "sobel" in steps:
+        with _timed("sobel"):
+            step_images["sobel"] = gradients.edges
     
-    hough_img = resized.copy()
-    if circle is not None:
-        x, y, r = circle
-        cv2.circle(hough_img, (x, y), r, (0, 255, 0), 3)
-        cv2.circle(hough_img, (x, y), 3, (0, 0, 255), -1)
+    # Step 4: Hough Circle Detection (reuses the grayscale)
+    with _timed("hough"):
+        circle = (locate_circle or detect_circle)(gradients.gray)
+    metrics.CIRCLE_DETECTIONS.labels(result="detected" if circle is not None else "not_detected").inc()
+    
+    if "hough_circle" in steps:
+        hough_img = resized.copy()
+        if circle is not None:
+            x, y, r = circle
+            cv2.circle(hough_img, (x, y), r, (0, 255, 0), 3)
+            cv2.circle(hough_img, (x, y), 3, (0, 0, 255), -1)
+        step_images["hough_circle"] = hough_img
     
     # Step 5: Crop to circle
-    if circle is not None:
-        # Segment first
-        mask = np.zeros(resized.shape[:2], dtype=np.uint8)
-        cv2.circle(mask, (circle[0], circle[1]), circle[2], 255, -1)
-        segmented = cv2.bitwise_and(resized, resized, mask=mask)
+    with _timed("crop"):
+        if circle is not None:
+            # Segment first
+            mask = np.zeros(resized.shape[:2], dtype=np.uint8)
+            cv2.circle(mask, (circle[0], circle[1]), circle[2], 255, -1)
+            segmented = cv2.bitwise_and(resized, resized, mask=mask)
+            
+            # Crop
+            cropped = crop_coin_to_circle(segmented, tuple(circle), image_size)
+        else:
+            cropped = resized.copy()
         
-        # Crop
-        cropped = crop_coin_to_circle(segmented, tuple(circle), image_size)
-    else:
-        cropped = resized.copy()
-    
-    # Ensure cropped image is exactly the target size (prevents CNN dimension errors)
-    if cropped.shape[:2] != (image_size[1], image_size[0]):
-        cropped = cv2.resize(cropped, image_size, interpolation=cv2.INTER_AREA)
+        # Ensure cropped image is exactly the target size (prevents CNN dimension errors)
+        if cropped.shape[:2] != (image_size[1], image_size[0]):
+            cropped = cv2.resize(cropped, image_size, interpolation=cv2.INTER_AREA)
     
-    # Step 6: Final edge detection on cropped
-    final_edge = apply_sobel_edge(cropped)
+    # Step 6: Final edge detection on cropped (same as apply_sobel_edge, timed per pass)
+    cropped_gradients = ImageGradients(cropped)
+    with _timed("clahe"):
+        cropped_gradients.clahe
+    with _timed("sobel"):
+        final_edge = cropped_gradients.edges
     
     # Ensure final edge is exactly the target size
     if final_edge.shape[:2] != (image_size[1], image_size[0]):
         final_edge = cv2.resize(final_edge, image_size, interpolation=cv2.INTER_AREA)
     
-    # Collect all steps as base64
-    steps = {
-        "original": image_to_base64(original),
-        "resized": image_to_base64(resized),
-        "clahe": image_to_base64(clahe_img),
-        "sobel": image_to_base64(sobel_img),
-        "hough_circle": image_to_base64(hough_img),
-        "cropped": image_to_base64(cropped),
-        "edge_final": image_to_base64(final_edge),
+    step_images.update(original=original, resized=resized, cropped=cropped, edge_final=final_edge)
+    
+    # Collect requested steps, encoded unless raw arrays were asked for
+    if step_format is None:
+        steps_out = {name: step_images[name] for name in steps}
+    elif steps:
+        with _timed("encode"):
+            steps_out = {
+                name: image_to_base64(step_images[name], step_format, step_quality)
+                for name in steps
+            }
+    else:
+        steps_out = {}
+    
+    return steps_out, final_edge, circle
+
+
+def _format_prediction(proba, pred_idx, elapsed, class_names):
+    """Build the per-model prediction dict from a probability row"""
+    return {
+        "label": class_names[pred_idx],
+        "confidence": float(proba[pred_idx]),
+        "processing_time_ms": round(elapsed * 1000, 2),
+        "all_classes": [
+            {"label": class_names[i], "confidence": float(proba[i])}
+            for i in range(len(class_names))
+        ]
     }
+
+
+def _cnn_input(final_edge):
+    """Normalize edge image to 0-1 and add channel dim -> (256, 256, 1)"""
+    cnn_input = final_edge.astype(np.float32) / 255.0
+    return np.expand_dims(cnn_input, axis=-1)
+
+
+def _rf_features(final_edge):
+    """Extract RF features from a cropped edge image (circle is centered)"""
+    h, w = final_edge.shape
+    circle_cropped = (w//2, h//2, min(w, h)//2)
+    return extract_coin_features(final_edge, final_edge, circle_cropped, compute_circularity=False)
+
+
+def predict_cnn_batch(final_edges, models=None):
+    """
+    Run the CNN once on a stack of edge images
+    
+    Args:
+        final_edges: Edge images from preprocess_image
+        models: ModelSet to use (default: the current one)
     
-    return steps, final_edge, circle
+    Returns:
+        List of prediction dicts, one per image (processing time is per batch)
+    """
+    models = models or get_models()
+    start_time = time.time()
+    
+    with _timed("cnn"):
+        batch = np.stack([_cnn_input(edge) for edge in final_edges])  # (N, 256, 256, 1)
+        probas = models.cnn.predict(batch, verbose=0)
+    
+    elapsed = time.time() - start_time
+    
+    return [
+        _format_prediction(proba, int(np.argmax(proba)), elapsed, models.class_names)
+        for proba in probas
+    ]
 
 
-def extract_features(image, edges, circle_info):
-    """Extract 35 features for Random Forest (simplified version)"""
-    features = []
+def predict_rf_batch(final_edges, models=None):
+    """
+    Run scaler + Random Forest once on the stacked feature matrix
     
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    
-    # Edge features (12)
-    edge_density = np.sum(edges > 0) / edges.size
-    features.append(edge_density)
-    features.extend([np.mean(edges), np.std(edges), np.max(edges)])
-    
-    edge_hist, _ = np.histogram(edges.flatten(), bins=8, range=(0, 256))
-    edge_hist = edge_hist / (edge_hist.sum() + 1e-6)
-    features.extend(edge_hist)
-    
-    # Shape features (4)
-    if circle_info is not None:
-        x, y, r = circle_info
-        features.append(r / max(gray.shape))
-        features.extend([x / gray.shape[1], y / gray.shape[0]])
-        features.append(1.0)  # circularity placeholder
-    else:
-        features.extend([0, 0, 0, 0])
+    Args:
+        final_edges: Edge images from preprocess_image
+        models: ModelSet to use (default: the current one)
     
-    # Edge pattern features (12)
-    sobel_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    magnitude = np.sqrt(sobel_x**2 + sobel_y**2)
-    direction = np.arctan2(sobel_y, sobel_x)
+    Returns:
+        List of prediction dicts, one per image (processing time is per batch)
+    """
+    models = models or get_models()
+    start_time = time.time()
     
-    orient_hist, _ = np.histogram(direction[magnitude > magnitude.mean()], bins=8, range=(-np.pi, np.pi))
-    orient_hist = orient_hist / (orient_hist.sum() + 1e-6)
-    features.extend(orient_hist)
-    features.extend([np.mean(magnitude), np.std(magnitude), np.percentile(magnitude, 75), np.percentile(magnitude, 90)])
+    with _timed("features"):
+        features = np.stack([_rf_features(edge) for edge in final_edges])
     
-    # Spatial features (4)
-    h, w = edges.shape
-    quadrants = [edges[0:h//2, 0:w//2], edges[0:h//2, w//2:w], edges[h//2:h, 0:w//2], edges[h//2:h, w//2:w]]
-    for quad in quadrants:
-        features.append(np.sum(quad > 0) / quad.size if quad.size > 0 else 0)
+    # Scale and predict (one forest traversal when compiled)
+    with _timed("rf"):
+        if models.rf_forest is not None:
+            pred_idx, probas = models.rf_forest.predict(features)
+        else:
+            features_scaled = models.rf_scaler.transform(features)
+            pred_idx = models.rf_model.predict(features_scaled)
+            probas = models.rf_model.predict_proba(features_scaled)
     
-    # Texture features (3)
-    kernel_size = 5
-    local_mean = cv2.blur(gray.astype(float), (kernel_size, kernel_size))
-    local_var = cv2.blur((gray.astype(float) - local_mean)**2, (kernel_size, kernel_size))
-    features.extend([np.mean(local_var), np.std(local_var), np.percentile(local_var, 75)])
+    elapsed = time.time() - start_time
     
-    return np.array(features, dtype=np.float32)
+    return [
+        _format_prediction(proba, int(idx), elapsed, models.class_names)
+        for proba, idx in zip(probas, pred_idx)
+    ]
+
+
+def _batch_model_runs(models):
+    """(name, batch function) pairs for the models loaded in a ModelSet"""
+    model_runs = []
+    if models.cnn is not None:
+        model_runs.append(("cnn", predict_cnn_batch))
+    if models.rf_available:
+        model_runs.append(("random_forest", predict_rf_batch))
+    return model_runs
 
 
-def predict(image_bytes):
+def predict(image_bytes, steps=STEP_NAMES, step_format="PNG", step_quality=None):
     """
     Main prediction function
     
+    Args:
+        image_bytes: Raw uploaded image bytes
+        steps: Preprocessing step images to return (empty skips encoding)
+        step_format: 'PNG', 'JPEG', 'WEBP', or None for raw numpy arrays
+        step_quality: JPEG/WebP quality (1-100)
+    
     Returns dict with:
-        - preprocessing_steps: base64 images of each step
+        - preprocessing_steps: images of the requested steps
         - predictions: results from CNN and RF
         - circle_detected: bool
+        - model_version: version of the models that produced the predictions
     """
-    import time
-    
-    # Ensure models are loaded
-    load_models()
+    # Ensure models are loaded; a reload during this request does not affect it
+    models = get_models()
     
     # Run preprocessing
-    steps, final_edge, circle = preprocess_image(image_bytes)
+    steps, final_edge, circle = preprocess_image(
+        image_bytes, steps=steps, step_format=step_format, step_quality=step_quality
+    )
     
-    result = {
+    return {
         "preprocessing_steps": steps,
         "circle_detected": circle is not None,
-        "predictions": {}
+        "predictions": _predict_models(final_edge, models),
+        "model_version": models.version,
     }
+
+
+def _predict_models(final_edge, models):
+    """Run every loaded model on one edge image; a failing model reports its error"""
+    predictions = {}
     
     # CNN Prediction
-    if _cnn_model is not None:
+    if models.cnn is not None:
         try:
             start_time = time.time()
             
-            # Prepare input (normalize to 0-1, add batch and channel dims)
-            cnn_input = final_edge.astype(np.float32) / 255.0
-            cnn_input = np.expand_dims(cnn_input, axis=(0, -1))  # (1, 256, 256, 1)
-            
-            # Predict
-            proba = _cnn_model.predict(cnn_input, verbose=0)[0]
+            # Predict (batched with concurrent requests when enabled, includes the batch wait)
+            with _timed("cnn"):
+                if _cnn_batcher is not None:
+                    proba = _cnn_batcher.predict(models.cnn, _cnn_input(final_edge))
+                else:
+                    proba = models.cnn.predict(np.expand_dims(_cnn_input(final_edge), axis=0), verbose=0)[0]
             pred_idx = np.argmax(proba)
             
             elapsed = time.time() - start_time
             
-            result["predictions"]["cnn"] = {
-                "label": _class_names[pred_idx],
-                "confidence": float(proba[pred_idx]),
-                "processing_time_ms": round(elapsed * 1000, 2),
-                "all_classes": [
-                    {"label": _class_names[i], "confidence": float(proba[i])}
-                    for i in range(len(_class_names))
-                ]
-            }
+            predictions["cnn"] = _format_prediction(proba, pred_idx, elapsed, models.class_names)
         except Exception as e:
-            result["predictions"]["cnn"] = {"error": str(e)}
+            metrics.ERRORS.labels(type="cnn").inc()
+            predictions["cnn"] = {"error": str(e)}
     
     # Random Forest Prediction
-    if _rf_model is not None and _rf_scaler is not None:
+    if models.rf_available:
         try:
-            start_time = time.time()
-            
-            # Extract features
-            # For cropped, circle is centered
-            h, w = final_edge.shape
-            circle_cropped = (w//2, h//2, min(w, h)//2)
-            features = extract_features(final_edge, final_edge, circle_cropped)
-            
-            # Scale and predict
-            features_scaled = _rf_scaler.transform(features.reshape(1, -1))
-            pred_idx = _rf_model.predict(features_scaled)[0]
-            proba = _rf_model.predict_proba(features_scaled)[0]
-            
-            elapsed = time.time() - start_time
-            
-            result["predictions"]["random_forest"] = {
-                "label": _class_names[pred_idx],
-                "confidence": float(proba[pred_idx]),
-                "processing_time_ms": round(elapsed * 1000, 2),
-                "all_classes": [
-                    {"label": _class_names[i], "confidence": float(proba[i])}
-                    for i in range(len(_class_names))
-                ]
-            }
+            predictions["random_forest"] = predict_rf_batch([final_edge], models)[0]
+        except Exception as e:
+            metrics.ERRORS.labels(type="random_forest").inc()
+            predictions["random_forest"] = {"error": str(e)}
+    
+    return predictions
+
+
+def predict_frame(image_bytes, tracker):
+    """
+    Predict one frame of a camera stream
+    
+    The coin circle is searched near its position in the previous frame, and
+    the previous predictions are reused while the cropped coin barely changes
+    (see CoinTracker). No step images are produced.
+    
+    Args:
+        image_bytes: Encoded frame (JPEG/PNG/WebP)
+        tracker: CoinTracker of the stream session
+    
+    Returns:
+        (result, tracker) - the tracker is returned because a process pool
+        works on a copy; the caller keeps the returned one
+    """
+    models = get_models()
+    start_time = time.time()
+    
+    _, final_edge, circle = preprocess_image(image_bytes, steps=(), locate_circle=tracker.locate)
+    
+    predictions = tracker.reuse_predictions(final_edge, models.version)
+    reused = predictions is not None
+    if not reused:
+        predictions = _predict_models(final_edge, models)
+        tracker.update_predictions(predictions, models.version)
+    metrics.STREAM_FRAMES.labels(classification="reused" if reused else "classified").inc()
+    
+    result = {
+        "circle_detected": circle is not None,
+        "circle": None if circle is None else [int(v) for v in circle],
+        "tracked": tracker.tracked,
+        "reused": reused,
+        "difference": None if tracker.difference is None else round(tracker.difference, 2),
+        "predictions": predictions,
+        "model_version": models.version,
+        "processing_time_ms": round((time.time() - start_time) * 1000, 2),
+    }
+    return result, tracker
+
+
+def _get_preprocess_executor():
+    global _preprocess_executor
+    
+    if _preprocess_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _preprocess_executor = ThreadPoolExecutor(
+            max_workers=min(8, os.cpu_count() or 1), thread_name_prefix="preprocess"
+        )
+    return _preprocess_executor
+
+
+def predict_batch(images, steps=(), step_format="PNG", step_quality=None):
+    """
+    Predict many images at once
+    
+    Images are preprocessed in parallel, then the CNN and RF each run once
+    on the stacked batch.
+    
+    Args:
+        images: List of (filename, image_bytes) tuples
+        steps: Preprocessing step images to return per image (default none)
+        step_format: 'PNG', 'JPEG' or 'WEBP'
+        step_quality: JPEG/WebP quality (1-100)
+    
+    Returns:
+        dict with model_version and results: per-image result dicts in input
+        order; images that fail preprocessing carry an "error" instead of predictions
+    """
+    models = get_models()
+    
+    def preprocess_one(image_bytes):
+        try:
+            return preprocess_image(
+                image_bytes, steps=steps, step_format=step_format, step_quality=step_quality
+            )
         except Exception as e:
-            result["predictions"]["random_forest"] = {"error": str(e)}
+            metrics.ERRORS.labels(type="preprocess").inc()
+            return e
+    
+    processed = list(_get_preprocess_executor().map(preprocess_one, [data for _, data in images]))
+    
+    results = []
+    valid = []
+    for index, ((filename, _), item) in enumerate(zip(images, processed)):
+        entry = {"index": index, "filename": filename}
+        if isinstance(item, Exception):
+            entry["error"] = str(item)
+        else:
+            step_images, final_edge, circle = item
+            entry.update(
+                preprocessing_steps=step_images,
+                circle_detected=circle is not None,
+                predictions={},
+            )
+            valid.append((entry, final_edge))
+        results.append(entry)
+    
+    batch_result = {"model_version": models.version, "results": results}
+    if not valid:
+        return batch_result
+    
+    final_edges = [final_edge for _, final_edge in valid]
+    
+    for name, run_batch in _batch_model_runs(models):
+        try:
+            predictions = run_batch(final_edges, models)
+        except Exception as e:
+            metrics.ERRORS.labels(type=name).inc()
+            predictions = [{"error": str(e)}] * len(valid)
+        for (entry, _), prediction in zip(valid, predictions):
+            entry["predictions"][name] = prediction
+    
+    return batch_result
+
+
+def predict_multi(image_bytes, detect_size=1024, max_coins=50, image_size=(256, 256)):
+    """
+    Detect and classify every coin in one image
+    
+    Coins are detected with detect_coins on an aspect-preserving downscale
+    (longest side ``detect_size``). Each coin is segmented with segment_coin,
+    which masks only its bounding box (the crop_coin_to_circle box), and all
+    crops are classified in one batched CNN / RF call.
+    
+    Args:
+        image_bytes: Raw uploaded image bytes
+        detect_size: Longest image side used for circle detection
+        max_coins: Maximum number of coins classified
+        image_size: Model input (width, height)
+    
+    Returns dict with:
+        - coin_count: number of coins found
+        - coins: circle (original image coordinates) and per-model label,
+          confidence and value for each coin
+        - total_value: summed rupiah value per model
+        - model_version: version of the models that produced the predictions
+    """
+    models = get_models()
+    
+    # Both sides >= detect_size keeps the longest side >= detect_size for any aspect
+    with _timed("decode"):
+        original, factor = decode_image(image_bytes, min_size=(detect_size, detect_size))
+    
+    # Downscale for detection without cropping away coins near the border
+    h, w = original.shape[:2]
+    detect_scale = min(1.0, detect_size / max(h, w))
+    if detect_scale < 1.0:
+        with _timed("resize"):
+            image = cv2.resize(original, (int(w * detect_scale), int(h * detect_scale)),
+                               interpolation=cv2.INTER_AREA)
+    else:
+        image = original
+    
+    # Detection image -> full-resolution original coordinates
+    scale = detect_scale / factor
+    
+    with _timed("hough"):
+        coins = detect_coins(image, max_coins, max_radius=min(image.shape[:2]) // 2)
+    metrics.CIRCLE_DETECTIONS.labels(result="detected" if coins else "not_detected").inc()
+    
+    result = {
+        "coin_count": len(coins),
+        "coins": [],
+        "total_value": {},
+        "processing_time_ms": {},
+        "model_version": models.version,
+    }
+    
+    if not coins:
+        return result
+    
+    final_edges = []
+    for x, y, r in coins:
+        # Mask only the coin's box, so memory does not grow with coins x frame size
+        with _timed("crop"):
+            cropped = cv2.resize(segment_coin(image, (x, y, r)), image_size)
+        
+        # Same as apply_sobel_edge, timed per pass
+        cropped_gradients = ImageGradients(cropped)
+        with _timed("clahe"):
+            cropped_gradients.clahe
+        with _timed("sobel"):
+            final_edges.append(cropped_gradients.edges)
+        
+        result["coins"].append({
+            "circle": {
+                "x": int(round(x / scale)),
+                "y": int(round(y / scale)),
+                "radius": int(round(r / scale)),
+            },
+            "predictions": {},
+        })
+    
+    for name, run_batch in _batch_model_runs(models):
+        try:
+            predictions = run_batch(final_edges, models)
+        except Exception as e:
+            metrics.ERRORS.labels(type=name).inc()
+            result.setdefault("errors", {})[name] = str(e)
+            continue
+        
+        total = 0
+        for coin, prediction in zip(result["coins"], predictions):
+            value = get_coin_value(prediction["label"])
+            coin["predictions"][name] = {
+                "label": prediction["label"],
+                "confidence": prediction["confidence"],
+                "value": value,
+            }
+            total += value
+        
+        result["total_value"][name] = total
+        result["processing_time_ms"][name] = predictions[0]["processing_time_ms"]
     
     return result
@@ -0,0 +1,137 @@
+"""
+Content-Addressed Result Cache
+Reuses prediction results for byte-identical images
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+
+class MemoryBackend:
+    """In-process LRU store with a max entry count and TTL"""
+
+    def __init__(self, max_entries=256, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    Shared store for several workers (requires the optional ``redis`` package).
+
+    Values are stored as JSON with a Redis-side TTL; size is bounded by the
+    Redis server's own eviction policy.
+    """
+
+    def __init__(self, url="redis://localhost:6379/0", ttl=300.0, prefix="coin-result:"):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        data = self._client.get(self.prefix + key)
+        return None if data is None else json.loads(data)
+
+    def set(self, key, value):
+        self._client.set(self.prefix + key, json.dumps(value), ex=max(1, int(self.ttl)))
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self.prefix + "*"):
+            self._client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self.prefix + "*"))
+
+
+def create_backend(kind="memory", max_entries=256, ttl=300.0, redis_url=None):
+    """Create a cache backend by name: 'memory', 'redis' or 'none'"""
+    if kind == "none":
+        return None
+    if kind == "memory":
+        return MemoryBackend(max_entries=max_entries, ttl=ttl)
+    if kind == "redis":
+        return RedisBackend(url=redis_url or "redis://localhost:6379/0", ttl=ttl)
+    raise ValueError(f"Unknown result cache backend: {kind}")
+
+
+class ResultCache:
+    """
+    Prediction results keyed on the image content hash plus everything else
+    that affects the result (model version, preprocessing and request options).
+
+    Args:
+        backend: Object with get/set/clear (see MemoryBackend), or None to disable
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    @staticmethod
+    def make_key(image_bytes, *params):
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            metrics.RESULT_CACHE_MISSES.inc()
+        else:
+            metrics.RESULT_CACHE_HITS.inc()
+        return value
+
+    def set(self, key, value):
+        if self.enabled:
+            self.backend.set(key, value)
+
+    def clear(self, *_args):
+        if self.enabled:
+            self.backend.clear()
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self.backend) if self.enabled else 0,
+            "hits": metrics.RESULT_CACHE_HITS.value,
+            "misses": metrics.RESULT_CACHE_MISSES.value,
+        }
@@ -0,0 +1,76 @@
+"""
+Preprocessing Step Store
+Short-lived cache for step images returned by reference instead of inline
+"""
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from .predictor import encode_image
+
+MEDIA_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+class StepStore:
+    """
+    Keeps raw step images for a short time and encodes them on first fetch.
+
+    Args:
+        ttl: Seconds an entry stays available
+        max_entries: Oldest entries are evicted beyond this count
+    """
+
+    def __init__(self, ttl=60.0, max_entries=64):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry["expires"] > now and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[key]
+
+    def put(self, images, format="PNG", quality=None):
+        """
+        Store step images (dict of name -> numpy array)
+
+        Returns:
+            Entry id used to fetch the images later
+        """
+        steps_id = secrets.token_urlsafe(12)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[steps_id] = {
+                "images": images,
+                "encoded": {},
+                "format": format.upper(),
+                "quality": quality,
+                "expires": now + self.ttl,
+            }
+            self._purge(now)
+        return steps_id
+
+    def get(self, steps_id, step):
+        """
+        Fetch one encoded step image
+
+        Returns:
+            (image bytes, media type), or None if unknown or expired
+        """
+        with self._lock:
+            self._purge(time.monotonic())
+            entry = self._entries.get(steps_id)
+            if entry is None or step not in entry["images"]:
+                return None
+            encoded = entry["encoded"].get(step)
+
+        if encoded is None:
+            encoded = encode_image(entry["images"][step], entry["format"], entry["quality"])
+            with self._lock:
+                entry["encoded"][step] = encoded
+
+        return encoded, MEDIA_TYPES[entry["format"]]
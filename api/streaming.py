@@ -0,0 +1,164 @@
+"""
+Camera Stream Sessions
+Frame buffering with drop-oldest backpressure and per-connection statistics
+"""
+import asyncio
+import itertools
+import time
+from collections import deque
+
+import numpy as np
+
+# Session ids of /ws/stream connections
+_session_ids = itertools.count(1)
+
+
+def next_session_id():
+    return next(_session_ids)
+
+
+class FrameBuffer:
+    """
+    Bounded buffer of received frames that drops the oldest frame when full.
+
+    A client sending faster than frames are processed never builds up a
+    backlog: inference always continues with the newest frames.
+
+    Args:
+        max_frames: Frames kept waiting for processing (1 = only the newest)
+    """
+
+    def __init__(self, max_frames=1):
+        self.max_frames = max(1, max_frames)
+        self.dropped = 0
+        self._frames = deque()
+        self._available = asyncio.Event()
+        self._closed = False
+
+    def put(self, frame):
+        """Add a frame, dropping the oldest waiting one when full; returns the number dropped"""
+        dropped = 0
+        while len(self._frames) >= self.max_frames:
+            self._frames.popleft()
+            dropped += 1
+        self.dropped += dropped
+        self._frames.append(frame)
+        self._available.set()
+        return dropped
+
+    def close(self):
+        """Wake up get(); it returns None once the buffer is empty"""
+        self._closed = True
+        self._available.set()
+
+    async def get(self):
+        """Oldest waiting frame, or None when closed and empty"""
+        while not self._frames:
+            if self._closed:
+                return None
+            self._available.clear()
+            await self._available.wait()
+        return self._frames.popleft()
+
+
+class StreamStats:
+    """
+    Frame counters, frame rate and latency of one stream connection.
+
+    Latency is measured from receiving a frame to sending its result, so it
+    includes the wait in the frame buffer and the inference queue.
+
+    Args:
+        window: Recent frames used for frame rate and latency percentiles
+    """
+
+    def __init__(self, window=100):
+        self.started = time.monotonic()
+        self.received = 0
+        self.processed = 0
+        self.reused = 0
+        self.dropped = 0
+        self.errors = 0
+        self.tracking = None
+        self._latencies = deque(maxlen=window)
+        self._done_times = deque(maxlen=window)
+
+    def frame_received(self):
+        self.received += 1
+
+    def frames_dropped(self, count):
+        self.dropped += count
+
+    def frame_done(self, latency, reused=False, tracking=None):
+        """Count a processed frame; ``tracking`` is the session's CoinTracker.counts"""
+        self.processed += 1
+        self.reused += int(reused)
+        if tracking is not None:
+            self.tracking = dict(tracking)
+        self._latencies.append(latency)
+        self._done_times.append(time.monotonic())
+
+    def frame_failed(self):
+        self.errors += 1
+
+    def snapshot(self):
+        """Counters, output frame rate and latency percentiles (ms) over the recent window"""
+        fps = 0.0
+        if len(self._done_times) > 1:
+            span = self._done_times[-1] - self._done_times[0]
+            if span > 0:
+                fps = (len(self._done_times) - 1) / span
+
+        latency = None
+        if self._latencies:
+            values = np.array(self._latencies) * 1000
+            latency = {
+                "mean": round(float(values.mean()), 2),
+                "p50": round(float(np.percentile(values, 50)), 2),
+                "p95": round(float(np.percentile(values, 95)), 2),
+                "max": round(float(values.max()), 2),
+            }
+
+        return {
+            "duration_s": round(time.monotonic() - self.started, 1),
+            "received": self.received,
+            "processed": self.processed,
+            "reused": self.reused,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "fps": round(fps, 2),
+            "latency_ms": latency,
+            "tracking": self.tracking,
+        }
+
+
+def compact_message(frame_id, result, latency):
+    """
+    Per-frame stream message with only label, confidence and circle per model
+
+    Args:
+        frame_id: Sequence number of the frame in its connection
+        result: predict_frame result
+        latency: Seconds since the frame was received
+
+    Returns:
+        JSON-serializable dict
+    """
+    predictions = {}
+    for name, prediction in result["predictions"].items():
+        if "error" in prediction:
+            predictions[name] = {"error": prediction["error"]}
+        else:
+            predictions[name] = {
+                "label": prediction["label"],
+                "confidence": round(prediction["confidence"], 4),
+            }
+
+    return {
+        "type": "prediction",
+        "frame": frame_id,
+        "circle": result["circle"],
+        "predictions": predictions,
+        "reused": result["reused"],
+        "latency_ms": round(latency * 1000, 1),
+    }
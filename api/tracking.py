@@ -0,0 +1,169 @@
+"""
+Coin Tracking for Camera Streams
+Keeps per-session state so consecutive frames reuse earlier work
+"""
+import cv2
+import numpy as np
+
+from preprocessing import detect_coin_circle, hough_circles
+
+# Side of the downscaled edge crop compared between frames. Smaller averages
+# away more CLAHE-amplified sensor noise and the jitter of a re-fitted circle.
+THUMBNAIL_SIZE = 16
+
+
+def _thumbnail(image):
+    """Small float copy of a crop; area averaging suppresses sensor noise"""
+    return cv2.resize(image, (THUMBNAIL_SIZE, THUMBNAIL_SIZE), interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+class CoinTracker:
+    """
+    Tracks the coin circle and the last prediction across the frames of one session.
+
+    Circle search: the Hough transform first runs on a window around the last
+    known circle, restricted to radii close to the last radius. Only when that
+    finds nothing (first frame, coin moved far or left the frame) does the full
+    frame detector run. A circle within ``jitter_tolerance`` pixels (center and
+    radius) of the last one keeps the last one, so a static coin does not flip
+    between two 1 px apart Hough results and change its crop every frame.
+
+    Classification: the cropped edge image is compared with the one the last
+    prediction was made on (mean absolute difference of 16x16 thumbnails). While
+    it stays below ``change_threshold``, the last prediction is reused.
+
+    Not thread-safe; frames of a session are processed one at a time.
+
+    Args:
+        search_margin: Window half-size around the last center, as a multiple of its radius
+        radius_tolerance: Allowed relative radius change between frames
+        change_threshold: Mean absolute thumbnail difference (0-255) that triggers a new classification
+        max_reuse_frames: Classify again after this many reused frames (0: no limit)
+        jitter_tolerance: Max center/radius change in pixels that keeps the last circle
+    """
+
+    def __init__(self, search_margin=0.5, radius_tolerance=0.25, change_threshold=1.5,
+                 max_reuse_frames=30, jitter_tolerance=2):
+        self.search_margin = search_margin
+        self.radius_tolerance = radius_tolerance
+        self.change_threshold = change_threshold
+        self.max_reuse_frames = max_reuse_frames
+        self.jitter_tolerance = jitter_tolerance
+
+        self.circle = None
+        self.tracked = False  # last circle was found by the window search
+        self.difference = None  # last thumbnail difference, None when not compared
+        self.predictions = None
+        self.model_version = None
+        self.reused_frames = 0
+        self._thumbnail = None
+        self._candidate = None
+
+        self.counts = {"frames": 0, "tracked": 0, "detected": 0, "lost": 0, "classified": 0, "reused": 0}
+
+    def reset(self):
+        """Forget the circle and prediction (e.g. after the camera was switched)"""
+        self.circle = None
+        self.tracked = False
+        self.difference = None
+        self.predictions = None
+        self.model_version = None
+        self.reused_frames = 0
+        self._thumbnail = None
+        self._candidate = None
+
+    def locate(self, gray):
+        """
+        Find the coin circle in a frame, searching near the last known circle first
+
+        Args:
+            gray: Grayscale frame
+
+        Returns:
+            (x, y, radius) or None
+        """
+        self.counts["frames"] += 1
+        circle = self._search_window(gray) if self.circle is not None else None
+        self.tracked = circle is not None
+
+        if circle is None:
+            circle = detect_coin_circle(gray, max_radius=min(gray.shape) // 2)
+
+        if circle is not None and self.circle is not None and self._same_circle(circle, self.circle):
+            circle = self.circle
+
+        if self.tracked:
+            self.counts["tracked"] += 1
+        elif circle is not None:
+            self.counts["detected"] += 1
+        else:
+            self.counts["lost"] += 1
+
+        self.circle = circle
+        return circle
+
+    def _same_circle(self, a, b):
+        return all(abs(int(u) - int(v)) <= self.jitter_tolerance for u, v in zip(a, b))
+
+    def _search_window(self, gray):
+        """Strongest circle near the last one, or None"""
+        h, w = gray.shape[:2]
+        x, y, r = (int(v) for v in self.circle)
+
+        half = int(r * (1 + self.search_margin)) + 6  # blur border
+        x0, y0 = max(0, x - half), max(0, y - half)
+        x1, y1 = min(w, x + half + 1), min(h, y + half + 1)
+        window = gray[y0:y1, x0:x1]
+
+        circles = hough_circles(
+            window,
+            min_dist=max(window.shape),
+            min_radius=max(1, int(r * (1 - self.radius_tolerance))),
+            max_radius=min(min(h, w) // 2, int(np.ceil(r * (1 + self.radius_tolerance)))),
+        )
+        if circles is None:
+            return None
+        cx, cy, cr = circles[0]
+        # Same uint16 values as detect_coin_circle, so both give the same crop
+        return tuple(np.uint16((int(cx) + x0, int(cy) + y0, int(cr))))
+
+    def reuse_predictions(self, final_edge, model_version):
+        """
+        Last predictions if the crop barely changed since they were made
+
+        Args:
+            final_edge: Cropped edge image of the current frame
+            model_version: Version of the models that would classify it
+
+        Returns:
+            The last predictions dict, or None when the frame must be classified
+        """
+        self._candidate = _thumbnail(final_edge)
+        self.difference = None
+
+        if self.predictions is None or self._thumbnail is None or model_version != self.model_version:
+            return None
+        if self.max_reuse_frames and self.reused_frames >= self.max_reuse_frames:
+            return None
+
+        self.difference = float(np.mean(np.abs(self._candidate - self._thumbnail)))
+        if self.difference > self.change_threshold:
+            return None
+
+        self.reused_frames += 1
+        self.counts["reused"] += 1
+        return self.predictions
+
+    def update_predictions(self, predictions, model_version):
+        """Remember the predictions made on the frame last passed to reuse_predictions"""
+        self.counts["classified"] += 1
+        self.reused_frames = 0
+
+        # Failed model calls are retried on the next frame
+        if any("error" in prediction for prediction in predictions.values()):
+            self.predictions = self._thumbnail = None
+            return
+
+        self.predictions = predictions
+        self.model_version = model_version
+        self._thumbnail = self._candidate
@@ -0,0 +1,292 @@
+"""
+Upload Helpers
+Expands multipart uploads and zip/tar archives into individual images and
+enforces upload size limits
+"""
+import io
+import json
+import struct
+import tarfile
+import zipfile
+from pathlib import PurePosixPath
+
+from starlette.concurrency import run_in_threadpool
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+# Chunk size for reading uploads
+READ_CHUNK_SIZE = 1 << 20
+
+# Entries (of any kind: images, directories, other files) an archive may list.
+# Checked before the entry list is built, since it costs memory on its own.
+MAX_ARCHIVE_ENTRIES = 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload, request body or archive member exceeds its byte limit"""
+
+    def __init__(self, limit, what="Upload"):
+        super().__init__(f"{what} exceeds the size limit of {limit} bytes")
+        self.limit = limit
+
+
+class TooManyImagesError(ValueError):
+    """Raised when an upload holds more images (or archive entries) than allowed"""
+
+    def __init__(self, count, limit, what="images"):
+        super().__init__(f"Too many {what}: {count} (max {limit})")
+        self.count = count
+        self.limit = limit
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware rejecting request bodies above a byte limit with 413.
+
+    A declared Content-Length above the limit is rejected before any of the
+    body is read. Otherwise the body is counted as it streams in and the
+    request is cut off as soon as the limit is passed, so neither the
+    multipart parser nor the endpoint ever spools more than the limit.
+
+    Args:
+        app: ASGI application
+        max_bytes: Default body limit (None or 0 disables)
+        path_limits: Optional {path: max_bytes} overrides, e.g. for batch uploads
+    """
+
+    def __init__(self, app, max_bytes=None, path_limits=None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.path_limits.get(scope.get("path"), self.max_bytes) if scope["type"] == "http" else None
+        if not max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(send, max_bytes)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    if not rejected:
+                        rejected = True
+                        await self._reject(send, max_bytes)
+                    raise UploadTooLargeError(max_bytes, "Request body")
+            return message
+
+        async def guarded_send(message):
+            # The 413 has been sent; drop the app's own error response
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+    @staticmethod
+    async def _reject(send, max_bytes):
+        body = json.dumps({"detail": str(UploadTooLargeError(max_bytes, "Request body"))}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def read_upload(upload, max_bytes=None):
+    """
+    Read an UploadFile in chunks, stopping as soon as it exceeds max_bytes
+
+    Raises:
+        UploadTooLargeError: the file is larger than max_bytes
+    """
+    chunks = []
+    size = 0
+    while True:
+        chunk = await upload.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if max_bytes and size > max_bytes:
+            raise UploadTooLargeError(max_bytes, f"File '{upload.filename}'")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def is_archive(filename, content_type, data):
+    """Check whether an upload is a zip or tar archive"""
+    name = (filename or "").lower()
+    if name.endswith(ARCHIVE_EXTENSIONS):
+        return True
+    if content_type in ("application/zip", "application/x-zip-compressed",
+                        "application/x-tar", "application/gzip", "application/x-gzip"):
+        return True
+    return data[:4] == b"PK\x03\x04"
+
+
+def _is_image_name(name):
+    path = PurePosixPath(name)
+    return path.suffix.lower() in IMAGE_EXTENSIONS and not path.name.startswith(".")
+
+
+class _ArchiveBudget:
+    """Member count and byte limits shared by every archive and file of one upload"""
+
+    def __init__(self, max_images=None, max_image_bytes=None, max_total_bytes=None):
+        self.max_images = max_images
+        self.max_image_bytes = max_image_bytes
+        self.max_total_bytes = max_total_bytes
+        self.images = 0
+        self.total_bytes = 0
+
+    def add(self, label, size):
+        """Account for one image of (declared or actual) size before reading it"""
+        self.images += 1
+        if self.max_images and self.images > self.max_images:
+            raise TooManyImagesError(self.images, self.max_images)
+        if self.max_image_bytes and size > self.max_image_bytes:
+            raise UploadTooLargeError(self.max_image_bytes, label)
+        self.total_bytes += size
+        if self.max_total_bytes and self.total_bytes > self.max_total_bytes:
+            raise UploadTooLargeError(self.max_total_bytes, "Total image size")
+
+    def skip(self, size):
+        """Account for a non-image member that still has to be read past (tar)"""
+        self.total_bytes += size
+        if self.max_total_bytes and self.total_bytes > self.max_total_bytes:
+            raise UploadTooLargeError(self.max_total_bytes, "Total archive member size")
+
+    def read_member(self, label, stream):
+        """Read at most max_image_bytes (+1 to detect more) instead of trusting the header"""
+        limit = self.max_image_bytes
+        data = stream.read(limit + 1) if limit else stream.read()
+        if limit and len(data) > limit:
+            raise UploadTooLargeError(limit, label)
+        return data
+
+
+def _zip_entry_count(data):
+    """Entry count from the end-of-central-directory record (None if not found)"""
+    pos = data.rfind(b"PK\x05\x06", max(0, len(data) - 65557))
+    if pos < 0 or pos + 22 > len(data):
+        return None
+    return struct.unpack("<H", data[pos + 10:pos + 12])[0]
+
+
+def extract_archive(data, budget=None):
+    """
+    Extract image members of a zip or tar archive, in archive order
+
+    Member count and declared sizes are checked against the budget before
+    anything is decompressed, and each member is then read with a bounded
+    read, so a member that inflates past its declared size is caught too.
+    A tar stream has to be decompressed past every member, so the declared
+    size of every regular tar member (images or not) counts against the
+    total; zip members that are not images are never read.
+
+    Args:
+        data: Archive bytes
+        budget: _ArchiveBudget with the image count and byte limits (None: unlimited)
+
+    Returns:
+        List of (member name, image bytes) tuples
+
+    Raises:
+        TooManyImagesError: too many images or archive entries
+        UploadTooLargeError: a member or the total is larger than allowed
+        ValueError: corrupt archive, or a member not matching its header
+    """
+    budget = budget or _ArchiveBudget()
+
+    if zipfile.is_zipfile(io.BytesIO(data)):
+        entries = _zip_entry_count(data)
+        # 0xFFFF: zip64 or more entries than the record can hold
+        if entries is None or entries >= 0xFFFF or entries > MAX_ARCHIVE_ENTRIES:
+            raise TooManyImagesError(entries if entries is not None else "?", MAX_ARCHIVE_ENTRIES,
+                                     "archive entries")
+        try:
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                members = [info for info in archive.infolist()
+                           if not info.is_dir() and _is_image_name(info.filename)]
+                for info in members:
+                    budget.add(f"Archive member '{info.filename}'", info.file_size)
+                images = []
+                for info in members:
+                    with archive.open(info) as stream:
+                        data = budget.read_member(f"Archive member '{info.filename}'", stream)
+                    images.append((info.filename, data))
+                return images
+        except zipfile.BadZipFile:
+            # Also a member whose data does not match its header (size or CRC)
+            raise ValueError("Unsupported or corrupt archive")
+
+    try:
+        with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as archive:
+            members = []
+            for entries, member in enumerate(archive, start=1):
+                if entries > MAX_ARCHIVE_ENTRIES:
+                    raise TooManyImagesError(f"more than {MAX_ARCHIVE_ENTRIES}", MAX_ARCHIVE_ENTRIES,
+                                             "archive entries")
+                if not member.isfile():
+                    continue
+                if _is_image_name(member.name):
+                    budget.add(f"Archive member '{member.name}'", member.size)
+                    members.append(member)
+                else:
+                    budget.skip(member.size)
+            return [
+                (member.name, budget.read_member(f"Archive member '{member.name}'",
+                                                 archive.extractfile(member)))
+                for member in members
+            ]
+    except tarfile.TarError:
+        raise ValueError("Unsupported or corrupt archive")
+
+
+async def collect_images(files, max_image_bytes=None, max_images=None, max_total_bytes=None):
+    """
+    Read uploaded files, expanding archives in place
+
+    Archives are extracted in a worker thread, so the event loop keeps
+    serving other requests while they decompress.
+
+    Args:
+        files: List of FastAPI UploadFile objects
+        max_image_bytes: Limit per image file or archive member
+        max_images: Limit on the number of images over all files and archives
+        max_total_bytes: Limit on the summed (decompressed) image bytes
+
+    Returns:
+        List of (filename, image bytes) tuples in upload order
+
+    Raises:
+        TooManyImagesError: more than max_images images
+        UploadTooLargeError: an image or the total is larger than allowed
+    """
+    budget = _ArchiveBudget(max_images, max_image_bytes, max_total_bytes)
+    images = []
+    for upload in files:
+        data = await read_upload(upload)
+        if is_archive(upload.filename, upload.content_type, data):
+            prefix = upload.filename or "archive"
+            members = await run_in_threadpool(extract_archive, data, budget)
+            images.extend((f"{prefix}/{name}", member) for name, member in members)
+        else:
+            budget.add(f"File '{upload.filename}'", len(data))
+            images.append((upload.filename, data))
+    return images
@@ -0,0 +1,187 @@
+"""
+Benchmark reduced-resolution JPEG decoding ('reduced') against full decoding
+('full') as used by the API (see IMAGE_DECODE in api/README.md).
+
+Per decode mode, each image is decoded with api.predictor.decode_image and
+resized to the 256x256 model input with resize_with_aspect_ratio, exactly as
+preprocess_image does. The report shows:
+
+- decode and decode + resize latency (mean / p99, best of --repeat runs)
+- decoded image size in MB (the largest allocation per request)
+- pixel difference of the 256x256 resized images (mean / max abs, 0-255)
+- circle agreement: detected circles within --tolerance pixels (or both none)
+
+Synthetic images are 12 MP phone-camera-sized JPEGs with a coin, half of them
+stored rotated with an EXIF orientation tag; pass JPEG files or dataset
+directories to measure real photos.
+
+Usage:
+    python benchmark_decode.py --synthetic 20
+    python benchmark_decode.py dataset_splitted/test --limit 200
+    python benchmark_decode.py --synthetic 20 --report decode_report.json
+"""
+
+import argparse
+import io
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from api.predictor import IMAGE_DECODE_MODES, configure_image_decode, decode_image, detect_circle
+from benchmark_hough import same_circle
+from feature_parity import collect_images
+from preprocessing import resize_with_aspect_ratio
+
+IMAGE_SIZE = (256, 256)
+
+
+def synthetic_jpegs(count, seed=0, size=(4032, 3024)):
+    """
+    Phone-camera-sized JPEGs with one coin
+
+    Every second image is stored rotated by 90 degrees with EXIF orientation 6,
+    as phones do, so decoding must rotate it back.
+
+    Yields:
+        (name, JPEG bytes)
+    """
+    rng = np.random.default_rng(seed)
+    w, h = size
+    for i in range(count):
+        img = (rng.random((h // 8, w // 8, 3)) * 60 + 40).astype(np.uint8)
+        img = cv2.resize(img, (w, h), interpolation=cv2.INTER_CUBIC)
+        r = int(rng.uniform(0.2, 0.35) * h)
+        x, y = int(rng.integers(r, w - r)), int(rng.integers(r, h - r))
+        tone = int(rng.integers(140, 220))
+        cv2.circle(img, (x, y), r, (tone, tone - 10, tone - 25), -1)
+        cv2.circle(img, (x, y), int(r * 0.85), (tone - 50,) * 3, r // 30)
+        cv2.putText(img, str(rng.choice([100, 200, 500, 1000])), (x - r // 2, y + r // 6),
+                    cv2.FONT_HERSHEY_SIMPLEX, r / 70, (tone - 80,) * 3, r // 20)
+
+        pil_image = Image.fromarray(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        exif = pil_image.getexif()
+        if i % 2:
+            # Stored rotated; orientation 6 tells viewers to rotate 90 degrees clockwise
+            pil_image = pil_image.transpose(Image.Transpose.ROTATE_90)
+            exif[0x0112] = 6
+        buffer = io.BytesIO()
+        pil_image.save(buffer, format='JPEG', quality=90, exif=exif.tobytes())
+        yield f'synthetic_{i}', buffer.getvalue()
+
+
+def file_jpegs(paths, limit=None):
+    for path in collect_images(paths, limit):
+        yield str(path), path.read_bytes()
+
+
+def time_mode(data, mode, repeat):
+    """(resized image, decoded shape, best decode ms, best decode + resize ms) for one mode"""
+    configure_image_decode(mode)
+    best_decode = best_total = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        decoded, _ = decode_image(data, min_size=IMAGE_SIZE)
+        decoded_at = time.perf_counter()
+        resized = resize_with_aspect_ratio(decoded, IMAGE_SIZE)
+        done = time.perf_counter()
+        best_decode = min(best_decode, (decoded_at - start) * 1000)
+        best_total = min(best_total, (done - start) * 1000)
+    return resized, decoded.shape, best_decode, best_total
+
+
+def run(images, repeat, tolerance):
+    """Per-image results for both decode modes"""
+    rows = []
+    for name, data in images:
+        row = {'image': name}
+        resized = {}
+        for mode in IMAGE_DECODE_MODES:
+            resized[mode], shape, decode_ms, total_ms = time_mode(data, mode, repeat)
+            row[f'{mode}_decode_ms'] = decode_ms
+            row[f'{mode}_total_ms'] = total_ms
+            row[f'{mode}_mb'] = int(np.prod(shape)) / 1e6
+            row[f'{mode}_shape'] = shape[:2]
+            row[f'{mode}_circle'] = detect_circle(resized[mode])
+        diff = np.abs(resized['full'].astype(np.int16) - resized['reduced'].astype(np.int16))
+        row['pixel_mean_diff'] = float(diff.mean())
+        row['pixel_max_diff'] = int(diff.max())
+        row['agree'] = same_circle(row['full_circle'], row['reduced_circle'], tolerance)
+        rows.append(row)
+    configure_image_decode('full')
+    return rows
+
+
+def summarize(rows):
+    summary = {
+        'images': len(rows),
+        'circle_agreement': float(np.mean([row['agree'] for row in rows])),
+        'pixel_mean_diff': float(np.mean([row['pixel_mean_diff'] for row in rows])),
+        'pixel_max_diff': int(max(row['pixel_max_diff'] for row in rows)),
+    }
+    for mode in IMAGE_DECODE_MODES:
+        decode = np.array([row[f'{mode}_decode_ms'] for row in rows])
+        total = np.array([row[f'{mode}_total_ms'] for row in rows])
+        summary[mode] = {
+            'decode_mean_ms': float(decode.mean()),
+            'decode_p99_ms': float(np.percentile(decode, 99)),
+            'total_mean_ms': float(total.mean()),
+            'total_p99_ms': float(np.percentile(total, 99)),
+            'decoded_mb': float(np.mean([row[f'{mode}_mb'] for row in rows])),
+        }
+    summary['speedup_mean'] = summary['full']['total_mean_ms'] / max(summary['reduced']['total_mean_ms'], 1e-9)
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n{summary['images']} images, decode + resize to {IMAGE_SIZE[0]}x{IMAGE_SIZE[1]}")
+    print(f"{'mode':8s} | {'decode ms':>9} | {'p99':>7} | {'+resize ms':>10} | {'p99':>7} | {'decoded MB':>10}")
+    print("-" * 66)
+    for mode in IMAGE_DECODE_MODES:
+        s = summary[mode]
+        print(f"{mode:8s} | {s['decode_mean_ms']:9.2f} | {s['decode_p99_ms']:7.2f} | "
+              f"{s['total_mean_ms']:10.2f} | {s['total_p99_ms']:7.2f} | {s['decoded_mb']:10.2f}")
+    print(f"Mean speedup: {summary['speedup_mean']:.2f}x   "
+          f"Circle agreement: {summary['circle_agreement'] * 100:.1f}%   "
+          f"Pixel diff mean/max: {summary['pixel_mean_diff']:.2f}/{summary['pixel_max_diff']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare reduced-resolution and full JPEG decoding',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('paths', nargs='*', help='JPEG files or directories')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Number of synthetic 12 MP JPEGs')
+    parser.add_argument('--limit', type=int, default=None, help='Max images from paths')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per image (best is kept)')
+    parser.add_argument('--tolerance', type=float, default=2.0,
+                        help='Max center/radius difference in pixels to agree (default: 2)')
+    parser.add_argument('--report', default=None, help='Also save the summary as JSON')
+    args = parser.parse_args()
+
+    images = list(file_jpegs(args.paths, args.limit))
+    if args.synthetic:
+        images += list(synthetic_jpegs(args.synthetic))
+    if not images:
+        print("Error: No images (pass paths or --synthetic N)")
+        sys.exit(1)
+
+    rows = run(images, args.repeat, args.tolerance)
+    summary = summarize(rows)
+    print_summary(summary)
+    for row in [row for row in rows if not row['agree']][:5]:
+        print(f"  differs: {row['image']}: full={row['full_circle']} reduced={row['reduced_circle']}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"\n[OK] Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
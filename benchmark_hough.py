@@ -0,0 +1,223 @@
+"""
+Benchmark the coarse-to-fine ('pyramid') coin circle detector against the
+full-resolution Hough detector ('full').
+
+For every image both detectors run on the grayscale exactly as the pipelines
+use it: the 256x256 aspect-preserving resize of the API and the 512x512
+padded resize of test_model.py. The report shows per detector:
+
+- latency mean / p50 / p99 (best of --repeat runs per image)
+- detection rate, and hit rate against ground truth (synthetic images only)
+- agreement: both detectors find nothing, or centers and radii lie within
+  --tolerance pixels of each other
+
+Synthetic images are noisy coin-like frames with a known circle (and a share
+of empty frames); pass image files or dataset directories to measure real
+images (agreement only, there is no ground truth).
+
+Usage:
+    python benchmark_hough.py --synthetic 200
+    python benchmark_hough.py dataset_splitted/test --limit 300
+    python benchmark_hough.py --synthetic 200 --report hough_report.json
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from feature_parity import collect_images
+from preprocessing import (
+    CIRCLE_DETECTORS,
+    ImageGradients,
+    detect_coin_circle,
+    resize_with_aspect_ratio,
+    resize_with_padding,
+)
+
+# Gray image preparation and max radius per pipeline (see api/predictor.py, test_model.py)
+PIPELINES = {
+    'api': (lambda image: resize_with_aspect_ratio(image, (256, 256)), lambda gray: min(gray.shape) // 2),
+    'hybrid': (lambda image: resize_with_padding(image, (512, 512)), lambda gray: 200),
+}
+
+
+def synthetic_images(count, seed=0, empty_share=0.2):
+    """
+    Coin-like frames with known circles
+
+    Yields:
+        (name, BGR image, (x, y, radius) or None) - the circle in image coordinates
+    """
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        h, w = rng.choice([(480, 640), (720, 960), (600, 600), (1080, 810)])
+        img = (rng.random((h, w, 3)) * 70 + 20).astype(np.uint8)
+        # Uneven lighting
+        ramp = np.linspace(0, rng.uniform(0, 60), w, dtype=np.float32)[np.newaxis, :, np.newaxis]
+        img = np.clip(img + ramp, 0, 255).astype(np.uint8)
+
+        circle = None
+        if rng.random() >= empty_share:
+            r = int(rng.uniform(0.18, 0.42) * min(h, w))
+            x = int(rng.integers(r, w - r))
+            y = int(rng.integers(r, h - r))
+            tone = int(rng.integers(120, 220))
+            cv2.circle(img, (x, y), r, (tone, tone - 10, tone - 20), -1)
+            cv2.circle(img, (x, y), int(r * 0.85), (tone - 40,) * 3, max(2, r // 40))
+            cv2.putText(img, str(rng.choice([100, 200, 500, 1000])), (x - r // 2, y + r // 6),
+                        cv2.FONT_HERSHEY_SIMPLEX, r / 70, (tone - 70,) * 3, max(2, r // 25))
+            circle = (x, y, r)
+        else:
+            # Clutter without a coin
+            for _ in range(int(rng.integers(0, 4))):
+                p1 = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+                p2 = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+                cv2.rectangle(img, p1, p2, (int(rng.integers(60, 200)),) * 3, -1)
+        yield f'synthetic_{i}', cv2.GaussianBlur(img, (3, 3), 0), circle
+
+
+def file_images(paths, limit=None):
+    for path in collect_images(paths, limit):
+        image = cv2.imread(str(path))
+        if image is not None:
+            yield str(path), image, None
+
+
+def transform_circle(circle, image_shape, pipeline):
+    """Ground-truth circle in the coordinates of the resized pipeline image"""
+    if circle is None:
+        return None
+    h, w = image_shape[:2]
+    size = 256 if pipeline == 'api' else 512
+    x, y, r = circle
+    if pipeline == 'api':
+        # resize_with_aspect_ratio zooms to fill, then center-crops
+        scale = max(size / w, size / h)
+        offset_x = -((int(w * scale) - size) // 2)
+        offset_y = -((int(h * scale) - size) // 2)
+    else:
+        # resize_with_padding fits, then centers on a padded canvas
+        scale = min(size / w, size / h)
+        offset_x = (size - int(w * scale)) // 2
+        offset_y = (size - int(h * scale)) // 2
+    return (x * scale + offset_x, y * scale + offset_y, r * scale)
+
+
+def same_circle(a, b, tolerance):
+    """Both None, or centers and radii within tolerance pixels"""
+    if a is None or b is None:
+        return a is None and b is None
+    a, b = np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    return bool(np.hypot(*(a[:2] - b[:2])) <= tolerance and abs(a[2] - b[2]) <= tolerance)
+
+
+def time_detector(gray, max_radius, detector, repeat):
+    """(circle, best-of-repeat milliseconds)"""
+    best = float('inf')
+    circle = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        circle = detect_coin_circle(gray, max_radius=max_radius, detector=detector)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return circle, best
+
+
+def run(images, pipeline, repeat, tolerance):
+    """Per-image results for both detectors on one pipeline"""
+    prepare, radius_of = PIPELINES[pipeline]
+    rows = []
+    for name, image, truth in images:
+        gray = ImageGradients(prepare(image)).gray
+        row = {'image': name, 'truth': transform_circle(truth, image.shape, pipeline)}
+        for detector in CIRCLE_DETECTORS:
+            circle, ms = time_detector(gray, radius_of(gray), detector, repeat)
+            row[detector] = None if circle is None else tuple(int(v) for v in circle)
+            row[f'{detector}_ms'] = ms
+        row['agree'] = same_circle(row['full'], row['pyramid'], tolerance)
+        rows.append(row)
+    return rows
+
+
+def summarize(rows, tolerance):
+    has_truth = any(row['truth'] is not None for row in rows)
+    summary = {'images': len(rows), 'agreement': float(np.mean([row['agree'] for row in rows]))}
+    for detector in CIRCLE_DETECTORS:
+        times = np.array([row[f'{detector}_ms'] for row in rows])
+        stats = {
+            'mean_ms': float(times.mean()),
+            'p50_ms': float(np.percentile(times, 50)),
+            'p99_ms': float(np.percentile(times, 99)),
+            'detection_rate': float(np.mean([row[detector] is not None for row in rows])),
+        }
+        if has_truth:
+            # Hit: finds the true coin, or correctly finds nothing on an empty frame
+            stats['hit_rate'] = float(np.mean([
+                same_circle(row['truth'], row[detector], max(tolerance, 0.05 * row['truth'][2]))
+                if row['truth'] is not None else row[detector] is None
+                for row in rows
+            ]))
+        summary[detector] = stats
+    summary['speedup_mean'] = summary['full']['mean_ms'] / max(summary['pyramid']['mean_ms'], 1e-9)
+    return summary
+
+
+def print_summary(pipeline, summary):
+    print(f"\n[{pipeline}] {summary['images']} images")
+    print(f"{'detector':10s} | {'mean ms':>8} | {'p50 ms':>7} | {'p99 ms':>7} | {'detected':>8} | {'hit':>7}")
+    print("-" * 64)
+    for detector in CIRCLE_DETECTORS:
+        s = summary[detector]
+        hit = f"{s['hit_rate'] * 100:6.1f}%" if 'hit_rate' in s else f"{'-':>7}"
+        print(f"{detector:10s} | {s['mean_ms']:8.3f} | {s['p50_ms']:7.3f} | {s['p99_ms']:7.3f} | "
+              f"{s['detection_rate'] * 100:7.1f}% | {hit}")
+    print(f"Agreement pyramid vs full: {summary['agreement'] * 100:.1f}%   "
+          f"Mean speedup: {summary['speedup_mean']:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare pyramid and full-resolution Hough circle detection',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('paths', nargs='*', help='Image files or directories')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Number of synthetic images with known circles')
+    parser.add_argument('--pipeline', choices=['api', 'hybrid', 'both'], default='both')
+    parser.add_argument('--limit', type=int, default=None, help='Max images from paths')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per image (best is kept)')
+    parser.add_argument('--tolerance', type=float, default=4.0,
+                        help='Max center/radius difference in pixels to agree (default: 4)')
+    parser.add_argument('--show-disagreements', type=int, default=5,
+                        help='Disagreeing images listed per pipeline')
+    parser.add_argument('--report', default=None, help='Also save the summary as JSON')
+    args = parser.parse_args()
+
+    images = list(file_images(args.paths, args.limit))
+    if args.synthetic:
+        images += list(synthetic_images(args.synthetic))
+    if not images:
+        print("Error: No images (pass paths or --synthetic N)")
+        sys.exit(1)
+
+    pipelines = ['api', 'hybrid'] if args.pipeline == 'both' else [args.pipeline]
+    report = {}
+    for pipeline in pipelines:
+        rows = run(images, pipeline, args.repeat, args.tolerance)
+        summary = summarize(rows, args.tolerance)
+        print_summary(pipeline, summary)
+        for row in [row for row in rows if not row['agree']][:args.show_disagreements]:
+            print(f"  differs: {row['image']}: full={row['full']} pyramid={row['pyramid']}")
+        report[pipeline] = summary
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n[OK] Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+"""
+Streaming tf.data input pipeline for CNN training.
+
+Builds (edge image, label) batches for ``coin_classifier_cnn_8class.keras``
+straight from the dataset folders without holding decoded images in Python
+lists:
+
+    file paths -> read bytes -> preprocess_image (parallel) -> cache -> shuffle -> batch -> prefetch
+
+Preprocessing is the exact API pipeline (api/predictor.py preprocess_image:
+resize, Hough crop, Sobel), so training and serving inputs match. The 256x256
+uint8 edge images are cached to a local file during the first epoch; later
+epochs read the cache at disk speed and skip decoding and Sobel entirely.
+The cache is only complete after one full pass - delete it after changing
+preprocessing or the image list.
+
+Usage:
+    python cnn_dataset.py dataset_splitted --cache cache/edges --epochs 2
+
+Training:
+    from cnn_dataset import make_datasets
+    train_ds, val_ds = make_datasets('dataset_splitted', cache_dir='cache')
+    model.fit(train_ds, validation_data=val_ds, epochs=30)
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from api.predictor import get_class_names, preprocess_image
+from feature_parity import collect_images, image_label
+
+IMAGE_SIZE = (256, 256)
+
+
+def list_labelled(dataset_dir):
+    """
+    All labelled image paths of a dataset tree
+
+    Labels are 8-class indices (get_class_names order) taken from the
+    ``Koin Rp X/angka|gambar`` folders; unlabelled images are skipped.
+
+    Returns:
+        (paths, labels)
+    """
+    class_names = get_class_names()
+    paths, labels = [], []
+    for path in collect_images([dataset_dir]):
+        label = image_label(path, class_names)
+        if label is not None:
+            paths.append(str(path))
+            labels.append(label)
+    return paths, labels
+
+
+def list_dataset(dataset_dir, validation_split=0.2, seed=42):
+    """
+    Labelled image paths of a dataset tree, split into train/validation
+
+    The split is stratified per class (see list_labelled for the labels).
+
+    Returns:
+        ((train_paths, train_labels), (val_paths, val_labels))
+    """
+    rng = np.random.default_rng(seed)
+    train, val = ([], []), ([], [])
+    by_class = {}
+    for path, label in zip(*list_labelled(dataset_dir)):
+        by_class.setdefault(label, []).append(path)
+
+    for label, paths in sorted(by_class.items()):
+        paths = [paths[i] for i in rng.permutation(len(paths))]
+        n_val = int(round(len(paths) * validation_split))
+        for split, chunk in ((val, paths[:n_val]), (train, paths[n_val:])):
+            split[0].extend(chunk)
+            split[1].extend([label] * len(chunk))
+    return train, val
+
+
+def _edge_image(image_bytes):
+    """numpy_function body: raw image bytes -> uint8 edge image (H, W)"""
+    try:
+        _, final_edge, _ = preprocess_image(bytes(image_bytes), IMAGE_SIZE, steps=(), step_format=None)
+    except ValueError:
+        # Undecodable file: an empty edge image keeps the batch shape
+        final_edge = np.zeros((IMAGE_SIZE[1], IMAGE_SIZE[0]), dtype=np.uint8)
+    return final_edge
+
+
+def make_dataset(paths, labels, batch_size=32, cache_file=None, shuffle=True, seed=42):
+    """
+    Streaming tf.data pipeline over image files
+
+    Args:
+        paths: Image file paths
+        labels: Class indices
+        batch_size: Batch size
+        cache_file: File prefix for the edge cache ('' = in memory, None = no cache)
+        shuffle: Reshuffle every epoch (after the cache)
+        seed: Shuffle seed
+
+    Returns:
+        tf.data.Dataset of (float32 [B, H, W, 1] in 0-1, int64 [B])
+    """
+    import tensorflow as tf
+
+    autotune = tf.data.AUTOTUNE
+    height, width = IMAGE_SIZE[1], IMAGE_SIZE[0]
+
+    def preprocess(path, label):
+        edge = tf.numpy_function(_edge_image, [tf.io.read_file(path)], tf.uint8)
+        edge.set_shape((height, width))
+        return edge, label
+
+    def normalize(edges, labels):
+        # Same scaling as predictor._cnn_input, applied after the uint8 cache
+        return tf.expand_dims(tf.cast(edges, tf.float32) / 255.0, -1), labels
+
+    ds = tf.data.Dataset.from_tensor_slices((list(paths), np.asarray(labels, dtype=np.int64)))
+    ds = ds.map(preprocess, num_parallel_calls=autotune, deterministic=False)
+    if cache_file is not None:
+        if cache_file:
+            Path(cache_file).parent.mkdir(parents=True, exist_ok=True)
+        ds = ds.cache(cache_file)
+    if shuffle:
+        ds = ds.shuffle(min(len(paths), 2048), seed=seed, reshuffle_each_iteration=True)
+    ds = ds.batch(batch_size)
+    ds = ds.map(normalize, num_parallel_calls=autotune)
+    return ds.prefetch(autotune)
+
+
+def make_datasets(dataset_dir, batch_size=32, cache_dir='cache', validation_split=0.2, seed=42):
+    """
+    Train and validation pipelines with separate edge caches
+
+    Args:
+        dataset_dir: Dataset root (e.g. dataset_splitted)
+        batch_size: Batch size
+        cache_dir: Directory for the cache files (None = no cache)
+        validation_split: Fraction of each class held out
+        seed: Split / shuffle seed
+
+    Returns:
+        (train_ds, val_ds)
+    """
+    (train_paths, train_labels), (val_paths, val_labels) = list_dataset(
+        dataset_dir, validation_split, seed
+    )
+    cache = (lambda name: None) if cache_dir is None else (lambda name: str(Path(cache_dir) / name))
+    train_ds = make_dataset(train_paths, train_labels, batch_size, cache('edges_train'),
+                            shuffle=True, seed=seed)
+    val_ds = make_dataset(val_paths, val_labels, batch_size, cache('edges_val'), shuffle=False)
+    return train_ds, val_ds
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the streaming CNN input pipeline (epoch 1 fills the cache)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('dataset', help='Dataset root (e.g. dataset_splitted)')
+    parser.add_argument('--cache', default='cache/edges',
+                        help="Edge cache file prefix ('' = in memory, default: cache/edges)")
+    parser.add_argument('--no-cache', action='store_true', help='Disable the edge cache')
+    parser.add_argument('--batch-size', type=int, default=32, help='Batch size (default: 32)')
+    parser.add_argument('--epochs', type=int, default=2, help='Epochs to time (default: 2)')
+    args = parser.parse_args()
+
+    (paths, labels), _ = list_dataset(args.dataset, validation_split=0.0)
+    if not paths:
+        print(f"Error: No labelled images found in {args.dataset}")
+        sys.exit(1)
+
+    ds = make_dataset(paths, labels, args.batch_size, None if args.no_cache else args.cache)
+    print(f"Images: {len(paths)}  Classes: {len(set(labels))}")
+    for epoch in range(1, args.epochs + 1):
+        start = time.perf_counter()
+        count = sum(int(batch_labels.shape[0]) for _, batch_labels in ds)
+        elapsed = time.perf_counter() - start
+        print(f"Epoch {epoch}: {count} images in {elapsed:.1f}s ({count / elapsed:.1f} images/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+"""
+Compiled Random Forest inference.
+
+Flattens a fitted scikit-learn RandomForestClassifier (and optionally its
+StandardScaler) into plain NumPy arrays. One vectorized traversal of all
+trees for a whole batch returns labels and probabilities together, instead of
+scaler.transform + predict + predict_proba walking every tree twice.
+
+Results are bit-identical to scikit-learn: scaling uses the same in-place
+float operations, features are cast to float32 before the threshold
+comparisons (as sklearn trees do), and tree probabilities are accumulated in
+estimator order before dividing by the number of trees.
+
+Usage:
+    forest = CompiledForest.from_sklearn(model, scaler)
+    labels, probabilities = forest.predict(features)   # features: (n, n_features)
+
+    python compiled_forest.py models/coin_classifier_8class_model.pkl \\
+        models/coin_classifier_8class_scaler.pkl        # parity + speed check
+"""
+
+import argparse
+import pickle
+import sys
+import time
+
+import numpy as np
+import sklearn
+
+TREE_LEAF = -1
+
+# scikit-learn < 1.4 stores class counts in tree_.value and normalizes them
+# in DecisionTreeClassifier.predict_proba; newer versions store fractions
+_SKLEARN_NORMALIZES_PROBA = tuple(int(p) for p in sklearn.__version__.split('.')[:2]) < (1, 4)
+
+
+class CompiledForest:
+    """
+    Array-backed Random Forest (+ optional standard scaling)
+
+    Args:
+        feature, threshold, left, right, missing_left: Per-node arrays of all trees
+            (child indices point into the concatenated node arrays; leaves point to themselves)
+        value: Per-node class probabilities (n_nodes, n_classes)
+        roots: Root node index of every tree
+        max_depth: Maximum tree depth
+        classes: Class labels (as model.classes_)
+        mean, scale: StandardScaler parameters, or None
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots,
+                 max_depth, classes, mean=None, scale=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes = classes
+        self.mean = mean
+        self.scale = scale
+
+    @classmethod
+    def from_sklearn(cls, model, scaler=None):
+        """Compile a fitted RandomForestClassifier and optional StandardScaler"""
+        if getattr(model, 'n_outputs_', 1) != 1:
+            raise ValueError("Multi-output forests are not supported")
+
+        n_classes = int(model.n_classes_)
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == TREE_LEAF
+            own = np.arange(offset, offset + n_nodes)
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, own, tree.children_left + offset))
+            rights.append(np.where(is_leaf, own, tree.children_right + offset))
+            if 'missing_go_to_left' in tree.__getstate__()['nodes'].dtype.names:
+                missing.append(tree.__getstate__()['nodes']['missing_go_to_left'].astype(bool))
+            else:
+                missing.append(np.zeros(n_nodes, dtype=bool))
+
+            value = tree.value[:, 0, :n_classes]
+            if _SKLEARN_NORMALIZES_PROBA:
+                normalizer = value.sum(axis=1)[:, np.newaxis]
+                normalizer[normalizer == 0.0] = 1.0
+                value = value / normalizer
+            values.append(value)
+
+            roots.append(offset)
+            max_depth = max(max_depth, tree.max_depth)
+            offset += n_nodes
+
+        mean = scale = None
+        if scaler is not None:
+            mean = None if scaler.mean_ is None or not scaler.with_mean else np.asarray(scaler.mean_)
+            scale = None if scaler.scale_ is None or not scaler.with_std else np.asarray(scaler.scale_)
+
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            missing_left=np.concatenate(missing),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.array(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_),
+            mean=mean,
+            scale=scale,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def transform(self, X):
+        """Standard scaling exactly as StandardScaler.transform (dense input)"""
+        X = np.array(X, dtype=X.dtype if X.dtype in (np.float32, np.float64) else np.float64)
+        if self.mean is not None:
+            X -= self.mean.astype(X.dtype)
+        if self.scale is not None:
+            X /= self.scale.astype(X.dtype)
+        return X
+
+    def leaves(self, X_scaled):
+        """Leaf node index per (tree, sample), all trees traversed together"""
+        X32 = np.asarray(X_scaled, dtype=np.float32)
+        samples = np.arange(X32.shape[0])[np.newaxis, :]
+        nodes = np.repeat(self.roots[:, np.newaxis], X32.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            x = X32[samples, self.feature[nodes]]
+            go_left = x <= self.threshold[nodes]
+            nan = np.isnan(x)
+            if nan.any():
+                go_left = np.where(nan, self.missing_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def predict_proba_scaled(self, X_scaled):
+        """Mean tree probabilities for already scaled features"""
+        nodes = self.leaves(X_scaled)
+        proba = np.zeros((nodes.shape[1], self.value.shape[1]), dtype=np.float64)
+        # Accumulate in estimator order, like RandomForestClassifier.predict_proba
+        for tree_nodes in nodes:
+            proba += self.value[tree_nodes]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        """
+        Scale, then traverse the forest once
+
+        Args:
+            X: Feature matrix (n_samples, n_features) or one feature vector
+
+        Returns:
+            (labels, probabilities) - labels as model.predict, probabilities as model.predict_proba
+        """
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        proba = self.predict_proba_scaled(self.transform(X))
+        return self.classes.take(np.argmax(proba, axis=1), axis=0), proba
+
+
+def check_parity(forest, model, scaler, X):
+    """Whether compiled labels/probabilities are bit-identical to scikit-learn on X"""
+    X_scaled = scaler.transform(X) if scaler is not None else X
+    labels, proba = forest.predict(X)
+    return np.array_equal(labels, model.predict(X_scaled)) and np.array_equal(proba, model.predict_proba(X_scaled))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check compiled Random Forest parity and speed')
+    parser.add_argument('model', help='Pickled RandomForestClassifier')
+    parser.add_argument('scaler', nargs='?', default=None, help='Pickled StandardScaler')
+    parser.add_argument('--features', default=None,
+                        help='.npy feature matrix to check (default: random samples around the scaler mean)')
+    parser.add_argument('--samples', type=int, default=1000, help='Random samples (default: 1000)')
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        model = pickle.load(f)
+    scaler = None
+    if args.scaler:
+        with open(args.scaler, 'rb') as f:
+            scaler = pickle.load(f)
+
+    if args.features:
+        X = np.load(args.features)
+    else:
+        rng = np.random.default_rng(0)
+        n_features = model.n_features_in_
+        mean = scaler.mean_ if scaler is not None else np.zeros(n_features)
+        spread = scaler.scale_ if scaler is not None else np.ones(n_features)
+        X = mean + rng.standard_normal((args.samples, n_features)) * spread
+
+    forest = CompiledForest.from_sklearn(model, scaler)
+    print(f"Compiled {forest.n_trees} trees, {len(forest.feature)} nodes, max depth {forest.max_depth}")
+
+    if not check_parity(forest, model, scaler, X):
+        print("[FAIL] Compiled forest differs from scikit-learn")
+        sys.exit(1)
+    print(f"[OK] Bit-identical labels and probabilities on {len(X)} samples")
+
+    for batch in (1, 32):
+        runs = max(1, 200 // batch)
+        start = time.perf_counter()
+        for i in range(runs):
+            Xb = X[i * batch % len(X):][:batch]
+            Xs = scaler.transform(Xb) if scaler is not None else Xb
+            model.predict(Xs)
+            model.predict_proba(Xs)
+        sk_ms = (time.perf_counter() - start) * 1000 / runs
+        start = time.perf_counter()
+        for i in range(runs):
+            forest.predict(X[i * batch % len(X):][:batch])
+        compiled_ms = (time.perf_counter() - start) * 1000 / runs
+        print(f"Batch {batch:3d}: sklearn {sk_ms:7.2f} ms  compiled {compiled_ms:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
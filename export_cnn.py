@@ -0,0 +1,205 @@
+"""
+Export the 8-class CNN to a lightweight CPU runtime (TFLite or ONNX).
+
+The API loads the exported file with CNN_RUNTIME=tflite or CNN_RUNTIME=onnx
+(see api/cnn_runtime.py), which avoids importing TensorFlow/Keras at serve
+time when tflite-runtime / ai-edge-litert or onnxruntime is installed.
+
+Quantization (TFLite only):
+    dynamic  - int8 weights, float activations (no calibration data)
+    float16  - float16 weights
+    int8     - full integer weights and activations; needs --calibration
+               (edge images drawn from the training directory,
+               default dataset_splitted/train)
+
+--verify runs the Keras model and the exported model on every image of a
+held-out directory (default dataset_splitted/test) and fails unless top-1
+labels agree on at least --min-agreement of images. The directory is used
+as is, so it must not contain training images.
+
+Usage:
+    python export_cnn.py --format tflite --verify
+    python export_cnn.py --format tflite --quantize int8 --calibration --verify
+    python export_cnn.py --format onnx --verify dataset_splitted/test --min-agreement 1.0
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from api.cnn_runtime import CNN_MODEL_FILES, load_cnn_runtime
+from api.predictor import MODELS_DIR, _cnn_input, get_class_names, preprocess_image
+
+QUANTIZATIONS = ('none', 'dynamic', 'float16', 'int8')
+
+# Split directories of the dataset (see README.md): calibration images come
+# from training data, parity and accuracy are measured on the held-out test set
+TRAIN_DIR = 'dataset_splitted/train'
+TEST_DIR = 'dataset_splitted/test'
+
+
+def edge_inputs(paths):
+    """CNN inputs (H, W, 1) float32 for image files, exactly as the API builds them"""
+    inputs = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            _, final_edge, _ = preprocess_image(f.read(), steps=(), step_format=None)
+        inputs.append(_cnn_input(final_edge))
+    return np.stack(inputs)
+
+
+def calibration_inputs(dataset_dir, count=200, seed=42):
+    """Random edge images of a training directory for int8 calibration"""
+    from cnn_dataset import list_labelled
+
+    paths, _ = list_labelled(dataset_dir)
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(len(paths), size=min(count, len(paths)), replace=False)
+    return edge_inputs([paths[i] for i in chosen])
+
+
+def export_tflite(model, output_path, quantize='none', calibration=None):
+    """Convert a Keras model to TFLite with optional post-training quantization"""
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantize != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantize == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantize == 'int8':
+        if calibration is None or not len(calibration):
+            raise ValueError('int8 quantization needs calibration images (--calibration)')
+
+        def representative_dataset():
+            for sample in calibration:
+                yield [sample[np.newaxis].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+
+    Path(output_path).write_bytes(converter.convert())
+
+
+def export_onnx(model, output_path, opset=13):
+    """Convert a Keras model to ONNX (requires tf2onnx)"""
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name='input'),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=str(output_path))
+
+
+def verify(models_dir, runtime, filename, dataset_dir, limit=None, batch_size=32):
+    """
+    Top-1 parity of an exported model against the Keras model on a held-out directory
+
+    Returns:
+        dict with image count, agreement and both accuracies
+    """
+    from cnn_dataset import list_labelled
+
+    paths, labels = list_labelled(dataset_dir)
+    paths, labels = paths[:limit], np.array(labels[:limit])
+    reference = load_cnn_runtime(models_dir, 'keras')
+    candidate = load_cnn_runtime(models_dir, runtime, filename=filename)
+
+    ref_top1, cand_top1 = [], []
+    for start in range(0, len(paths), batch_size):
+        batch = edge_inputs(paths[start:start + batch_size])
+        ref_top1.append(np.argmax(reference.predict(batch), axis=1))
+        cand_top1.append(np.argmax(candidate.predict(batch), axis=1))
+    ref_top1, cand_top1 = np.concatenate(ref_top1), np.concatenate(cand_top1)
+
+    return {
+        'images': len(paths),
+        'agreement': float(np.mean(ref_top1 == cand_top1)),
+        'accuracy_keras': float(np.mean(ref_top1 == labels)),
+        'accuracy_exported': float(np.mean(cand_top1 == labels)),
+        'mismatches': [paths[i] for i in np.flatnonzero(ref_top1 != cand_top1)],
+    }
+
+
+def default_filename(fmt, quantize):
+    """e.g. coin_classifier_cnn_8class.tflite, coin_classifier_cnn_8class_int8.tflite"""
+    base = Path(CNN_MODEL_FILES[fmt])
+    return base.name if quantize == 'none' else f'{base.stem}_{quantize}{base.suffix}'
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Export the CNN to TFLite/ONNX and check top-1 parity',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--format', choices=['tflite', 'onnx'], default='tflite',
+                        help='Export format (default: tflite)')
+    parser.add_argument('--quantize', choices=QUANTIZATIONS, default='none',
+                        help='TFLite post-training quantization (default: none)')
+    parser.add_argument('--model-dir', default=str(MODELS_DIR),
+                        help='Directory with coin_classifier_cnn_8class.keras')
+    parser.add_argument('--output', default=None,
+                        help='Output file name in --model-dir (default: derived from format/quantization)')
+    parser.add_argument('--calibration', nargs='?', const=TRAIN_DIR, default=None, metavar='TRAIN_DIR',
+                        help=f'Training directory for int8 calibration images (no value: {TRAIN_DIR})')
+    parser.add_argument('--calibration-size', type=int, default=200,
+                        help='Number of calibration images (default: 200)')
+    parser.add_argument('--verify', nargs='?', const=TEST_DIR, default=None, metavar='TEST_DIR',
+                        help=f'Check top-1 parity on every image of this held-out directory '
+                             f'(no value: {TEST_DIR})')
+    parser.add_argument('--verify-limit', type=int, default=None, help='Max images to verify')
+    parser.add_argument('--min-agreement', type=float, default=None,
+                        help='Required top-1 agreement (default: 1.0, 0.99 when quantized)')
+    args = parser.parse_args()
+
+    if args.format == 'onnx' and args.quantize != 'none':
+        parser.error('quantization is only supported for --format tflite')
+    for directory in (args.calibration, args.verify):
+        if directory is not None and not Path(directory).is_dir():
+            parser.error(f'dataset directory not found: {directory}')
+
+    from tensorflow import keras
+
+    model_dir = Path(args.model_dir)
+    keras_path = model_dir / CNN_MODEL_FILES['keras']
+    if not keras_path.exists():
+        print(f"Error: CNN model not found: {keras_path}")
+        sys.exit(1)
+    model = keras.models.load_model(keras_path)
+
+    filename = args.output or default_filename(args.format, args.quantize)
+    output_path = model_dir / filename
+    if args.format == 'tflite':
+        calibration = None
+        if args.quantize == 'int8' and args.calibration:
+            calibration = calibration_inputs(args.calibration, args.calibration_size)
+        export_tflite(model, output_path, args.quantize, calibration)
+    else:
+        export_onnx(model, output_path)
+
+    size_mb = output_path.stat().st_size / 1e6
+    print(f"✓ Exported {args.format} ({args.quantize}) to {output_path} ({size_mb:.2f} MB, "
+          f"Keras: {keras_path.stat().st_size / 1e6:.2f} MB)")
+
+    if args.verify:
+        min_agreement = args.min_agreement
+        if min_agreement is None:
+            min_agreement = 1.0 if args.quantize == 'none' else 0.99
+        report = verify(model_dir, args.format, filename, args.verify, args.verify_limit)
+        print(f"Verified on {report['images']} held-out images ({len(get_class_names())} classes)")
+        print(f"  Top-1 agreement: {report['agreement'] * 100:.2f}%")
+        print(f"  Accuracy Keras:    {report['accuracy_keras'] * 100:.2f}%")
+        print(f"  Accuracy exported: {report['accuracy_exported'] * 100:.2f}%")
+        for path in report['mismatches'][:10]:
+            print(f"  mismatch: {path}")
+        if report['agreement'] < min_agreement:
+            print(f"\n[FAIL] Top-1 agreement below {min_agreement * 100:.2f}%")
+            sys.exit(1)
+        print("\n[OK] Top-1 parity check passed")
+
+
+if __name__ == '__main__':
+    main()
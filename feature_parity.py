@@ -0,0 +1,268 @@
+"""
+Feature parity check for faster preprocessing modes.
+
+Runs the Random Forest feature pipelines (hybrid 512x512 features used by
+test_model.py, and the 256x256 API features) once in the exact baseline
+configuration and once in a faster candidate configuration, then reports how
+far every feature moves:
+
+- ``--compare precision``: float64 vs float32 gradients (exact percentiles).
+  Gradients are exact in float32 for uint8 input and orientation histograms
+  are binned from float64 angles, so only sqrt/mean rounding remains;
+  expected deviations are ~1e-5 relative on edge statistics and ~1e-7
+  relative on magnitude statistics.
+- ``--compare percentile``: np.percentile vs histogram percentiles. The
+  histogram only locates each rank and the value is selected exactly inside
+  its bin, so the three percentile features match to floating-point
+  rounding and the default tolerance applies.
+- ``--compare circle``: full vs pyramid (coarse-to-fine) Hough detection.
+  Features only move on images where the detected circle moves; use
+  ``--model-dir`` to see the effect on predictions (benchmark_hough.py
+  reports detector latency and agreement directly).
+
+Tolerance: a feature passes when |baseline - candidate| <= atol + rtol * |baseline|
+(defaults rtol=1e-4, atol=1e-6).
+
+With ``--model-dir`` the trained Random Forest also classifies both feature
+sets and the report shows accuracy for each (labels come from the dataset
+folders, e.g. ``Koin Rp 500/angka/x.jpg``) plus how often they agree.
+
+Usage:
+    python feature_parity.py dataset_splitted/test
+    python feature_parity.py coin1.jpg coin2.jpg --rtol 1e-5
+    python feature_parity.py --synthetic 20
+    python feature_parity.py dataset_splitted --compare percentile --model-dir models
+"""
+
+import argparse
+import pickle
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+import preprocessing
+from preprocessing import (
+    ImageGradients,
+    crop_coin_to_circle,
+    detect_and_segment_coin,
+    detect_coin_circle,
+    extract_coin_features,
+    extract_hybrid_features,
+    resize_with_aspect_ratio,
+    resize_with_padding,
+)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def collect_images(paths, limit=None):
+    """Expand files and directories (recursively) into image paths"""
+    images = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            images.extend(sorted(p for p in path.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS))
+        elif path.exists():
+            images.append(path)
+    return images[:limit] if limit else images
+
+
+def synthetic_images(count, seed=0):
+    """Noisy coin-like test images for environments without the dataset"""
+    rng = np.random.default_rng(seed)
+    for i in range(count):
+        img = (rng.random((720, 960, 3)) * 80 + 20).astype(np.uint8)
+        center = (480 + rng.integers(-100, 100), 360 + rng.integers(-60, 60))
+        cv2.circle(img, center, int(rng.integers(150, 300)), (180, 170, 160), -1)
+        cv2.putText(img, str(rng.choice([100, 200, 500, 1000])), (center[0] - 120, center[1] + 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 3, (90, 90, 90), 8)
+        yield f'synthetic_{i}', cv2.GaussianBlur(img, (3, 3), 0)
+
+
+def hybrid_features(image):
+    """Hybrid (original + cropped) features exactly as test_model.py computes them"""
+    img_resized = resize_with_padding(image, (512, 512))
+    segmented, circle_info, edges = detect_and_segment_coin(img_resized, 'sobel')
+    cropped = crop_coin_to_circle(segmented, circle_info, (512, 512))
+    gradients_cropped = ImageGradients(cropped)
+    return extract_hybrid_features(
+        segmented, cropped, edges, gradients_cropped.edges, circle_info,
+        gradients_cropped=gradients_cropped
+    )
+
+
+def api_features(image, image_size=(256, 256)):
+    """RF features as api/predictor.py computes them from the final edge image"""
+    resized = resize_with_aspect_ratio(image, image_size)
+    gray = ImageGradients(resized).gray
+    circle = detect_coin_circle(gray, max_radius=min(gray.shape) // 2)
+    if circle is not None:
+        mask = np.zeros(gray.shape, dtype=np.uint8)
+        cv2.circle(mask, (circle[0], circle[1]), circle[2], 255, -1)
+        segmented = cv2.bitwise_and(resized, resized, mask=mask)
+        cropped = crop_coin_to_circle(segmented, tuple(circle), image_size)
+    else:
+        cropped = resized
+    final_edge = ImageGradients(cropped).edges
+    h, w = final_edge.shape
+    return extract_coin_features(final_edge, final_edge, (w//2, h//2, min(w, h)//2),
+                                 compute_circularity=False)
+
+
+PIPELINES = {'hybrid': hybrid_features, 'api': api_features}
+
+
+# Baseline and candidate (gradient precision, percentile mode, circle detector) per comparison
+COMPARISONS = {
+    'precision': (('float64', 'exact', 'full'), ('float32', 'exact', 'full')),
+    'percentile': (('float64', 'exact', 'full'), ('float64', 'approx', 'full')),
+    'circle': (('float64', 'exact', 'full'), ('float64', 'exact', 'pyramid')),
+}
+
+# Random Forest files and class names per pipeline (see test_model.py / api/predictor.py)
+MODEL_FILES = {
+    'hybrid': ('random_forest_hybrid_model.pkl', 'random_forest_hybrid_scaler.pkl'),
+    'api': ('coin_classifier_8class_model.pkl', 'coin_classifier_8class_scaler.pkl'),
+}
+COINS = ['Koin Rp 100', 'Koin Rp 1000', 'Koin Rp 200', 'Koin Rp 500']
+CLASS_NAMES = {
+    'hybrid': COINS,
+    'api': [f'{coin} - {side}' for coin in COINS for side in ('angka', 'gambar')],
+}
+
+
+def run_mode(images, pipeline, precision, percentile_mode='exact', circle_detector='full'):
+    """Extract features for all images in one configuration; returns (matrix, seconds)"""
+    preprocessing.set_gradient_precision(precision)
+    preprocessing.set_percentile_mode(percentile_mode)
+    preprocessing.set_circle_detector(circle_detector)
+    rows = []
+    elapsed = 0.0
+    for _, image in images:
+        start = time.perf_counter()
+        rows.append(pipeline(image))
+        elapsed += time.perf_counter() - start
+    return np.stack(rows).astype(np.float64), elapsed
+
+
+def image_label(path, class_names):
+    """Class index from the dataset folders of an image path, or None"""
+    parts = Path(path).parts
+    for i, part in enumerate(parts[:-1]):
+        if part in COINS:
+            name = part
+            if ' - ' in class_names[0] and i + 2 < len(parts):
+                name = f'{part} - {parts[i + 1]}'
+            return class_names.index(name) if name in class_names else None
+    return None
+
+
+def load_classifier(model_dir, pipeline):
+    """Load the Random Forest and scaler used with a feature pipeline"""
+    model_name, scaler_name = MODEL_FILES[pipeline]
+    with open(Path(model_dir) / model_name, 'rb') as f:
+        model = pickle.load(f)
+    with open(Path(model_dir) / scaler_name, 'rb') as f:
+        scaler = pickle.load(f)
+    return model, scaler
+
+
+def accuracy_report(images, reference, candidate, model, scaler, class_names):
+    """Accuracy of both feature sets on labelled images, and prediction agreement"""
+    labels = np.array([image_label(name, class_names) for name, _ in images], dtype=object)
+    pred_ref = model.predict(scaler.transform(reference))
+    pred_cand = model.predict(scaler.transform(candidate))
+    labelled = np.array([label is not None for label in labels])
+    report = {'agreement': float(np.mean(pred_ref == pred_cand)), 'labelled': int(labelled.sum())}
+    if labelled.any():
+        truth = labels[labelled].astype(int)
+        report['accuracy_baseline'] = float(np.mean(pred_ref[labelled] == truth))
+        report['accuracy_candidate'] = float(np.mean(pred_cand[labelled] == truth))
+    return report
+
+
+def compare(reference, candidate, rtol, atol):
+    """Per-feature max absolute / relative deviation and tolerance verdict"""
+    diff = np.abs(reference - candidate)
+    rel = diff / np.maximum(np.abs(reference), 1e-12)
+    within = diff <= atol + rtol * np.abs(reference)
+    return diff.max(axis=0), rel.max(axis=0), within.all(axis=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Check fast feature extraction modes against the exact baseline',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('paths', nargs='*', help='Images or directories')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Use N synthetic images (when no dataset is available)')
+    parser.add_argument('--limit', type=int, default=None, help='Max images to check')
+    parser.add_argument('--pipeline', choices=sorted(PIPELINES), default='hybrid',
+                        help='Feature pipeline to check (default: hybrid)')
+    parser.add_argument('--compare', choices=sorted(COMPARISONS), default='precision',
+                        help='Candidate mode to compare with the baseline (default: precision)')
+    parser.add_argument('--model-dir', default=None,
+                        help='Also report RF accuracy with the models in this directory')
+    parser.add_argument('--rtol', type=float, default=1e-4, help='Relative tolerance (default 1e-4)')
+    parser.add_argument('--atol', type=float, default=1e-6, help='Absolute tolerance (default 1e-6)')
+    args = parser.parse_args()
+
+    if args.synthetic:
+        images = list(synthetic_images(args.synthetic))
+    else:
+        images = []
+        for path in collect_images(args.paths, args.limit):
+            img = cv2.imread(str(path))
+            if img is not None:
+                images.append((str(path), img))
+    if not images:
+        print('Error: no images to check (pass paths or --synthetic N)')
+        sys.exit(1)
+
+    pipeline = PIPELINES[args.pipeline]
+    baseline_mode, candidate_mode = COMPARISONS[args.compare]
+    reference, time_base = run_mode(images, pipeline, *baseline_mode)
+    candidate, time_cand = run_mode(images, pipeline, *candidate_mode)
+    preprocessing.set_gradient_precision('float64')
+    preprocessing.set_percentile_mode('exact')
+    preprocessing.set_circle_detector('full')
+
+    max_abs, max_rel, ok = compare(reference, candidate, args.rtol, args.atol)
+    baseline_name, candidate_name = ('/'.join(mode) for mode in (baseline_mode, candidate_mode))
+
+    print('=' * 70)
+    print(f'FEATURE PARITY: {candidate_name} vs {baseline_name} ({args.pipeline}, {len(images)} images)')
+    print('=' * 70)
+    print(f'{"feature":>8} | {"max abs diff":>12} | {"max rel diff":>12} | status')
+    print('-' * 50)
+    for i in range(len(max_abs)):
+        if max_abs[i] > 0 or not ok[i]:
+            print(f'{i:>8} | {max_abs[i]:12.3e} | {max_rel[i]:12.3e} | {"OK" if ok[i] else "FAIL"}')
+    print('-' * 50)
+    print(f'Identical features: {int(np.sum(max_abs == 0))}/{len(max_abs)}')
+    print(f'Tolerance: |diff| <= {args.atol:g} + {args.rtol:g} * |baseline|')
+    print(f'Time {baseline_name}: {time_base * 1000 / len(images):.1f} ms/image')
+    print(f'Time {candidate_name}: {time_cand * 1000 / len(images):.1f} ms/image')
+
+    if args.model_dir:
+        model, scaler = load_classifier(args.model_dir, args.pipeline)
+        report = accuracy_report(images, reference, candidate, model, scaler,
+                                 CLASS_NAMES[args.pipeline])
+        print(f'RF prediction agreement: {report["agreement"] * 100:.2f}%')
+        if report['labelled']:
+            print(f'RF accuracy {baseline_name}: {report["accuracy_baseline"] * 100:.2f}% '
+                  f'({report["labelled"]} labelled images)')
+            print(f'RF accuracy {candidate_name}: {report["accuracy_candidate"] * 100:.2f}%')
+
+    if ok.all():
+        print('\n[OK] All features within tolerance')
+        sys.exit(0)
+    print(f'\n[FAIL] {int(np.sum(~ok))} features outside tolerance')
+    sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""
+On-disk feature store for Random Forest training.
+
+Feature vectors are cached in a memory-mapped ``features.npy`` keyed by the
+SHA-256 of each image file, one store per feature pipeline and extractor
+version. Rebuilding only extracts new or changed images; everything else is
+reused, and training memory-maps X instead of re-reading every JPEG.
+
+Layout::
+
+    feature_store/
+    └── hybrid-v1-float64-exact/
+        ├── features.npy     # float64 [rows, n_features], memory-mapped
+        └── index.json       # content hash -> row, path -> (size, mtime, hash)
+
+The extractor version combines FEATURE_VERSIONS with the gradient precision
+and percentile mode, so changing any of them starts a fresh store. Bump
+FEATURE_VERSIONS when feature extraction code changes.
+
+Usage:
+    python feature_store.py build dataset_splitted --pipeline hybrid
+    python feature_store.py build dataset_splitted --pipeline api --workers 4
+    python feature_store.py info --pipeline hybrid
+
+Training:
+    from feature_store import load_training_set
+    X, y, paths = load_training_set('dataset_splitted', pipeline='hybrid')
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import cv2
+
+import preprocessing
+from feature_parity import CLASS_NAMES, PIPELINES, collect_images, image_label
+
+# Bump when a pipeline's feature extraction changes
+FEATURE_VERSIONS = {'hybrid': 'v1', 'api': 'v1'}
+
+DEFAULT_STORE_DIR = 'feature_store'
+
+
+def extractor_version(pipeline):
+    """Version key of a pipeline under the current preprocessing settings"""
+    return '-'.join([
+        pipeline,
+        FEATURE_VERSIONS[pipeline],
+        preprocessing.get_gradient_precision(),
+        preprocessing.get_percentile_mode(),
+    ])
+
+
+def file_sha256(path, block_size=1 << 20):
+    """SHA-256 of a file's content"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract(args):
+    """Worker: (path, pipeline, precision, percentile mode) -> features or None"""
+    path, pipeline, precision, percentile_mode = args
+    preprocessing.set_gradient_precision(precision)
+    preprocessing.set_percentile_mode(percentile_mode)
+    img = cv2.imread(str(path))
+    if img is None:
+        return None
+    return np.asarray(PIPELINES[pipeline](img), dtype=np.float64)
+
+
+class FeatureStore:
+    """
+    Memory-mapped feature vectors keyed by image content hash
+
+    Args:
+        store_dir: Root directory of all stores
+        pipeline: Feature pipeline name ('hybrid' or 'api')
+    """
+
+    def __init__(self, store_dir=DEFAULT_STORE_DIR, pipeline='hybrid'):
+        if pipeline not in PIPELINES:
+            raise ValueError(f"Unknown feature pipeline: {pipeline}")
+        self.pipeline = pipeline
+        self.version = extractor_version(pipeline)
+        self.path = Path(store_dir) / self.version
+        self.features_path = self.path / 'features.npy'
+        self.index_path = self.path / 'index.json'
+
+        self.rows = {}    # content hash -> row in features.npy
+        self.files = {}   # path -> [size, mtime_ns, content hash]
+        if self.index_path.exists():
+            with open(self.index_path, encoding='utf-8') as f:
+                index = json.load(f)
+            self.rows = index['rows']
+            self.files = index['files']
+
+    def __len__(self):
+        return len(self.rows)
+
+    def features(self):
+        """Read-only memory map of all stored feature rows"""
+        if not self.features_path.exists():
+            return np.empty((0, 0), dtype=np.float64)
+        return np.load(self.features_path, mmap_mode='r')
+
+    def content_hash(self, path):
+        """Content hash of an image, reusing the indexed one if size/mtime match"""
+        stat = os.stat(path)
+        known = self.files.get(str(path))
+        if known and known[0] == stat.st_size and known[1] == stat.st_mtime_ns:
+            return known[2]
+        digest = file_sha256(path)
+        self.files[str(path)] = [stat.st_size, stat.st_mtime_ns, digest]
+        return digest
+
+    def update(self, paths, workers=None, chunk_size=8, verbose=True):
+        """
+        Extract features for images not in the store yet
+
+        Args:
+            paths: Image paths
+            workers: Worker processes (default: CPU count, 1 = in-process)
+            chunk_size: Images per worker task
+            verbose: Print progress summary
+
+        Returns:
+            dict with new, reused and failed image counts
+        """
+        hashes = [self.content_hash(path) for path in paths]
+        missing = {}
+        for path, digest in zip(paths, hashes):
+            if digest not in self.rows and digest not in missing:
+                missing[digest] = path
+
+        start = time.perf_counter()
+        tasks = [(str(path), self.pipeline, preprocessing.get_gradient_precision(),
+                  preprocessing.get_percentile_mode()) for path in missing.values()]
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(tasks) <= 1:
+            extracted = [_extract(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                extracted = list(executor.map(_extract, tasks, chunksize=chunk_size))
+
+        new = [(digest, vec) for digest, vec in zip(missing, extracted) if vec is not None]
+        if new:
+            self._append(new)
+        self._save_index()
+
+        stats = {
+            'new': len(new),
+            'reused': len(paths) - len(missing),
+            'failed': len(missing) - len(new),
+        }
+        if verbose:
+            elapsed = time.perf_counter() - start
+            print(f"✓ Feature store {self.version}: {stats['new']} extracted, "
+                  f"{stats['reused']} reused, {stats['failed']} failed ({elapsed:.1f}s)")
+        return stats
+
+    def _append(self, new):
+        """Write old rows + new rows to a new memmap file, then swap it in"""
+        old = self.features()
+        n_old = len(self.rows)
+        n_features = len(new[0][1])
+        if n_old and old.shape[1] != n_features:
+            raise ValueError(f"Feature length changed ({old.shape[1]} -> {n_features}); "
+                             f"bump FEATURE_VERSIONS['{self.pipeline}']")
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / 'features.tmp.npy'
+        out = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64,
+                                        shape=(n_old + len(new), n_features))
+        for i in range(0, n_old, 4096):
+            stop = min(i + 4096, n_old)
+            out[i:stop] = old[i:stop]
+        for offset, (digest, vec) in enumerate(new):
+            out[n_old + offset] = vec
+            self.rows[digest] = n_old + offset
+        out.flush()
+        del out, old
+        os.replace(tmp_path, self.features_path)
+
+    def _save_index(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path / 'index.tmp.json'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version, 'rows': self.rows, 'files': self.files}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def matrix(self, paths):
+        """
+        Feature matrix for images already in the store
+
+        Returns the memory map itself when ``paths`` cover the store in row
+        order; otherwise only the selected rows are read into memory.
+
+        Args:
+            paths: Image paths (all must be in the store)
+
+        Returns:
+            Array [len(paths), n_features]
+        """
+        rows = np.array([self.rows[self.content_hash(path)] for path in paths], dtype=np.intp)
+        features = self.features()
+        if len(rows) == len(features) and np.array_equal(rows, np.arange(len(rows))):
+            return features
+        return features[rows]
+
+
+def load_training_set(dataset_dir, pipeline='hybrid', store_dir=DEFAULT_STORE_DIR,
+                      workers=None, limit=None):
+    """
+    Training data from the feature store, extracting only new/changed images
+
+    Labels come from the dataset folders (class folder, plus the angka/gambar
+    folder for the 8-class 'api' pipeline); unlabelled images are skipped.
+
+    Args:
+        dataset_dir: Dataset root (e.g. dataset_splitted)
+        pipeline: Feature pipeline ('hybrid' or 'api')
+        store_dir: Feature store root
+        workers: Worker processes for extraction
+        limit: Max images
+
+    Returns:
+        (X, y, paths) - X is memory-mapped when possible
+    """
+    class_names = CLASS_NAMES[pipeline]
+    paths = [path for path in collect_images([dataset_dir], limit)
+             if image_label(path, class_names) is not None]
+
+    store = FeatureStore(store_dir, pipeline)
+    store.update(paths, workers=workers)
+    # Images that failed to decode have no row
+    paths = [path for path in paths if store.content_hash(path) in store.rows]
+
+    X = store.matrix(paths)
+    y = np.array([image_label(path, class_names) for path in paths], dtype=np.int64)
+    return X, y, [str(path) for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Build or inspect the memory-mapped feature store',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('command', choices=['build', 'info'])
+    parser.add_argument('paths', nargs='*', help='Images or directories (build)')
+    parser.add_argument('--pipeline', choices=sorted(PIPELINES), default='hybrid',
+                        help='Feature pipeline (default: hybrid)')
+    parser.add_argument('--store-dir', default=DEFAULT_STORE_DIR,
+                        help=f'Feature store root (default: {DEFAULT_STORE_DIR})')
+    parser.add_argument('--precision', choices=preprocessing.GRADIENT_PRECISIONS, default='float64',
+                        help='Gradient precision (default: float64)')
+    parser.add_argument('--percentile-mode', choices=preprocessing.PERCENTILE_MODES, default='exact',
+                        help='Percentile mode (default: exact)')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes')
+    parser.add_argument('--limit', type=int, default=None, help='Max images')
+    args = parser.parse_args()
+
+    preprocessing.set_gradient_precision(args.precision)
+    preprocessing.set_percentile_mode(args.percentile_mode)
+    store = FeatureStore(args.store_dir, args.pipeline)
+
+    if args.command == 'build':
+        paths = collect_images(args.paths, args.limit)
+        if not paths:
+            print('Error: no images found')
+            sys.exit(1)
+        store.update(paths, workers=args.workers)
+
+    features = store.features()
+    print(f"Store: {store.path}")
+    print(f"Rows: {len(store)}  Features: {features.shape[1] if len(store) else 0}  "
+          f"Indexed files: {len(store.files)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""
+Versioned model bundles for the Random Forest (replaces pickle loading).
+
+A bundle is a directory holding a compiled scaler + forest
+(see compiled_forest.py) as plain ``.npy`` arrays plus a manifest:
+
+    models/coin_classifier_8class_rf/
+    ├── manifest.json      # format version, classes, feature schema,
+    │                      # preprocessing parameters, per-array sha256
+    ├── feature.3f9c2a71d0b4.npy
+    ├── threshold.8e01c6f2a95d.npy
+    └── ...
+
+Loading memory-maps the arrays (near-instant, pages shared between worker
+processes) and never unpickles anything. Array files are named after their
+checksum and never rewritten, so re-saving a bundle that a running API has
+memory-mapped only adds files; the new manifest switches to them at once. Every array is checked against its
+manifest checksum before use. Bundles do not depend on the scikit-learn
+version, so they survive scikit-learn upgrades.
+
+Usage:
+    python model_bundle.py convert models/coin_classifier_8class_model.pkl \\
+        models/coin_classifier_8class_scaler.pkl --pipeline api -o models/coin_classifier_8class_rf
+    python model_bundle.py convert models/random_forest_hybrid_model.pkl \\
+        models/random_forest_hybrid_scaler.pkl --pipeline hybrid -o models/random_forest_hybrid_rf
+    python model_bundle.py verify models/coin_classifier_8class_rf
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from compiled_forest import CompiledForest
+
+BUNDLE_FORMAT = "coin-rf-bundle"
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+# CompiledForest arrays stored in a bundle (mean/scale are optional)
+ARRAY_FIELDS = ("feature", "threshold", "left", "right", "missing_left", "value", "roots",
+                "classes", "mean", "scale")
+
+
+class BundleError(ValueError):
+    """Missing, corrupted or incompatible model bundle"""
+
+
+def _sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _array_files(manifest):
+    return {info["file"] for info in manifest.get("arrays", {}).values()}
+
+
+def save_bundle(forest, bundle_dir, class_names, feature_schema, preprocessing=None, source=None):
+    """
+    Write a compiled forest as a bundle directory
+
+    Existing array files are never modified: every array is written to a
+    temporary file and renamed to ``<name>.<sha256 prefix>.npy``, then the
+    manifest is replaced. Processes that memory-mapped the previous version
+    keep reading it, and a loader sees either the old or the new manifest with
+    all of its files. Files of the previous version are kept (a loader may have
+    just read its manifest); older ones are removed.
+
+    Args:
+        forest: CompiledForest
+        bundle_dir: Output directory (created / overwritten)
+        class_names: Class name per forest class index
+        feature_schema: dict with at least 'pipeline', 'version' and 'n_features'
+        preprocessing: Preprocessing parameters the features depend on
+        source: Free-form provenance (e.g. source files, scikit-learn version)
+
+    Returns:
+        Manifest dict
+    """
+    bundle_dir = Path(bundle_dir)
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        keep = _array_files(read_manifest(bundle_dir))
+    except (BundleError, OSError, ValueError):
+        keep = set()
+
+    arrays = {}
+    for name in ARRAY_FIELDS:
+        array = getattr(forest, name)
+        if array is None:
+            continue
+        array = np.ascontiguousarray(array)
+        if array.dtype == object:
+            raise BundleError(f"Array '{name}' has object dtype and cannot be memory-mapped")
+        tmp_path = bundle_dir / f"{name}.npy.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array)
+        sha256 = _sha256(tmp_path)
+        path = bundle_dir / f"{name}.{sha256[:12]}.npy"
+        os.replace(tmp_path, path)
+        arrays[name] = {
+            "file": path.name,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "sha256": sha256,
+        }
+
+    manifest = {
+        "format": BUNDLE_FORMAT,
+        "format_version": BUNDLE_FORMAT_VERSION,
+        "model": "random_forest",
+        "classes": list(class_names),
+        "feature_schema": feature_schema,
+        "preprocessing": preprocessing or {},
+        "max_depth": forest.max_depth,
+        "n_trees": forest.n_trees,
+        "arrays": arrays,
+        "source": source or {},
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+    tmp_path = bundle_dir / (MANIFEST_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, default=list)
+    os.replace(tmp_path, bundle_dir / MANIFEST_NAME)
+
+    keep |= _array_files(manifest)
+    for path in bundle_dir.glob("*.npy"):
+        if path.name not in keep:
+            try:
+                path.unlink()
+            except OSError:
+                pass  # still mapped on Windows; removed by a later save
+    return manifest
+
+
+def read_manifest(bundle_dir):
+    """Parse and check the manifest of a bundle directory"""
+    path = Path(bundle_dir) / MANIFEST_NAME
+    if not path.exists():
+        raise BundleError(f"Bundle manifest not found: {path}")
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"Not a model bundle: {bundle_dir}")
+    if manifest.get("format_version", 0) > BUNDLE_FORMAT_VERSION:
+        raise BundleError(f"Bundle format version {manifest['format_version']} is newer than "
+                          f"supported ({BUNDLE_FORMAT_VERSION})")
+    return manifest
+
+
+def load_bundle(bundle_dir, verify=True, expected_schema=None):
+    """
+    Load a bundle as a CompiledForest backed by memory-mapped arrays
+
+    Args:
+        bundle_dir: Bundle directory
+        verify: Check every array file against its manifest sha256
+        expected_schema: Optional dict of feature_schema entries that must match
+            (e.g. {'pipeline': 'api', 'n_features': 35})
+
+    Returns:
+        (CompiledForest, manifest)
+
+    Raises:
+        BundleError: missing files, checksum mismatch or incompatible schema
+    """
+    bundle_dir = Path(bundle_dir)
+    manifest = read_manifest(bundle_dir)
+
+    schema = manifest.get("feature_schema", {})
+    for key, value in (expected_schema or {}).items():
+        if schema.get(key) != value:
+            raise BundleError(f"Bundle feature schema mismatch: {key}={schema.get(key)!r}, "
+                              f"expected {value!r}")
+
+    arrays = {}
+    for name, info in manifest["arrays"].items():
+        path = bundle_dir / info["file"]
+        if not path.exists():
+            raise BundleError(f"Bundle array missing: {path}")
+        if verify and _sha256(path) != info["sha256"]:
+            raise BundleError(f"Checksum mismatch: {path}")
+        array = np.load(path, mmap_mode="r", allow_pickle=False)
+        if array.dtype.str != info["dtype"] or list(array.shape) != info["shape"]:
+            raise BundleError(f"Array does not match manifest: {path}")
+        arrays[name] = array
+
+    missing = [name for name in ARRAY_FIELDS if name not in arrays and name not in ("mean", "scale")]
+    if missing:
+        raise BundleError(f"Bundle is missing arrays: {', '.join(missing)}")
+
+    forest = CompiledForest(
+        feature=arrays["feature"],
+        threshold=arrays["threshold"],
+        left=arrays["left"],
+        right=arrays["right"],
+        missing_left=arrays["missing_left"],
+        value=arrays["value"],
+        roots=arrays["roots"],
+        max_depth=manifest["max_depth"],
+        classes=arrays["classes"],
+        mean=arrays.get("mean"),
+        scale=arrays.get("scale"),
+    )
+    return forest, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert pickled RF models to bundles, or verify a bundle",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="Pickled RF + scaler -> bundle")
+    convert.add_argument("model", help="Pickled RandomForestClassifier")
+    convert.add_argument("scaler", help="Pickled StandardScaler")
+    convert.add_argument("--pipeline", choices=["api", "hybrid"], required=True,
+                         help="Feature pipeline the model was trained on")
+    convert.add_argument("--output", "-o", required=True, help="Bundle directory")
+
+    check = sub.add_parser("verify", help="Check bundle checksums and print its manifest")
+    check.add_argument("bundle", help="Bundle directory")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        try:
+            start = time.perf_counter()
+            forest, manifest = load_bundle(args.bundle)
+            elapsed = (time.perf_counter() - start) * 1000
+        except BundleError as e:
+            print(f"[FAIL] {e}")
+            sys.exit(1)
+        print(f"[OK] {args.bundle}: {forest.n_trees} trees, {len(manifest['classes'])} classes, "
+              f"schema {manifest['feature_schema']} (loaded + verified in {elapsed:.1f} ms)")
+        return
+
+    # Converting needs pickle + scikit-learn once; serving the bundle does not
+    import pickle
+    import sklearn
+
+    import preprocessing
+    from feature_parity import CLASS_NAMES
+    from feature_store import FEATURE_VERSIONS
+    from compiled_forest import check_parity
+
+    with open(args.model, "rb") as f:
+        model = pickle.load(f)
+    with open(args.scaler, "rb") as f:
+        scaler = pickle.load(f)
+
+    class_names = CLASS_NAMES[args.pipeline]
+    if args.pipeline == "api":
+        from api.predictor import PREPROCESSING_PARAMS
+        params = dict(PREPROCESSING_PARAMS)
+    else:
+        params = {"image_size": (512, 512), "resize": "padding", "edge_method": "sobel"}
+    params["gradient_precision"] = preprocessing.get_gradient_precision()
+    params["percentile_mode"] = preprocessing.get_percentile_mode()
+
+    forest = CompiledForest.from_sklearn(model, scaler)
+    rng = np.random.default_rng(0)
+    samples = scaler.mean_ + rng.standard_normal((500, model.n_features_in_)) * scaler.scale_
+    if not check_parity(forest, model, scaler, samples):
+        print("[FAIL] Compiled forest differs from scikit-learn; bundle not written")
+        sys.exit(1)
+
+    manifest = save_bundle(
+        forest, args.output, class_names,
+        feature_schema={
+            "pipeline": args.pipeline,
+            "version": FEATURE_VERSIONS[args.pipeline],
+            "n_features": int(model.n_features_in_),
+        },
+        preprocessing=params,
+        source={
+            "model": Path(args.model).name,
+            "scaler": Path(args.scaler).name,
+            "sklearn_version": sklearn.__version__,
+        },
+    )
+    size_mb = sum((Path(args.output) / a["file"]).stat().st_size for a in manifest["arrays"].values()) / 1e6
+    print(f"[OK] Bundle written: {args.output} ({forest.n_trees} trees, {size_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
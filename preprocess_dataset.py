@@ -0,0 +1,199 @@
+"""
+Offline dataset preprocessing: segment, crop and edge-detect every image.
+
+Walks a dataset tree (e.g. ``dataset_splitted/Koin Rp 100/angka/*.jpg``) and
+runs the training pipeline on all cores:
+
+    resize_with_padding -> detect_and_segment_coin -> crop_coin_to_circle -> apply_sobel_edge
+
+Edge images are written as PNG to the same relative path under the output
+directory. Every processed image appends one JSON line (circle metadata,
+status) to ``manifest.jsonl`` in the output directory. Rerunning skips images
+whose manifest entry matches the source size/mtime, so an interrupted run
+resumes where it stopped.
+
+Usage:
+    python preprocess_dataset.py dataset_splitted
+    python preprocess_dataset.py dataset_splitted -o dataset_edges --workers 8
+    python preprocess_dataset.py dataset_splitted --image-size 512 --force
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+from multiprocessing import Pool
+from pathlib import Path
+
+import cv2
+from tqdm import tqdm
+
+from preprocessing import (
+    apply_sobel_edge,
+    crop_coin_to_circle,
+    detect_and_segment_coin,
+    resize_with_padding,
+)
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+MANIFEST_NAME = 'manifest.jsonl'
+
+
+def process_image(task):
+    """
+    Worker: run the pipeline on one image and write its edge image
+
+    Args:
+        task: (source path, relative path, output dir, image size)
+
+    Returns:
+        Manifest entry dict
+    """
+    source, relative, output_dir, image_size = task
+    stat = os.stat(source)
+    entry = {
+        'path': relative,
+        'class': str(Path(relative).parent),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'output': None,
+        'circle': None,
+        'status': 'ok',
+    }
+    try:
+        img = cv2.imread(source)
+        if img is None:
+            raise ValueError('cannot read image')
+
+        img_resized = resize_with_padding(img, image_size)
+        segmented, circle_info, _ = detect_and_segment_coin(img_resized, 'sobel')
+        cropped = crop_coin_to_circle(segmented, circle_info, image_size)
+        edges = apply_sobel_edge(cropped)
+
+        output = Path(relative).with_suffix('.png')
+        target = Path(output_dir) / output
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if not cv2.imwrite(str(target), edges):
+            raise IOError(f'cannot write {target}')
+
+        entry['output'] = output.as_posix()
+        if circle_info is None:
+            entry['status'] = 'no_circle'
+        else:
+            entry['circle'] = {'x': int(circle_info[0]), 'y': int(circle_info[1]),
+                               'radius': int(circle_info[2])}
+    except Exception as e:
+        entry['status'] = 'error'
+        entry['error'] = str(e)
+    return entry
+
+
+def load_manifest(manifest_path):
+    """Latest manifest entry per relative path (later lines win)"""
+    entries = {}
+    if manifest_path.exists():
+        with open(manifest_path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Partial line from an interrupted run
+                entries[entry['path']] = entry
+    return entries
+
+
+def is_done(entry, source, output_dir):
+    """Whether a manifest entry is still valid for the source image"""
+    if entry is None or entry['status'] == 'error':
+        return False
+    stat = os.stat(source)
+    if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+        return False
+    return (Path(output_dir) / entry['output']).exists()
+
+
+def class_report(entries):
+    """Per-class image count, circle-detection failures and errors"""
+    totals, no_circle, errors = Counter(), Counter(), Counter()
+    for entry in entries:
+        totals[entry['class']] += 1
+        no_circle[entry['class']] += entry['status'] == 'no_circle'
+        errors[entry['class']] += entry['status'] == 'error'
+    return [(name, totals[name], no_circle[name], errors[name]) for name in sorted(totals)]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Segment, crop and edge-detect a dataset in parallel (resumable)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('dataset', help='Dataset root (e.g. dataset_splitted)')
+    parser.add_argument('--output', '-o', default='dataset_edges',
+                        help='Output directory (default: dataset_edges)')
+    parser.add_argument('--image-size', type=int, default=256,
+                        help='Square size for resize and crop (default: 256)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=8,
+                        help='Images per worker task (default: 8)')
+    parser.add_argument('--force', action='store_true',
+                        help='Ignore the manifest and reprocess everything')
+    args = parser.parse_args()
+
+    dataset = Path(args.dataset)
+    if not dataset.is_dir():
+        print(f"Error: Dataset not found: {dataset}")
+        sys.exit(1)
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    if args.force and manifest_path.exists():
+        manifest_path.unlink()
+    manifest = load_manifest(manifest_path)
+
+    sources = sorted(p for p in dataset.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS)
+    image_size = (args.image_size, args.image_size)
+    tasks = []
+    for source in sources:
+        relative = source.relative_to(dataset).as_posix()
+        if not is_done(manifest.get(relative), source, output_dir):
+            tasks.append((str(source), relative, str(output_dir), image_size))
+
+    print(f"Images: {len(sources)} ({len(sources) - len(tasks)} done, {len(tasks)} to process)")
+
+    start = time.perf_counter()
+    if tasks:
+        with open(manifest_path, 'a', encoding='utf-8') as manifest_file, \
+                Pool(processes=args.workers) as pool:
+            for entry in tqdm(pool.imap_unordered(process_image, tasks, chunksize=args.chunk_size),
+                              total=len(tasks), unit='img'):
+                manifest_file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+                manifest_file.flush()
+                manifest[entry['path']] = entry
+    elapsed = time.perf_counter() - start
+
+    current = {source.relative_to(dataset).as_posix() for source in sources}
+    entries = [entry for path, entry in manifest.items() if path in current]
+
+    print("\n" + "=" * 70)
+    print("PREPROCESSING SUMMARY")
+    print("=" * 70)
+    if tasks:
+        print(f"Processed {len(tasks)} images in {elapsed:.1f}s "
+              f"({len(tasks) / elapsed:.1f} images/s)")
+    print(f"\n{'class':30s} | {'images':>6} | {'no circle':>9} | {'fail %':>6} | {'errors':>6}")
+    print("-" * 70)
+    for name, total, no_circle, errors in class_report(entries):
+        print(f"{name:30s} | {total:6d} | {no_circle:9d} | {no_circle / total * 100:5.1f}% | {errors:6d}")
+
+    failed = sum(entry['status'] == 'error' for entry in entries)
+    print(f"\n[OK] Edge images and manifest saved: {output_dir}")
+    if failed:
+        print(f"[WARNING] {failed} images failed (rerun to retry)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,15 @@
 """
 Preprocessing functions for coin classification.
 Contains edge detection, circle detection, cropping, and feature extraction.
+
+This is the single preprocessing engine shared by the API (api/predictor.py),
+the CLI tester (test_model.py) and training code. ImageGradients computes the
+grayscale conversion, CLAHE and Sobel gradients of an image once so edges,
+Hough detection and features can all reuse them.
 """
 
+from functools import cached_property
+
 import numpy as np
 import cv2
 
@@ -76,26 +83,307 @@ def resize_with_padding(image, target_size=(512, 512)):
     return canvas
 
 
-def apply_canny_edge(image, use_clahe=True):
+def resize_with_aspect_ratio(image, target_size=(256, 256)):
+    """
+    Resize image while maintaining aspect ratio by zooming to fit and center-cropping.
+    This prevents circular coins from becoming oval when the input image is not square.
+    
+    Args:
+        image: Input image (BGR or grayscale)
+        target_size: Target (width, height) tuple
+    
+    Returns:
+        Resized and center-cropped image with maintained aspect ratio
+    """
+    target_w, target_h = target_size
+    h, w = image.shape[:2]
+    
+    # Calculate scale to fill target (zoom to fit, crop excess)
+    scale = max(target_w / w, target_h / h)
+    
+    # New dimensions after scaling
+    new_w = int(w * scale)
+    new_h = int(h * scale)
+    
+    # Resize with aspect ratio maintained
+    resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    
+    # Calculate crop offsets to center-crop to target size
+    x_offset = (new_w - target_w) // 2
+    y_offset = (new_h - target_h) // 2
+    
+    # Center-crop to target size
+    cropped = resized[y_offset:y_offset + target_h, x_offset:x_offset + target_w]
+    
+    return cropped
+
+
+# Gradient precision used when ImageGradients is not given one explicitly.
+# 'float64' reproduces the original pipeline exactly; 'float32' halves memory
+# traffic (see feature_parity.py for the measured feature tolerance).
+GRADIENT_PRECISIONS = ("float64", "float32")
+_default_gradient_precision = "float64"
+
+
+def set_gradient_precision(precision):
+    """Set the default gradient precision: 'float64' (exact) or 'float32' (fast)"""
+    global _default_gradient_precision
+    
+    if precision not in GRADIENT_PRECISIONS:
+        raise ValueError(f"Unknown gradient precision: {precision}")
+    _default_gradient_precision = precision
+
+
+def get_gradient_precision():
+    """Current default gradient precision"""
+    return _default_gradient_precision
+
+
+# Percentile computation in extract_coin_features: 'exact' uses np.percentile
+# (a partial sort of the whole array per call); 'approx' locates all requested
+# quantiles with one fixed-bin histogram pass and partitions only the bins
+# holding them (see feature_parity.py --compare percentile).
+PERCENTILE_MODES = ("exact", "approx")
+PERCENTILE_BINS = 8192
+_default_percentile_mode = "exact"
+
+
+def set_percentile_mode(mode):
+    """Set the default percentile mode of extract_coin_features: 'exact' or 'approx'"""
+    global _default_percentile_mode
+    
+    if mode not in PERCENTILE_MODES:
+        raise ValueError(f"Unknown percentile mode: {mode}")
+    _default_percentile_mode = mode
+
+
+def get_percentile_mode():
+    """Current default percentile mode"""
+    return _default_percentile_mode
+
+
+# Coin circle detection in detect_coin_circle: 'full' runs one Hough transform
+# over the whole image and radius range; 'pyramid' finds candidates on a
+# downsampled level and refines them in a small full-resolution ROI
+# (see benchmark_hough.py for latency and agreement).
+CIRCLE_DETECTORS = ("full", "pyramid")
+_default_circle_detector = "full"
+
+
+def set_circle_detector(detector):
+    """Set the default circle detector of detect_coin_circle: 'full' or 'pyramid'"""
+    global _default_circle_detector
+    
+    if detector not in CIRCLE_DETECTORS:
+        raise ValueError(f"Unknown circle detector: {detector}")
+    _default_circle_detector = detector
+
+
+def get_circle_detector():
+    """Current default circle detector"""
+    return _default_circle_detector
+
+
+def histogram_percentiles(values, percentiles, bins=PERCENTILE_BINS):
+    """
+    Percentiles of non-negative values located with one histogram pass
+    
+    Exact zeros (masked background) get their own bin; the remaining values
+    are counted into ``bins`` equal-width bins over (0, max]. The histogram
+    only locates the bin holding each needed rank; the value at that rank is
+    then selected exactly with np.partition over the values of that bin, so
+    results match np.percentile's linear method up to floating-point rounding
+    while only small bins are partitioned instead of the whole array.
+    
+    Args:
+        values: Array of non-negative values (any shape)
+        percentiles: Sequence of percentiles in 0-100
+        bins: Number of histogram bins
+    
+    Returns:
+        List of percentile values
+    """
+    flat = values.ravel()
+    upper = float(flat.max())
+    if upper <= 0:
+        return [0.0 for _ in percentiles]
+    
+    scale = bins / upper
+    indices = np.minimum(np.ceil(flat * scale).astype(np.intp), bins)
+    cumulative = np.cumsum(np.bincount(indices, minlength=bins + 1))
+    
+    bin_values = {}
+    
+    def value_at(rank):
+        # rank-th smallest value (0-based)
+        b = int(np.searchsorted(cumulative, rank, side='right'))
+        if b == 0:
+            return 0.0
+        if b not in bin_values:
+            bin_values[b] = flat[indices == b]
+        k = rank - int(cumulative[b - 1])
+        return float(np.partition(bin_values[b], k)[k])
+    
+    results = []
+    for q in percentiles:
+        # Same rank convention as np.percentile's linear method
+        rank = q / 100 * (flat.size - 1)
+        lower = int(np.floor(rank))
+        fraction = rank - lower
+        low_value = value_at(lower)
+        if fraction == 0:
+            results.append(low_value)
+            continue
+        high_value = value_at(min(lower + 1, flat.size - 1))
+        results.append(low_value + fraction * (high_value - low_value))
+    return results
+
+
+class ImageGradients:
+    """
+    Grayscale, CLAHE and Sobel results of one image, each computed once.
+    
+    Every attribute is computed lazily on first access and cached, so the
+    edge image, Hough detection and feature extraction of the same pixels
+    share a single grayscale conversion, CLAHE pass and Sobel pass.
+    
+    Two gradient sets exist because the pipeline uses both:
+    - edges: Sobel on the CLAHE-normalized image (edge images / CNN input)
+    - magnitude / direction: Sobel on the raw grayscale (RF features)
+    Without CLAHE both come from the same Sobel pass.
+    
+    In 'float32' precision Sobel produces CV_32F (exact for uint8 input)
+    and magnitude comes from cv2.magnitude instead of float64 NumPy
+    temporaries.
+    
+    Args:
+        image: Input image (BGR or grayscale)
+        use_clahe: Whether edges are computed on the CLAHE image (default True)
+        clip_limit: CLAHE contrast limit (default 2.0)
+        tile_grid_size: CLAHE grid size (default 8x8)
+        precision: 'float64' or 'float32' (default: set_gradient_precision)
+    """
+    
+    def __init__(self, image, use_clahe=True, clip_limit=2.0, tile_grid_size=(8, 8),
+                 precision=None):
+        self.image = image
+        self.use_clahe = use_clahe
+        self.clip_limit = clip_limit
+        self.tile_grid_size = tile_grid_size
+        self.precision = precision or _default_gradient_precision
+        
+        if self.precision not in GRADIENT_PRECISIONS:
+            raise ValueError(f"Unknown gradient precision: {self.precision}")
+    
+    @property
+    def dtype(self):
+        """Floating point type of gradient and texture arrays"""
+        return np.float32 if self.precision == "float32" else np.float64
+    
+    @cached_property
+    def gray(self):
+        if len(self.image.shape) == 3:
+            return cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self.image
+    
+    @cached_property
+    def clahe(self):
+        clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.tile_grid_size)
+        return clahe.apply(self.gray)
+    
+    @property
+    def edge_source(self):
+        """Image the edge detectors run on (CLAHE or raw grayscale)"""
+        return self.clahe if self.use_clahe else self.gray
+    
+    def _sobel(self, image):
+        if self.precision == "float32":
+            sobel_x = cv2.Sobel(image, cv2.CV_32F, 1, 0, ksize=3)
+            sobel_y = cv2.Sobel(image, cv2.CV_32F, 0, 1, ksize=3)
+        else:
+            sobel_x = cv2.Sobel(image, cv2.CV_64F, 1, 0, ksize=3)
+            sobel_y = cv2.Sobel(image, cv2.CV_64F, 0, 1, ksize=3)
+        return sobel_x, sobel_y
+    
+    def _magnitude(self, sobel_x, sobel_y):
+        if self.precision == "float32":
+            return cv2.magnitude(sobel_x, sobel_y)
+        return np.sqrt(sobel_x**2 + sobel_y**2)
+    
+    @cached_property
+    def edge_gradients(self):
+        return self._sobel(self.edge_source)
+    
+    @cached_property
+    def gray_gradients(self):
+        if not self.use_clahe:
+            return self.edge_gradients
+        return self._sobel(self.gray)
+    
+    @cached_property
+    def edges(self):
+        """Sobel magnitude of edge_source normalized to uint8"""
+        sobel_x, sobel_y = self.edge_gradients
+        if self.precision == "float32":
+            if not self.use_clahe:
+                # Shares the Sobel pass with magnitude; scale a copy
+                sobel_combined = self.magnitude.copy()
+            else:
+                sobel_combined = self._magnitude(sobel_x, sobel_y)
+            np.divide(sobel_combined, sobel_combined.max(), out=sobel_combined)
+            np.multiply(sobel_combined, 255, out=sobel_combined)
+            return sobel_combined.astype(np.uint8)
+        sobel_combined = np.sqrt(sobel_x**2 + sobel_y**2)
+        return np.uint8(sobel_combined / sobel_combined.max() * 255)
+    
+    @cached_property
+    def magnitude(self):
+        """Sobel gradient magnitude of the raw grayscale"""
+        sobel_x, sobel_y = self.gray_gradients
+        return self._magnitude(sobel_x, sobel_y)
+    
+    @cached_property
+    def direction(self):
+        """Sobel gradient direction of the raw grayscale (radians, -pi..pi)"""
+        sobel_x, sobel_y = self.gray_gradients
+        return np.arctan2(sobel_y, sobel_x)
+    
+    def directions_above_mean(self):
+        """
+        Gradient directions (radians) of pixels whose magnitude exceeds the mean
+        
+        In float32 precision the selection compares exact squared magnitudes
+        and arctan2 runs in float64 on the selected pixels only, so the
+        orientation histogram bins match the float64 pipeline.
+        """
+        if self.precision == "float32":
+            sobel_x, sobel_y = self.gray_gradients
+            threshold = self.magnitude.mean(dtype=np.float64)
+            squared = sobel_x * sobel_x
+            squared += sobel_y * sobel_y  # exact: integer gradients below 2**24
+            mask = squared > threshold * threshold
+            return np.arctan2(sobel_y[mask].astype(np.float64), sobel_x[mask].astype(np.float64))
+        
+        magnitude = self.magnitude
+        return self.direction[magnitude > magnitude.mean()]
+
+
+def apply_canny_edge(image, use_clahe=True, gradients=None):
     """Apply Canny edge detection
     
     Args:
         image: Input image (BGR or grayscale)
         use_clahe: Whether to apply CLAHE before edge detection (default True)
+        gradients: Optional precomputed ImageGradients of image
     
     Returns:
         Edge detection result
     """
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    
-    # Apply CLAHE to normalize lighting before edge detection
-    if use_clahe:
-        gray = apply_clahe(gray)
+    if gradients is None:
+        gradients = ImageGradients(image, use_clahe=use_clahe)
     
-    blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+    # CLAHE normalizes lighting before edge detection
+    blurred = cv2.GaussianBlur(gradients.edge_source, (5, 5), 0)
     edges = cv2.Canny(blurred, 50, 150)
     return edges
 
@@ -110,25 +398,10 @@ def apply_sobel_edge(image, use_clahe=True):
     Returns:
         Edge detection result
     """
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
-    
-    # Apply CLAHE to normalize lighting before edge detection
-    if use_clahe:
-        gray = apply_clahe(gray)
-    
-    sobel_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    
-    sobel_combined = np.sqrt(sobel_x**2 + sobel_y**2)
-    sobel_combined = np.uint8(sobel_combined / sobel_combined.max() * 255)
-    
-    return sobel_combined
+    return ImageGradients(image, use_clahe=use_clahe).edges
 
 
-def detect_and_segment_coin(image, edge_method='sobel', use_clahe=True):
+def detect_and_segment_coin(image, edge_method='sobel', use_clahe=True, gradients=None):
     """
     Detect coin using Hough Circle Transform and segment it
     
@@ -136,58 +409,294 @@ def detect_and_segment_coin(image, edge_method='sobel', use_clahe=True):
         image: Input image
         edge_method: 'canny' or 'sobel'
         use_clahe: Whether to apply CLAHE before edge detection (default True)
+        gradients: Optional precomputed ImageGradients of image
     
     Returns:
         segmented: Masked image focusing on coin region
         circle_info: (x, y, radius) of detected circle, or None
         edges: Edge detection result
     """
+    if gradients is None:
+        gradients = ImageGradients(image, use_clahe=use_clahe)
+    
     # Edge detection (with optional CLAHE)
     if edge_method == 'canny':
-        edges = apply_canny_edge(image, use_clahe=use_clahe)
+        edges = apply_canny_edge(image, gradients=gradients)
     else:
-        edges = apply_sobel_edge(image, use_clahe=use_clahe)
+        edges = gradients.edges
     
-    # Convert to grayscale for Hough Transform
-    if len(image.shape) == 3:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    else:
-        gray = image
+    # Hough Transform runs on the (non-CLAHE) grayscale
+    gray = gradients.gray
+    circle_info = detect_coin_circle(gray)
+    
+    segmented = image.copy()
+    
+    if circle_info is not None:
+        x, y, radius = circle_info
+        
+        # Create circular mask and apply it to the image
+        mask = np.zeros(gray.shape, dtype=np.uint8)
+        cv2.circle(mask, (x, y), radius, 255, -1)
+        segmented = cv2.bitwise_and(image, image, mask=mask)
+    
+    return segmented, circle_info, edges
+
+
+def detect_coin_circle(gray, max_radius=200, detector=None):
+    """
+    Detect the strongest coin circle in a grayscale image
+    
+    Args:
+        gray: Grayscale image
+        max_radius: Largest radius searched
+        detector: 'full' or 'pyramid' (default: set_circle_detector)
+    
+    Returns:
+        (x, y, radius) of the circle with most Hough votes, or None
+    """
+    detector = detector or _default_circle_detector
+    if detector not in CIRCLE_DETECTORS:
+        raise ValueError(f"Unknown circle detector: {detector}")
+    
+    if detector == "pyramid":
+        return detect_coin_circle_pyramid(gray, max_radius=max_radius)
+    
+    circles = hough_circles(gray, max_radius=max_radius)
+    if circles is None:
+        return None
+    x, y, radius = circles[0]
+    return (x, y, radius)
+
+
+def detect_coin_circle_pyramid(gray, min_dist=50, min_radius=20, max_radius=200,
+                               min_coarse_radius=5, max_levels=2, max_candidates=3):
+    """
+    Coarse-to-fine coin circle detection
+    
+    1. Candidates: Hough transform on a pyrDown level (1/2 or 1/4 scale), so
+       the accumulator and radius range shrink with the image.
+    2. Refinement: Hough transform at full resolution, restricted to a small
+       ROI around each candidate and a narrow radius band around its radius.
+       The first candidate (in coarse vote order) that refines is returned.
+    3. Bounded fallbacks: when the coarse level has no candidates (e.g. a
+       low-contrast rim that pyrDown blurs away), the candidate search is
+       retried once on the next finer level (the full image when the coarse
+       level was 1/2 scale). When no candidate refines (e.g. a coin cut by
+       the image border), one full-resolution pass as in 'full' decides.
+    
+    The work is bounded by the coarse pass, at most one retry on the finer
+    level, at most ``max_candidates`` ROI passes and at most one full pass.
+    
+    Args:
+        gray: Grayscale image
+        min_dist: Minimum distance between detected centers (full resolution)
+        min_radius, max_radius: Radius range searched (full resolution)
+        min_coarse_radius: Smallest radius allowed on the coarse level (limits the level count)
+        max_levels: Maximum number of pyrDown steps
+        max_candidates: Coarse candidates tried before falling back
+    
+    Returns:
+        (x, y, radius) as uint16, or None
+    """
+    h, w = gray.shape[:2]
+    levels = 0
+    while levels < max_levels and min_radius / 2 ** (levels + 1) >= min_coarse_radius:
+        levels += 1
+    if levels == 0:
+        circles = hough_circles(gray, min_dist, min_radius, max_radius)
+        return None if circles is None else tuple(circles[0])
+    
+    pyramid = [gray]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    
+    candidates = _coarse_candidates(pyramid[levels], 2 ** levels, min_dist, min_radius, max_radius)
+    if candidates is None:
+        # One retry on the next finer level; at full resolution it is the 'full' pass
+        levels -= 1
+        if levels == 0:
+            circles = hough_circles(gray, min_dist, min_radius, max_radius)
+            return None if circles is None else tuple(circles[0])
+        candidates = _coarse_candidates(pyramid[levels], 2 ** levels, min_dist, min_radius, max_radius)
+        if candidates is None:
+            return None
+    
+    factor = 2 ** levels
+    # Radius uncertainty of a coarse circle, in full-resolution pixels
+    delta = 2 * factor + 2
+    for cx, cy, cr in candidates[:max_candidates]:
+        x, y, r = cx * factor, cy * factor, cr * factor
+        half = int(r + delta) + 6  # blur border
+        x0, y0 = max(0, int(x) - half), max(0, int(y) - half)
+        x1, y1 = min(w, int(x) + half + 1), min(h, int(y) + half + 1)
+        roi = cv2.GaussianBlur(gray[y0:y1, x0:x1], (9, 9), 2)
+        
+        refined = cv2.HoughCircles(
+            roi,
+            cv2.HOUGH_GRADIENT,
+            dp=1,
+            minDist=max(roi.shape),
+            param1=100,
+            param2=30,
+            minRadius=max(min_radius, int(r - delta)),
+            maxRadius=min(max_radius, int(np.ceil(r + delta))),
+        )
+        if refined is not None:
+            fx, fy, fr = refined[0][0]
+            return tuple(np.uint16(np.around((fx + x0, fy + y0, fr))))
+    
+    # No candidate refined: decide with one full-resolution pass
+    circles = hough_circles(gray, min_dist, min_radius, max_radius)
+    return None if circles is None else tuple(circles[0])
+
+
+def _coarse_candidates(coarse, factor, min_dist, min_radius, max_radius):
+    """Hough candidates on a pyrDown level, in level coordinates, or None"""
+    # pyrDown already low-passes; a light blur matches the full-resolution 9x9 / sigma 2
+    candidates = cv2.HoughCircles(
+        cv2.GaussianBlur(coarse, (5, 5), 2 / factor),
+        cv2.HOUGH_GRADIENT,
+        dp=1,
+        minDist=max(1, min_dist / factor),
+        param1=100,
+        param2=max(10, 30 / factor),
+        minRadius=max(1, int(min_radius / factor)),
+        maxRadius=int(np.ceil(max_radius / factor)),
+    )
+    return None if candidates is None else candidates[0]
+
+
+def hough_circles(gray, min_dist=50, min_radius=20, max_radius=200):
+    """
+    Run Hough Circle Transform on a grayscale image
+    
+    Args:
+        gray: Grayscale image (blurred internally)
+        min_dist: Minimum distance between detected centers
+        min_radius: Smallest radius searched
+        max_radius: Largest radius searched
     
+    Returns:
+        Array of (x, y, radius) rows ordered by accumulator votes, or None
+    """
     gray_blurred = cv2.GaussianBlur(gray, (9, 9), 2)
     
-    # Detect circles using Hough Transform
     circles = cv2.HoughCircles(
         gray_blurred,
         cv2.HOUGH_GRADIENT,
         dp=1,
-        minDist=50,
+        minDist=min_dist,
         param1=100,
         param2=30,
-        minRadius=20,
-        maxRadius=200
+        minRadius=min_radius,
+        maxRadius=max_radius
     )
     
-    segmented = image.copy()
-    circle_info = None
+    if circles is None:
+        return None
+    return np.uint16(np.around(circles))[0]
+
+
+def select_non_overlapping_circles(circles, max_circles=None):
+    """
+    Keep the strongest circles that do not overlap each other
     
-    if circles is not None:
-        circles = np.uint16(np.around(circles))
-        circle = circles[0, 0]
-        x, y, radius = circle[0], circle[1], circle[2]
-        circle_info = (x, y, radius)
-        
-        # Create circular mask
-        mask = np.zeros(gray.shape, dtype=np.uint8)
-        cv2.circle(mask, (x, y), radius, 255, -1)
-        
-        # Apply mask to image
-        if len(image.shape) == 3:
-            segmented = cv2.bitwise_and(image, image, mask=mask)
-        else:
-            segmented = cv2.bitwise_and(image, image, mask=mask)
+    Circles are visited in Hough vote order; a circle is dropped when it
+    overlaps one already kept (center distance < sum of radii).
     
-    return segmented, circle_info, edges
+    Args:
+        circles: Array of (x, y, radius) rows from hough_circles, or None
+        max_circles: Optional limit on the number of circles kept
+    
+    Returns:
+        List of (x, y, radius) tuples
+    """
+    kept = []
+    if circles is None:
+        return kept
+    
+    for x, y, r in circles.astype(np.int64):
+        overlaps = any(
+            (x - kx) ** 2 + (y - ky) ** 2 < (r + kr) ** 2
+            for kx, ky, kr in kept
+        )
+        if not overlaps:
+            kept.append((int(x), int(y), int(r)))
+            if max_circles is not None and len(kept) >= max_circles:
+                break
+    
+    return kept
+
+
+def detect_coins(image, max_circles=None, max_radius=200):
+    """
+    Detect every non-overlapping coin circle in an image
+    
+    Args:
+        image: Input image
+        max_circles: Optional limit on the number of coins returned
+        max_radius: Largest coin radius searched (pixels)
+    
+    Returns:
+        List of (x, y, radius) tuples
+    """
+    gray = ImageGradients(image).gray
+    return select_non_overlapping_circles(
+        hough_circles(gray, max_radius=max_radius), max_circles
+    )
+
+
+def segment_coin(image, circle_info):
+    """
+    Cut one coin's bounding box out of an image and mask it to the circle
+    
+    Only the box is copied and masked, so memory grows with the coin area
+    rather than with the frame size. The box is the one crop_coin_to_circle
+    uses, so resizing the result equals crop_coin_to_circle on a full-frame
+    segmentation.
+    
+    Args:
+        image: Input image
+        circle_info: (x, y, radius) in image coordinates
+    
+    Returns:
+        Masked crop of the coin's bounding box
+    """
+    x, y, radius = circle_info
+    x1, y1, x2, y2 = _circle_bounding_box(image.shape, x, y, radius)
+    roi = image[y1:y2, x1:x2]
+    mask = np.zeros(roi.shape[:2], dtype=np.uint8)
+    cv2.circle(mask, (x - x1, y - y1), radius, 255, -1)
+    return cv2.bitwise_and(roi, roi, mask=mask)
+
+
+def detect_and_segment_coins(image, max_circles=None, max_radius=200):
+    """
+    Detect every coin in an image and segment each one
+    
+    Args:
+        image: Input image
+        max_circles: Optional limit on the number of coins returned
+        max_radius: Largest coin radius searched (pixels)
+    
+    Returns:
+        List of (segmented, circle_info) tuples, one per non-overlapping
+        circle; segmented is the masked bounding box from segment_coin
+    """
+    return [
+        (segment_coin(image, circle_info), circle_info)
+        for circle_info in detect_coins(image, max_circles, max_radius)
+    ]
+
+
+def _circle_bounding_box(shape, x, y, radius):
+    """Circle box plus a 5% margin, clipped to the image: (x1, y1, x2, y2)"""
+    margin = int(radius * 0.05)
+    x1 = max(0, x - radius - margin)
+    y1 = max(0, y - radius - margin)
+    x2 = min(shape[1], x + radius + margin)
+    y2 = min(shape[0], y + radius + margin)
+    return x1, y1, x2, y2
 
 
 def crop_coin_to_circle(image, circle_info, target_size=(512, 512)):
@@ -215,11 +724,7 @@ def crop_coin_to_circle(image, circle_info, target_size=(512, 512)):
     
     # Define bounding box around circle
     # Add small margin (5%) to ensure we capture full circle
-    margin = int(radius * 0.05)
-    x1 = max(0, x - radius - margin)
-    y1 = max(0, y - radius - margin)
-    x2 = min(image.shape[1], x + radius + margin)
-    y2 = min(image.shape[0], y + radius + margin)
+    x1, y1, x2, y2 = _circle_bounding_box(image.shape, x, y, radius)
     
     # Ensure valid crop region (non-empty and has minimum size)
     min_crop_size = 10  # Minimum crop size to avoid too small images
@@ -240,28 +745,36 @@ def crop_coin_to_circle(image, circle_info, target_size=(512, 512)):
     return cropped_resized
 
 
-def extract_coin_features(segmented_image, edges, circle_info):
+def extract_coin_features(segmented_image, edges, circle_info, gradients=None,
+                          compute_circularity=True, percentile_mode=None):
     """
-    Extract comprehensive features from segmented coin (41 features)
+    Extract comprehensive features from segmented coin (35 features)
     
     Args:
         segmented_image: Image after circle segmentation
         edges: Edge detection result
         circle_info: (x, y, radius) from Hough Circle, or None
+        gradients: Optional precomputed ImageGradients of segmented_image
+        compute_circularity: Measure contour circularity; False uses the
+            constant 1.0 the API Random Forest was trained with
+        percentile_mode: 'exact' or 'approx' (default: set_percentile_mode)
     
     Returns:
-        Feature vector (numpy array of 41 features)
+        Feature vector (numpy array of 35 features)
     """
     features = []
     
-    # Convert to grayscale if needed
-    if len(segmented_image.shape) == 3:
-        gray = cv2.cvtColor(segmented_image, cv2.COLOR_BGR2GRAY)
+    if gradients is None:
+        gradients = ImageGradients(segmented_image, use_clahe=False)
+    gray = gradients.gray
+    
+    if (percentile_mode or _default_percentile_mode) == "approx":
+        percentile = histogram_percentiles
     else:
-        gray = segmented_image
+        percentile = np.percentile
     
     # --- 1. TEXTURE FEATURES (12 features) ---
-    edge_density = np.sum(edges > 0) / edges.size
+    edge_density = np.count_nonzero(edges) / edges.size
     features.append(edge_density)
     
     edge_mean = np.mean(edges)
@@ -269,7 +782,11 @@ def extract_coin_features(segmented_image, edges, circle_info):
     edge_max = np.max(edges)
     features.extend([edge_mean, edge_std, edge_max])
     
-    edge_hist, _ = np.histogram(edges.flatten(), bins=8, range=(0, 256))
+    if edges.dtype == np.uint8:
+        # One counting pass; 8 bins of width 32 over 0-255
+        edge_hist = np.bincount(edges.ravel(), minlength=256).reshape(8, 32).sum(axis=1)
+    else:
+        edge_hist, _ = np.histogram(edges.flatten(), bins=8, range=(0, 256))
     edge_hist = edge_hist / (edge_hist.sum() + 1e-6)
     features.extend(edge_hist)
     
@@ -283,45 +800,30 @@ def extract_coin_features(segmented_image, edges, circle_info):
         center_y = y / gray.shape[0]
         features.extend([center_x, center_y])
         
-        mask = np.zeros(gray.shape, dtype=np.uint8)
-        cv2.circle(mask, (x, y), radius, 255, -1)
-        masked_edges = cv2.bitwise_and(edges, edges, mask=mask)
-        
-        contours, _ = cv2.findContours(masked_edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        if len(contours) > 0:
-            largest_contour = max(contours, key=cv2.contourArea)
-            area = cv2.contourArea(largest_contour)
-            perimeter = cv2.arcLength(largest_contour, True)
-            if perimeter > 0:
-                circularity = (4 * np.pi * area) / (perimeter**2 + 1e-6)
-            else:
-                circularity = 0
-            features.append(circularity)
+        if compute_circularity:
+            features.append(_contour_circularity(edges, gray.shape, x, y, radius))
         else:
-            features.append(0)
+            features.append(1.0)
     else:
         features.extend([0, 0, 0, 0])
     
     # --- 3. EDGE PATTERN FEATURES (12 features) ---
-    sobel_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
-    sobel_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
-    
-    magnitude = np.sqrt(sobel_x**2 + sobel_y**2)
-    direction = np.arctan2(sobel_y, sobel_x)
+    magnitude = gradients.magnitude
     
     orientation_hist, _ = np.histogram(
-        direction[magnitude > magnitude.mean()],
+        gradients.directions_above_mean(),
         bins=8,
         range=(-np.pi, np.pi)
     )
     orientation_hist = orientation_hist / (orientation_hist.sum() + 1e-6)
     features.extend(orientation_hist)
     
+    magnitude_p75, magnitude_p90 = percentile(magnitude, [75, 90])
     features.extend([
         np.mean(magnitude),
         np.std(magnitude),
-        np.percentile(magnitude, 75),
-        np.percentile(magnitude, 90)
+        magnitude_p75,
+        magnitude_p90
     ])
     
     # --- 4. SPATIAL FEATURES (4 features) ---
@@ -334,25 +836,45 @@ def extract_coin_features(segmented_image, edges, circle_info):
     ]
     
     for quad in quadrants:
-        quad_density = np.sum(quad > 0) / quad.size if quad.size > 0 else 0
+        quad_density = np.count_nonzero(quad) / quad.size if quad.size > 0 else 0
         features.append(quad_density)
     
     # --- 5. TEXTURE FEATURES (3 features) ---
     kernel_size = 5
-    local_mean = cv2.blur(gray.astype(float), (kernel_size, kernel_size))
-    local_var = cv2.blur((gray.astype(float) - local_mean)**2, (kernel_size, kernel_size))
+    gray_float = gray.astype(gradients.dtype)
+    local_mean = cv2.blur(gray_float, (kernel_size, kernel_size))
+    local_var = cv2.blur((gray_float - local_mean)**2, (kernel_size, kernel_size))
     
     features.extend([
         np.mean(local_var),
         np.std(local_var),
-        np.percentile(local_var, 75)
+        percentile(local_var, [75])[0]
     ])
     
     return np.array(features, dtype=np.float32)
 
 
+def _contour_circularity(edges, shape, x, y, radius):
+    """Circularity (4*pi*area / perimeter^2) of the largest edge contour inside the circle"""
+    mask = np.zeros(shape, dtype=np.uint8)
+    cv2.circle(mask, (x, y), radius, 255, -1)
+    masked_edges = cv2.bitwise_and(edges, edges, mask=mask)
+    
+    contours, _ = cv2.findContours(masked_edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if len(contours) == 0:
+        return 0
+    
+    largest_contour = max(contours, key=cv2.contourArea)
+    area = cv2.contourArea(largest_contour)
+    perimeter = cv2.arcLength(largest_contour, True)
+    if perimeter > 0:
+        return (4 * np.pi * area) / (perimeter**2 + 1e-6)
+    return 0
+
+
 def extract_hybrid_features(segmented_original, segmented_cropped, 
-                           edges_original, edges_cropped, circle_info):
+                           edges_original, edges_cropped, circle_info,
+                           gradients_cropped=None):
     """
     Extract hybrid features from both original segmentation and cropped version
     
@@ -366,9 +888,11 @@ def extract_hybrid_features(segmented_original, segmented_cropped,
         edges_original: Edge detection on original
         edges_cropped: Edge detection on cropped
         circle_info: (x, y, radius) from original image
+        gradients_cropped: Optional ImageGradients of segmented_cropped
+            (e.g. the one edges_cropped was computed from)
     
     Returns:
-        Combined feature vector (82 features total: 41 original + 41 cropped)
+        Combined feature vector (70 features total: 35 original + 35 cropped)
     """
     # Extract features from original (preserves size information)
     features_original = extract_coin_features(
@@ -385,7 +909,7 @@ def extract_hybrid_features(segmented_original, segmented_cropped,
         circle_info_cropped = None
     
     features_cropped = extract_coin_features(
-        segmented_cropped, edges_cropped, circle_info_cropped
+        segmented_cropped, edges_cropped, circle_info_cropped, gradients=gradients_cropped
     )
     
     # Concatenate both feature sets
@@ -0,0 +1,187 @@
+"""
+Post-training quantization of the 8-class CNN with an accuracy/latency report.
+
+Builds TFLite variants of coin_classifier_cnn_8class.keras (dynamic range,
+float16 and full int8 calibrated on training-split edge images, see
+export_cnn.py) and compares each against the current Keras model on every
+image of the held-out test directory (default dataset_splitted/test):
+
+- accuracy per class and overall, and top-1 agreement with Keras
+- model file size
+- single-image latency p50 / p99 (after warmup)
+
+Serve a variant through load_models with:
+    CNN_RUNTIME=tflite CNN_MODEL_FILE=coin_classifier_cnn_8class_int8.tflite
+
+Usage:
+    python quantize_cnn.py
+    python quantize_cnn.py dataset_splitted/test --variants int8 --report quantization_report.json
+    python quantize_cnn.py --skip-export --latency-runs 500
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from api.cnn_runtime import CNN_MODEL_FILES, load_cnn_runtime
+from api.predictor import MODELS_DIR, _cnn_input, get_class_names, preprocess_image
+from cnn_dataset import list_labelled
+from export_cnn import TEST_DIR, TRAIN_DIR, calibration_inputs, default_filename, export_tflite
+
+VARIANTS = ('dynamic', 'float16', 'int8')
+
+
+def held_out_edges(dataset_dir, limit=None):
+    """uint8 edge images and labels of a held-out directory (preprocessed once)"""
+    paths, labels = list_labelled(dataset_dir)
+    paths, labels = paths[:limit], labels[:limit]
+    edges = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            _, final_edge, _ = preprocess_image(f.read(), steps=(), step_format=None)
+        edges.append(final_edge)
+    return edges, np.array(labels)
+
+
+def evaluate(runtime, edges, labels, batch_size=32):
+    """Top-1 predictions of a runtime over edge images"""
+    predictions = []
+    for start in range(0, len(edges), batch_size):
+        batch = np.stack([_cnn_input(edge) for edge in edges[start:start + batch_size]])
+        predictions.append(np.argmax(runtime.predict(batch), axis=1))
+    return np.concatenate(predictions)
+
+
+def measure_latency(runtime, edges, runs=200, warmup=10):
+    """Single-image latency percentiles in milliseconds"""
+    inputs = [_cnn_input(edge)[np.newaxis] for edge in edges[:max(1, min(len(edges), 32))]]
+    for i in range(warmup):
+        runtime.predict(inputs[i % len(inputs)])
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        runtime.predict(inputs[i % len(inputs)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+def per_class_accuracy(predictions, labels, num_classes):
+    """Accuracy per class index (None for classes without images)"""
+    return [
+        float(np.mean(predictions[labels == c] == c)) if np.any(labels == c) else None
+        for c in range(num_classes)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Quantize the CNN and report accuracy, size and latency',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('test_dir', nargs='?', default=TEST_DIR,
+                        help=f'Held-out directory, no training images (default: {TEST_DIR})')
+    parser.add_argument('--calibration', default=TRAIN_DIR,
+                        help=f'Training directory for int8 calibration (default: {TRAIN_DIR})')
+    parser.add_argument('--variants', default=','.join(VARIANTS),
+                        help=f'Comma-separated variants (default: {",".join(VARIANTS)})')
+    parser.add_argument('--model-dir', default=str(MODELS_DIR), help='Model directory')
+    parser.add_argument('--skip-export', action='store_true',
+                        help='Evaluate existing variant files without re-exporting')
+    parser.add_argument('--calibration-size', type=int, default=200,
+                        help='int8 calibration images (default: 200)')
+    parser.add_argument('--limit', type=int, default=None, help='Max held-out images')
+    parser.add_argument('--latency-runs', type=int, default=200,
+                        help='Timed single-image runs per model (default: 200)')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite CPU threads')
+    parser.add_argument('--report', default=None, help='Also save the report as JSON')
+    args = parser.parse_args()
+
+    variants = [v.strip() for v in args.variants.split(',') if v.strip()]
+    directories = [args.test_dir] + ([args.calibration] if 'int8' in variants and not args.skip_export else [])
+    for directory in directories:
+        if not Path(directory).is_dir():
+            parser.error(f'dataset directory not found: {directory}')
+    unknown = set(variants) - set(VARIANTS)
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(sorted(unknown))}")
+
+    model_dir = Path(args.model_dir)
+    keras_path = model_dir / CNN_MODEL_FILES['keras']
+    if not keras_path.exists():
+        print(f"Error: CNN model not found: {keras_path}")
+        sys.exit(1)
+
+    if not args.skip_export:
+        from tensorflow import keras
+
+        model = keras.models.load_model(keras_path)
+        calibration = None
+        if 'int8' in variants:
+            calibration = calibration_inputs(args.calibration, args.calibration_size)
+            print(f"✓ Calibration set: {len(calibration)} training edge images")
+        for variant in variants:
+            export_tflite(model, model_dir / default_filename('tflite', variant), variant, calibration)
+            print(f"✓ Exported {variant}")
+
+    edges, labels = held_out_edges(args.test_dir, args.limit)
+    if not edges:
+        print(f"Error: No labelled images found in {args.test_dir}")
+        sys.exit(1)
+    class_names = get_class_names()
+
+    models = [('keras float32', 'keras', CNN_MODEL_FILES['keras'])]
+    models += [(f'tflite {v}', 'tflite', default_filename('tflite', v)) for v in variants]
+
+    results = []
+    reference = None
+    for name, runtime_name, filename in models:
+        runtime = load_cnn_runtime(model_dir, runtime_name, args.threads, filename)
+        if runtime is None:
+            print(f"✗ {name}: {model_dir / filename} not found")
+            continue
+        predictions = evaluate(runtime, edges, labels)
+        if reference is None:
+            reference = predictions
+        p50, p99 = measure_latency(runtime, edges, args.latency_runs)
+        results.append({
+            'model': name,
+            'file': filename,
+            'size_mb': (model_dir / filename).stat().st_size / 1e6,
+            'accuracy': float(np.mean(predictions == labels)),
+            'agreement': float(np.mean(predictions == reference)),
+            'per_class_accuracy': dict(zip(class_names, per_class_accuracy(predictions, labels, len(class_names)))),
+            'latency_p50_ms': p50,
+            'latency_p99_ms': p99,
+        })
+
+    print("\n" + "=" * 86)
+    print(f"CNN QUANTIZATION REPORT ({len(labels)} held-out images)")
+    print("=" * 86)
+    print(f"{'model':16s} | {'size MB':>8} | {'accuracy':>8} | {'agree':>7} | {'p50 ms':>7} | {'p99 ms':>7}")
+    print("-" * 86)
+    for r in results:
+        print(f"{r['model']:16s} | {r['size_mb']:8.2f} | {r['accuracy'] * 100:7.2f}% | "
+              f"{r['agreement'] * 100:6.2f}% | {r['latency_p50_ms']:7.2f} | {r['latency_p99_ms']:7.2f}")
+
+    print("\nAccuracy per class:")
+    print(f"{'class':24s} | " + " | ".join(f"{r['model']:>14s}" for r in results))
+    print("-" * 86)
+    for name in class_names:
+        cells = []
+        for r in results:
+            acc = r['per_class_accuracy'][name]
+            cells.append(f"{'-':>14s}" if acc is None else f"{acc * 100:13.2f}%")
+        print(f"{name:24s} | " + " | ".join(cells))
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump({'images': len(labels), 'results': results}, f, indent=2)
+        print(f"\n[OK] Report saved: {args.report}")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,26 +7,158 @@ Usage:
     python test_model.py path/to/coin_image.jpg
     python test_model.py path/to/coin_image.jpg --save-steps
     python test_model.py path/to/coin_image.jpg --output result.json
+
+Batch mode (directories, globs or a file list; results stream to JSONL/CSV):
+    python test_model.py dataset_splitted/test --output predictions.jsonl
+    python test_model.py "photos/*.jpg" --output predictions.csv --workers 4
+    python test_model.py --file-list images.txt --output predictions.jsonl
 """
 
 import argparse
+import csv
+import glob
+import os
 import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 import numpy as np
 import cv2
 import pickle
 import json
 import matplotlib.pyplot as plt
+from tqdm import tqdm
 
+from compiled_forest import CompiledForest
+from model_bundle import BundleError, load_bundle
 from preprocessing import (
+    ImageGradients,
     detect_and_segment_coin,
-    extract_coin_features,
     extract_hybrid_features,
     crop_coin_to_circle,
-    apply_sobel_edge,
-    draw_circle_on_image
+    draw_circle_on_image,
+    resize_with_padding
 )
 
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.bmp', '.webp'}
+
+
+def run_hybrid_pipeline(img, image_size=(512, 512)):
+    """
+    Hybrid preprocessing + feature extraction for one image
+    
+    Args:
+        img: BGR image
+        image_size: Model input size
+    
+    Returns:
+        dict with intermediate images, circle_info and the 70 hybrid features
+    """
+    # Resize dengan padding untuk menghindari distorsi
+    img_resized = resize_with_padding(img, image_size)
+    segmented, circle_info, edges = detect_and_segment_coin(img_resized, 'sobel')
+    
+    cropped = crop_coin_to_circle(segmented, circle_info, image_size)
+    gradients_cropped = ImageGradients(cropped)
+    edges_cropped = gradients_cropped.edges
+    
+    features = extract_hybrid_features(
+        segmented, cropped,
+        edges, edges_cropped,
+        circle_info, gradients_cropped=gradients_cropped
+    )
+    return {
+        'resized': img_resized,
+        'segmented': segmented,
+        'edges': edges,
+        'cropped': cropped,
+        'circle_info': circle_info,
+        'features': features,
+    }
+
+
+def extract_features_chunk(paths, image_size=(512, 512)):
+    """
+    Batch worker: hybrid features for a chunk of image paths
+    
+    Returns:
+        List of (path, features or None, circle_info, error) tuples
+    """
+    results = []
+    for path in paths:
+        try:
+            img = cv2.imread(str(path))
+            if img is None:
+                raise ValueError(f"Cannot read image: {path}")
+            out = run_hybrid_pipeline(img, image_size)
+            results.append((path, out['features'], out['circle_info'], None))
+        except Exception as e:
+            results.append((path, None, None, str(e)))
+    return results
+
+
+def expand_inputs(inputs, file_list=None):
+    """
+    Expand files, directories (recursive) and glob patterns into image paths
+    
+    Args:
+        inputs: Paths, directories or glob patterns
+        file_list: Optional text file with one path per line
+    
+    Returns:
+        List of image path strings (duplicates removed, order kept)
+    """
+    entries = list(inputs)
+    if file_list:
+        with open(file_list, encoding='utf-8') as f:
+            entries.extend(line.strip() for line in f if line.strip())
+    
+    paths = []
+    for entry in entries:
+        path = Path(entry)
+        if path.is_dir():
+            paths.extend(sorted(str(p) for p in path.rglob('*') if p.suffix.lower() in IMAGE_EXTENSIONS))
+        elif path.is_file():
+            paths.append(str(path))
+        else:
+            paths.extend(sorted(p for p in glob.glob(entry, recursive=True)
+                                if Path(p).suffix.lower() in IMAGE_EXTENSIONS))
+    return list(dict.fromkeys(paths))
+
+
+class BatchResultWriter:
+    """Stream batch results to a JSONL or CSV file (chosen by extension)"""
+    
+    def __init__(self, output_path, class_names):
+        self.output_path = Path(output_path)
+        self.class_names = class_names
+        self.format = 'csv' if self.output_path.suffix.lower() == '.csv' else 'jsonl'
+        self._file = open(self.output_path, 'w', encoding='utf-8', newline='')
+        self._csv = None
+        if self.format == 'csv':
+            self._csv = csv.writer(self._file)
+            self._csv.writerow(
+                ['path', 'predicted_class', 'confidence', 'circle_detected', 'x', 'y', 'radius', 'error']
+                + [f'prob_{name}' for name in class_names]
+            )
+    
+    def write(self, result):
+        if self._csv is not None:
+            circle = result['circle_info'] or {}
+            probs = result['probabilities'] or {}
+            self._csv.writerow(
+                [result['path'], result['predicted_class'], result['confidence'],
+                 result['circle_detected'], circle.get('x'), circle.get('y'),
+                 circle.get('radius'), result['error']]
+                + [probs.get(name) for name in self.class_names]
+            )
+        else:
+            self._file.write(json.dumps(result, ensure_ascii=False) + '\n')
+        self._file.flush()
+    
+    def close(self):
+        self._file.close()
+
 
 class CoinClassifierTester:
     """Coin classifier tester with hybrid feature extraction"""
@@ -35,43 +167,26 @@ class CoinClassifierTester:
         self.model_dir = Path(model_dir)
         self.IMAGE_SIZE = (512, 512)
         self.class_names = ['Koin Rp 100', 'Koin Rp 1000', 'Koin Rp 200', 'Koin Rp 500']
+        self.bundle_dir = self.model_dir / "random_forest_hybrid_rf"
+        self._forest = None
     
-    def resize_with_padding(self, image, target_size=(512, 512)):
+    def get_forest(self):
         """
-        Resize image dengan padding untuk mempertahankan aspect ratio
-        
-        Args:
-            image: Input image (BGR)
-            target_size: Target size (width, height)
+        Scaler + Random Forest for single-traversal inference, loaded once
         
-        Returns:
-            Resized image with padding (no distortion)
+        Uses the model bundle (see model_bundle.py) when present, otherwise
+        compiles the pickled model and scaler.
         """
-        h, w = image.shape[:2]
-        target_w, target_h = target_size
-        
-        # Hitung scale ratio
-        scale = min(target_w / w, target_h / h)
-        
-        # Ukuran baru setelah scale
-        new_w = int(w * scale)
-        new_h = int(h * scale)
-        
-        # Resize dengan aspect ratio preserved
-        resized = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_AREA)
-        
-        # Buat canvas dengan padding (background hitam)
-        canvas = np.zeros((target_h, target_w, 3), dtype=np.uint8)
-        
-        # Hitung posisi untuk center image
-        x_offset = (target_w - new_w) // 2
-        y_offset = (target_h - new_h) // 2
-        
-        # Paste resized image ke canvas
-        canvas[y_offset:y_offset+new_h, x_offset:x_offset+new_w] = resized
-        
-        return canvas
-        
+        if self._forest is None:
+            if self.bundle_dir.exists():
+                self._forest, _ = load_bundle(
+                    self.bundle_dir, expected_schema={'pipeline': 'hybrid', 'n_features': 70}
+                )
+            else:
+                model, scaler, _ = self.load_model()
+                self._forest = CompiledForest.from_sklearn(model, scaler)
+        return self._forest
+    
     def load_model(self):
         """Load trained hybrid model"""
         model_path = self.model_dir / "random_forest_hybrid_model.pkl"
@@ -107,11 +222,9 @@ class CoinClassifierTester:
         if img is None:
             raise ValueError(f"Cannot read image: {image_path}")
         
-        # Resize dengan padding untuk menghindari distorsi
-        img_resized = self.resize_with_padding(img, self.IMAGE_SIZE)
-        
         # Load model
-        model, scaler, model_name = self.load_model()
+        forest = self.get_forest()
+        model_name = "Random Forest + Hybrid (Original + Cropped)"
         
         if verbose:
             print("="*70)
@@ -121,10 +234,16 @@ class CoinClassifierTester:
             print(f"Model: {model_name}")
             print(f"Size: {self.IMAGE_SIZE}")
         
-        # Step 1: Original segmentation
-        segmented_original, circle_info, edges_original = detect_and_segment_coin(img_resized, 'sobel')
+        # Step 1-3: Resize, segmentation, hybrid feature extraction (Original + Cropped)
+        pipeline = run_hybrid_pipeline(img, self.IMAGE_SIZE)
+        img_resized = pipeline['resized']
+        segmented_original = pipeline['segmented']
+        edges_original = pipeline['edges']
+        circle_info = pipeline['circle_info']
+        cropped = pipeline['cropped']
+        features = pipeline['features']
         
-        # Step 2: Draw circle
+        # Draw circle
         img_with_circle = draw_circle_on_image(img_resized, circle_info)
         
         if circle_info is None:
@@ -134,23 +253,13 @@ class CoinClassifierTester:
                 x, y, r = circle_info
                 print(f"\n[OK] Coin detected: center=({x},{y}), radius={r}px")
         
-        # Step 3: Hybrid Feature Extraction (Original + Cropped)
-        cropped = crop_coin_to_circle(segmented_original, circle_info, self.IMAGE_SIZE)
-        edges_cropped = apply_sobel_edge(cropped)
-        
-        features = extract_hybrid_features(
-            segmented_original, cropped,
-            edges_original, edges_cropped,
-            circle_info
-        )
-        
         if verbose:
             print(f"Features extracted: {len(features)} hybrid features (35 original + 35 cropped)")
         
-        # Step 4: Prediction
-        features_scaled = scaler.transform(features.reshape(1, -1))
-        prediction = model.predict(features_scaled)[0]
-        probabilities = model.predict_proba(features_scaled)[0]
+        # Step 4: Prediction (scaler + forest in one traversal)
+        predictions, probas = forest.predict(features.reshape(1, -1))
+        prediction = predictions[0]
+        probabilities = probas[0]
         
         predicted_class = self.class_names[prediction]
         confidence = probabilities[prediction]
@@ -205,6 +314,82 @@ class CoinClassifierTester:
             'num_features': len(features)
         }
     
+    def predict_batch(self, image_paths, workers=None, chunk_size=16):
+        """
+        Classify many images; yields result dicts as chunks finish
+        
+        Preprocessing and feature extraction run in a process pool over
+        chunks of paths (at most 2 chunks per worker in flight); the Random
+        Forest runs once per chunk on the stacked feature matrix.
+        
+        Args:
+            image_paths: List of image paths
+            workers: Worker processes (default: CPU count, 1 = in-process)
+            chunk_size: Images per work item
+        
+        Yields:
+            dict with path, prediction, probabilities, circle info and error
+        """
+        forest = self.get_forest()
+        workers = workers or os.cpu_count() or 1
+        chunks = [image_paths[i:i + chunk_size] for i in range(0, len(image_paths), chunk_size)]
+        
+        if workers <= 1:
+            for chunk in chunks:
+                yield from self._classify_chunk(extract_features_chunk(chunk, self.IMAGE_SIZE), forest)
+            return
+        
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            queue = iter(chunks)
+            while True:
+                for chunk in queue:
+                    pending.add(executor.submit(extract_features_chunk, chunk, self.IMAGE_SIZE))
+                    if len(pending) >= workers * 2:
+                        break
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from self._classify_chunk(future.result(), forest)
+    
+    def _classify_chunk(self, extracted, forest):
+        """Run the RF on the stacked features of one chunk"""
+        ok = [item for item in extracted if item[1] is not None]
+        if ok:
+            predictions, probabilities = forest.predict(np.stack([item[1] for item in ok]))
+        
+        row = 0
+        for path, features, circle_info, error in extracted:
+            result = {
+                'path': str(path),
+                'predicted_class': None,
+                'predicted_index': None,
+                'confidence': None,
+                'probabilities': None,
+                'circle_detected': circle_info is not None,
+                'circle_info': {
+                    'x': int(circle_info[0]),
+                    'y': int(circle_info[1]),
+                    'radius': int(circle_info[2])
+                } if circle_info else None,
+                'error': error,
+            }
+            if features is not None:
+                prediction = int(predictions[row])
+                proba = probabilities[row]
+                result.update({
+                    'predicted_class': self.class_names[prediction],
+                    'predicted_index': prediction,
+                    'confidence': float(proba[prediction]),
+                    'probabilities': {
+                        self.class_names[i]: float(proba[i])
+                        for i in range(len(self.class_names))
+                    },
+                })
+                row += 1
+            yield result
+    
     def _save_preprocessing_steps_hybrid(self, original, edges, circle_img, segmented, cropped, filename):
         """Save preprocessing steps for hybrid model (includes cropped version)"""
         fig, axes = plt.subplots(2, 3, figsize=(15, 10))
@@ -267,6 +452,44 @@ class CoinClassifierTester:
         print(f"\n[OK] Hybrid preprocessing steps saved: {output_path}")
 
 
+def run_batch(args):
+    """Batch CLI: classify every matched image and stream results to a file"""
+    image_paths = expand_inputs(args.image, args.file_list)
+    if not image_paths:
+        print(f"Error: No images found: {' '.join(args.image)}")
+        sys.exit(1)
+    
+    output_path = Path(args.output or 'predictions.jsonl')
+    tester = CoinClassifierTester(model_dir=args.model_dir)
+    try:
+        tester.get_forest()
+    except (FileNotFoundError, BundleError) as e:
+        print(f"\nError: {e}")
+        print("\nTrain model first using coin-classification.ipynb")
+        sys.exit(1)
+    
+    writer = BatchResultWriter(output_path, tester.class_names)
+    failed = 0
+    start = time.perf_counter()
+    try:
+        with tqdm(total=len(image_paths), unit='img', disable=args.quiet) as progress:
+            for result in tester.predict_batch(image_paths, workers=args.workers,
+                                               chunk_size=args.chunk_size):
+                writer.write(result)
+                failed += result['error'] is not None
+                progress.update(1)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    
+    print(f"\n[OK] {len(image_paths) - failed}/{len(image_paths)} images classified "
+          f"in {elapsed:.1f}s ({len(image_paths) / elapsed:.1f} images/s)")
+    if failed:
+        print(f"[WARNING] {failed} images failed (see 'error' in output)")
+    print(f"[OK] Results saved: {output_path}")
+    sys.exit(0)
+
+
 def main():
     """Main CLI"""
     parser = argparse.ArgumentParser(
@@ -278,23 +501,40 @@ Examples:
   python test_model.py coin.jpg --save-steps              # Save visualization
   python test_model.py coin.jpg --output result.json      # Export to JSON
   python test_model.py coin.jpg --quiet                   # Quiet mode
+
+Batch mode (directories, globs, several files or --file-list):
+  python test_model.py dataset_splitted/test -o predictions.jsonl
+  python test_model.py "photos/*.jpg" -o predictions.csv --workers 4
+  python test_model.py --file-list images.txt -o predictions.jsonl
         """
     )
     
-    parser.add_argument('image', type=str, help='Path to coin image')
+    parser.add_argument('image', type=str, nargs='*',
+                        help='Path to coin image (or directories/globs for batch mode)')
     parser.add_argument('--model-dir', type=str, default='models',
                         help='Model directory (default: models)')
     parser.add_argument('--save-steps', action='store_true',
                         help='Save preprocessing steps visualization')
     parser.add_argument('--output', '-o', type=str, default=None,
-                        help='Save result to JSON file')
+                        help='Save result to JSON file (batch: .jsonl or .csv, default predictions.jsonl)')
     parser.add_argument('--quiet', '-q', action='store_true',
                         help='Quiet mode')
+    parser.add_argument('--file-list', type=str, default=None,
+                        help='Batch mode: text file with one image path per line')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Batch mode: worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=16,
+                        help='Batch mode: images per work item (default: 16)')
     
     args = parser.parse_args()
     
+    if not args.image and not args.file_list:
+        parser.error('an image path, directory, glob or --file-list is required')
+    if args.file_list or len(args.image) > 1 or not Path(args.image[0]).is_file():
+        run_batch(args)
+    
     # Validate image
-    image_path = Path(args.image)
+    image_path = Path(args.image[0])
     if not image_path.exists():
         print(f"Error: Image not found: {image_path}")
         sys.exit(1)
@@ -0,0 +1,56 @@
+"""
+Shared fixtures: repo root on sys.path, synthetic coin images and fake models
+"""
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api import predictor  # noqa: E402
+
+
+class FakeCNN:
+    """CNN stand-in that always predicts class 3"""
+
+    def predict(self, batch, verbose=0):
+        proba = np.zeros((len(batch), 8), dtype=np.float32)
+        proba[:, 3] = 1
+        return proba
+
+
+def coin_image(seed, size=(640, 480)):
+    """BGR image with one noisy coin at a random position"""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    img = (rng.random((h, w, 3)) * 40 + 30).astype(np.uint8)
+    r = int(rng.integers(60, 160))
+    cx, cy = int(rng.integers(r + 5, w - r - 5)), int(rng.integers(r + 5, h - r - 5))
+    cv2.circle(img, (cx, cy), r, (190, 180, 170), -1)
+    cv2.circle(img, (cx, cy), int(r * 0.85), (150, 150, 150), 3)
+    cv2.putText(img, str(rng.choice([100, 500, 1000])), (cx - r // 2, cy + r // 6),
+                cv2.FONT_HERSHEY_SIMPLEX, r / 70, (110, 110, 110), 4)
+    return np.clip(img.astype(int) + rng.normal(0, 8, img.shape), 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(image, quality=80):
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Loaded ModelSet with a fake CNN and a small Random Forest on random features"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+    rng = np.random.default_rng(0)
+    X = rng.random((80, 35))
+    y = np.arange(80) % 8
+    scaler = StandardScaler().fit(X)
+    rf = RandomForestClassifier(10, random_state=0).fit(scaler.transform(X), y)
+    models = predictor.ModelSet("fake", cnn=FakeCNN(), rf_model=rf, rf_scaler=scaler)
+    monkeypatch.setattr(predictor, "_models", models)
+    return models
@@ -0,0 +1,96 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from api.uploads import (
+    MAX_ARCHIVE_ENTRIES,
+    TooManyImagesError,
+    UploadTooLargeError,
+    _ArchiveBudget,
+    extract_archive,
+)
+
+
+def make_zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def make_tar(members, mode="w:gz"):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, data in members:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_extracts_images_in_archive_order(make):
+    data = make([("b.jpg", b"1"), ("notes.txt", b"x"), ("dir/a.PNG", b"22"), (".hidden.jpg", b"3")])
+
+    assert extract_archive(data) == [("b.jpg", b"1"), ("dir/a.PNG", b"22")]
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_member_above_image_limit(make):
+    data = make([("a.jpg", b"x" * 10), ("b.jpg", b"x" * 11)])
+
+    with pytest.raises(UploadTooLargeError):
+        extract_archive(data, _ArchiveBudget(max_image_bytes=10))
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_too_many_images(make):
+    data = make([(f"{i}.jpg", b"x") for i in range(4)])
+
+    with pytest.raises(TooManyImagesError):
+        extract_archive(data, _ArchiveBudget(max_images=3))
+
+
+@pytest.mark.parametrize("make", [make_zip, make_tar])
+def test_too_many_entries(make):
+    data = make([(f"{i}.txt", b"") for i in range(MAX_ARCHIVE_ENTRIES + 1)])
+
+    with pytest.raises(TooManyImagesError):
+        extract_archive(data)
+
+
+def test_total_is_shared_across_archives():
+    budget = _ArchiveBudget(max_total_bytes=15)
+    extract_archive(make_zip([("a.jpg", b"x" * 10)]), budget)
+
+    with pytest.raises(UploadTooLargeError):
+        extract_archive(make_tar([("b.jpg", b"x" * 10)]), budget)
+
+
+def test_non_image_tar_members_count_towards_total():
+    # Highly compressible: tiny upload, but the stream inflates past the filler
+    data = make_tar([("filler.bin", b"\0" * 100_000), ("a.jpg", b"x")])
+
+    assert extract_archive(data, _ArchiveBudget(max_total_bytes=200_000)) == [("a.jpg", b"x")]
+    with pytest.raises(UploadTooLargeError, match="Total archive member size"):
+        extract_archive(data, _ArchiveBudget(max_total_bytes=50_000))
+
+
+def test_member_not_matching_declared_size_is_rejected():
+    data = bytearray(make_zip([("a.jpg", b"x" * 100)]))
+    # Lower the declared uncompressed size in the local and central headers
+    for signature, offset in ((b"PK\x03\x04", 22), (b"PK\x01\x02", 24)):
+        pos = data.find(signature) + offset
+        data[pos:pos + 4] = (5).to_bytes(4, "little")
+
+    # zipfile stops at the declared size, so the CRC check fails
+    with pytest.raises(ValueError, match="corrupt archive"):
+        extract_archive(bytes(data), _ArchiveBudget(max_image_bytes=10))
+
+
+def test_corrupt_archive():
+    with pytest.raises(ValueError, match="Unsupported or corrupt archive"):
+        extract_archive(b"not an archive at all" * 40)
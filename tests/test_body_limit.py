@@ -0,0 +1,63 @@
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from api.uploads import BodySizeLimitMiddleware
+
+
+async def echo_size(request):
+    return JSONResponse({"size": len(await request.body())})
+
+
+def make_client(max_bytes=100, path_limits=None):
+    app = Starlette(routes=[
+        Route("/upload", echo_size, methods=["POST"]),
+        Route("/batch", echo_size, methods=["POST"]),
+    ])
+    app.add_middleware(BodySizeLimitMiddleware, max_bytes=max_bytes, path_limits=path_limits)
+    return TestClient(app)
+
+
+def chunks(count, size):
+    for _ in range(count):
+        yield b"x" * size
+
+
+def test_body_within_limit_passes():
+    response = make_client().post("/upload", content=b"x" * 100)
+
+    assert response.status_code == 200
+    assert response.json() == {"size": 100}
+
+
+def test_declared_length_above_limit_is_rejected():
+    response = make_client().post("/upload", content=b"x" * 101)
+
+    assert response.status_code == 413
+    assert "100 bytes" in response.json()["detail"]
+
+
+def test_streamed_body_is_cut_off_at_limit():
+    # No Content-Length: counted while it streams in
+    response = make_client().post("/upload", content=chunks(5, 30))
+
+    assert response.status_code == 413
+
+
+def test_streamed_body_within_limit_passes():
+    response = make_client().post("/upload", content=chunks(3, 30))
+
+    assert response.json() == {"size": 90}
+
+
+def test_path_limit_overrides_default():
+    client = make_client(path_limits={"/batch": 1000})
+
+    assert client.post("/batch", content=b"x" * 500).status_code == 200
+    assert client.post("/batch", content=b"x" * 1001).status_code == 413
+    assert client.post("/upload", content=b"x" * 500).status_code == 413
+
+
+def test_no_limit_disables_the_check():
+    assert make_client(max_bytes=None).post("/upload", content=b"x" * 10_000).status_code == 200
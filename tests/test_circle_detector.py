@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+
+import preprocessing
+from conftest import coin_image
+
+
+def gray_coin(seed):
+    return cv2.cvtColor(coin_image(seed), cv2.COLOR_BGR2GRAY)
+
+
+def test_pyramid_agrees_with_full_detector():
+    for seed in range(4):
+        gray = gray_coin(seed)
+        full = preprocessing.detect_coin_circle(gray, detector='full')
+        pyramid = preprocessing.detect_coin_circle_pyramid(gray)
+        assert full is not None and pyramid is not None
+        assert np.hypot(int(full[0]) - int(pyramid[0]), int(full[1]) - int(pyramid[1])) <= 4
+        assert abs(int(full[2]) - int(pyramid[2])) <= 4
+
+
+def test_empty_coarse_level_retries_one_level_finer(monkeypatch):
+    coarse_candidates = preprocessing._coarse_candidates
+    factors = []
+
+    def empty_at_quarter_scale(coarse, factor, *args):
+        factors.append(factor)
+        return None if factor == 4 else coarse_candidates(coarse, factor, *args)
+
+    monkeypatch.setattr(preprocessing, '_coarse_candidates', empty_at_quarter_scale)
+    circle = preprocessing.detect_coin_circle_pyramid(gray_coin(0))
+
+    assert factors == [4, 2]
+    assert circle is not None
+
+
+def test_empty_half_scale_falls_back_to_full_pass(monkeypatch):
+    monkeypatch.setattr(preprocessing, '_coarse_candidates', lambda *args: None)
+    gray = gray_coin(1)
+
+    circle = preprocessing.detect_coin_circle_pyramid(gray, max_levels=1)
+
+    assert circle == preprocessing.detect_coin_circle(gray, detector='full')
+
+
+def test_blank_frame_has_no_circle():
+    assert preprocessing.detect_coin_circle_pyramid(np.full((480, 640), 90, np.uint8)) is None
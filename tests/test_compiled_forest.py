@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+
+from compiled_forest import CompiledForest, check_parity
+
+
+def fitted(n_classes=8, n_features=35, max_depth=None, seed=0, labels=None):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(400, n_features)) * rng.uniform(0.1, 50, n_features) + rng.normal(0, 10, n_features)
+    y = (X[:, 0] > 0).astype(int) + 2 * (X[:, 1] > X[:, 2]) + 4 * (X[:, 3] > 0)
+    y = y % n_classes
+    if labels is not None:
+        y = np.asarray(labels)[y]
+    scaler = StandardScaler().fit(X)
+    model = RandomForestClassifier(n_estimators=25, max_depth=max_depth, random_state=seed)
+    model.fit(scaler.transform(X), y)
+    return model, scaler, rng.normal(size=(200, n_features)) * 20
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},
+    {"n_classes": 4, "max_depth": 3},
+    {"n_classes": 2, "seed": 1},
+    {"labels": [f"Koin Rp {v}" for v in (100, 200, 500, 1000, 10, 20, 50, 5)]},
+])
+def test_matches_sklearn_bit_for_bit(kwargs):
+    model, scaler, X = fitted(**kwargs)
+    forest = CompiledForest.from_sklearn(model, scaler)
+
+    labels, proba = forest.predict(X)
+
+    assert np.array_equal(labels, model.predict(scaler.transform(X)))
+    assert np.array_equal(proba, model.predict_proba(scaler.transform(X)))
+    assert check_parity(forest, model, scaler, X)
+
+
+def test_without_scaler():
+    model, scaler, X = fitted()
+    X_scaled = scaler.transform(X)
+    forest = CompiledForest.from_sklearn(model)
+
+    labels, proba = forest.predict(X_scaled)
+
+    assert np.array_equal(labels, model.predict(X_scaled))
+    assert np.array_equal(proba, model.predict_proba(X_scaled))
+
+
+def test_single_feature_vector():
+    model, scaler, X = fitted()
+    forest = CompiledForest.from_sklearn(model, scaler)
+
+    labels, proba = forest.predict(X[0])
+
+    assert labels.shape == (1,) and proba.shape == (1, model.n_classes_)
+    assert np.array_equal(proba, model.predict_proba(scaler.transform(X[:1])))
+
+
+def test_float32_features():
+    model, scaler, X = fitted()
+    X = X.astype(np.float32)
+
+    assert check_parity(CompiledForest.from_sklearn(model, scaler), model, scaler, X)
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from api.inference_pool import InferencePool
+
+
+def sleep_and_return(seconds, value=None):
+    time.sleep(seconds)
+    return value
+
+
+def slow_init():
+    time.sleep(0.2)
+
+
+@pytest.mark.parametrize("kind, ident", [("thread", threading.get_ident), ("process", os.getpid)])
+def test_warm_up_runs_once_in_every_worker(kind, ident):
+    pool = InferencePool(kind=kind, max_workers=3, initializer=slow_init)
+
+    async def warm_up_twice():
+        return [await pool.warm_up(ident) for _ in range(2)]
+
+    try:
+        for results in asyncio.run(warm_up_twice()):
+            assert len(set(results)) == 3
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("kind", ["thread", "process"])
+def test_in_flight_counts_started_jobs(kind):
+    pool = InferencePool(kind=kind, max_workers=2, max_queue=4)
+
+    async def run():
+        await pool.warm_up(int)
+        jobs = [asyncio.create_task(pool.run(sleep_and_return, 0.5)) for _ in range(5)]
+        await asyncio.sleep(0.25)
+        busy = pool.stats()
+        await asyncio.gather(*jobs)
+        return busy, pool.stats()
+
+    try:
+        busy, idle = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert (busy["pending"], busy["in_flight"], busy["queued"]) == (5, 2, 3)
+    assert (idle["pending"], idle["in_flight"], idle["queued"]) == (0, 0, 0)
@@ -0,0 +1,43 @@
+import cv2
+import numpy as np
+
+import preprocessing
+from api.predictor import predict_multi
+from conftest import encode_jpeg
+
+
+def coins_image(circles, size=(1024, 768)):
+    w, h = size
+    rng = np.random.default_rng(0)
+    img = (rng.random((h, w, 3)) * 40 + 30).astype(np.uint8)
+    for x, y, r in circles:
+        cv2.circle(img, (x, y), r, (190, 180, 170), -1)
+        cv2.circle(img, (x, y), int(r * 0.8), (120, 120, 120), 3)
+    return img
+
+
+CIRCLES = [(200, 200, 80), (520, 220, 90), (830, 560, 70), (20, 700, 60)]
+
+
+def test_segment_coin_matches_full_frame_crop():
+    image = coins_image(CIRCLES)
+    for circle in preprocessing.detect_coins(image, max_radius=384):
+        mask = np.zeros(image.shape[:2], dtype=np.uint8)
+        cv2.circle(mask, circle[:2], circle[2], 255, -1)
+        full_frame = cv2.bitwise_and(image, image, mask=mask)
+
+        expected = preprocessing.crop_coin_to_circle(full_frame, circle, (256, 256))
+        segmented = preprocessing.segment_coin(image, circle)
+
+        assert segmented.shape[0] <= 2.2 * circle[2] and segmented.shape[1] <= 2.2 * circle[2]
+        assert np.array_equal(cv2.resize(segmented, (256, 256)), expected)
+
+
+def test_predict_multi_finds_every_coin(fake_models):
+    result = predict_multi(encode_jpeg(coins_image(CIRCLES[:3]), quality=95))
+
+    assert result["coin_count"] == 3
+    found = sorted((c["circle"]["x"], c["circle"]["y"]) for c in result["coins"])
+    for (x, y), (ex, ey, _) in zip(found, sorted(CIRCLES[:3])):
+        assert abs(x - ex) <= 4 and abs(y - ey) <= 4
+    assert all(c["predictions"]["random_forest"]["label"] for c in result["coins"])
@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from api import main
+from api.inference_pool import InferencePool, InferenceTimeoutError, PoolSaturatedError
+from conftest import coin_image, encode_jpeg
+
+
+def wait_for(event):
+    event.wait(5)
+    return "done"
+
+
+def test_full_queue_rejects_with_saturated_error():
+    pool = InferencePool(max_workers=1, max_queue=1, timeout=5, retry_after=7)
+    release = threading.Event()
+
+    async def run():
+        jobs = [asyncio.create_task(pool.run(wait_for, release)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturatedError) as error:
+            await pool.run(wait_for, release)
+        release.set()
+        return error.value, await asyncio.gather(*jobs)
+
+    try:
+        error, results = asyncio.run(run())
+    finally:
+        pool.shutdown()
+
+    assert error.retry_after == 7
+    assert results == ["done", "done"]
+    assert pool.pending == 0
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes():
+    pool = InferencePool(max_workers=1, max_queue=0, timeout=0.1)
+    release = threading.Event()
+
+    async def run():
+        with pytest.raises(InferenceTimeoutError):
+            await pool.run(wait_for, release)
+        # Still running in the worker: the pool stays full
+        with pytest.raises(PoolSaturatedError):
+            await pool.run(wait_for, release)
+        release.set()
+        while pool.pending:
+            await asyncio.sleep(0.01)
+        return await pool.run(str, "free again")
+
+    try:
+        assert asyncio.run(run()) == "free again"
+    finally:
+        pool.shutdown()
+
+
+@pytest.fixture
+def client(fake_models, monkeypatch):
+    monkeypatch.setattr(main.result_cache, "backend", None)
+    return TestClient(main.app)
+
+
+def post_image(client):
+    image = encode_jpeg(coin_image(0))
+    return client.post("/predict", files={"file": ("coin.jpg", image, "image/jpeg")})
+
+
+@pytest.mark.parametrize("error, status", [
+    (PoolSaturatedError(3), 503),
+    (InferenceTimeoutError("Inference timed out after 30s"), 504),
+])
+def test_predict_maps_pool_errors_to_status(client, monkeypatch, error, status):
+    async def failing_run(*_args, **_kwargs):
+        raise error
+
+    monkeypatch.setattr(main.inference_pool, "run", failing_run)
+    response = post_image(client)
+
+    assert response.status_code == status
+    if status == 503:
+        assert response.headers["Retry-After"] == "3"
+
+
+def test_predict_succeeds_through_the_pool(client):
+    response = post_image(client)
+
+    assert response.status_code == 200
+    assert response.json()["circle_detected"]
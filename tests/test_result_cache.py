@@ -0,0 +1,88 @@
+import pytest
+
+import preprocessing
+from api import result_cache as cache_module
+from api.predictor import preprocessing_settings
+from api.result_cache import MemoryBackend, ResultCache, create_backend
+
+
+def predict_key(image_bytes=b"image", version="v1", steps=("edges",)):
+    return ResultCache.make_key(image_bytes, "predict", version, preprocessing_settings(),
+                                list(steps), "JPEG", 85)
+
+
+def test_key_is_stable_for_identical_input():
+    assert predict_key() == predict_key()
+
+
+@pytest.mark.parametrize("change", [
+    {"image_bytes": b"other image"},
+    {"version": "v2"},
+    {"steps": ("edges", "gray")},
+])
+def test_key_changes_with_image_model_and_options(change):
+    assert predict_key(**change) != predict_key()
+
+
+@pytest.mark.parametrize("setter, value", [
+    (preprocessing.set_percentile_mode, "approx"),
+    (preprocessing.set_gradient_precision, "float32"),
+    (preprocessing.set_circle_detector, "pyramid"),
+])
+def test_key_changes_with_preprocessing_settings(setter, value):
+    getter = getattr(preprocessing, setter.__name__.replace("set_", "get_"))
+    previous = getter()
+    default = predict_key()
+    setter(value)
+    try:
+        assert predict_key() != default
+    finally:
+        setter(previous)
+    assert predict_key() == default
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryBackend(max_entries=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+
+    assert (backend.get("a"), backend.get("b"), backend.get("c")) == (1, None, 3)
+    assert len(backend) == 2
+
+
+def test_memory_backend_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    backend = MemoryBackend(ttl=10)
+    backend.set("a", 1)
+
+    now[0] += 9
+    assert backend.get("a") == 1
+    now[0] += 2
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_clear_drops_every_entry():
+    cache = ResultCache(MemoryBackend())
+    cache.set("a", {"label": "x"})
+    cache.clear("new-version")
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disabled_cache_stores_nothing():
+    cache = ResultCache(create_backend("none"))
+    cache.set("a", 1)
+
+    assert not cache.enabled
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        create_backend("disk")
@@ -0,0 +1,56 @@
+import pytest
+
+from api.predictor import predict_frame
+from api.tracking import CoinTracker
+from conftest import coin_image, encode_jpeg
+
+
+def run_frames(frames, tracker=None):
+    tracker = tracker or CoinTracker()
+    results = []
+    for frame in frames:
+        result, tracker = predict_frame(frame, tracker)
+        results.append(result)
+    return results, tracker
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_identical_frames_reuse_prediction(fake_models, seed):
+    frame = encode_jpeg(coin_image(seed))
+    results, tracker = run_frames([frame] * 10)
+
+    assert results[0]["circle_detected"]
+    assert not results[0]["reused"]
+    assert all(result["reused"] for result in results[1:])
+    assert len({tuple(result["circle"]) for result in results}) == 1
+    assert tracker.counts["classified"] == 1
+    assert tracker.counts["reused"] == 9
+
+
+def test_different_coin_is_classified_again(fake_models):
+    results, _ = run_frames([encode_jpeg(coin_image(0))] * 2 + [encode_jpeg(coin_image(1))])
+
+    assert [result["reused"] for result in results] == [False, True, False]
+
+
+def test_reuse_is_limited(fake_models):
+    frame = encode_jpeg(coin_image(0))
+    results, _ = run_frames([frame] * 5, CoinTracker(max_reuse_frames=2))
+
+    assert [result["reused"] for result in results] == [False, True, True, False, True]
+
+
+def test_reset_forgets_prediction(fake_models):
+    frame = encode_jpeg(coin_image(0))
+    _, tracker = run_frames([frame] * 2)
+    tracker.reset()
+    results, _ = run_frames([frame], tracker)
+
+    assert not results[0]["reused"]
+    assert not results[0]["tracked"]
+
+
+def test_jitter_keeps_last_circle():
+    tracker = CoinTracker(jitter_tolerance=2)
+    assert tracker._same_circle((128, 128, 53), (129, 127, 53))
+    assert not tracker._same_circle((128, 128, 53), (132, 128, 53))
@@ -59,7 +59,7 @@ function App() {
       <main className="container mx-auto px-4 py-8 max-w-6xl flex-1 flex flex-col justify-center">
         {/* Step 1: Camera/Upload */}
         {!result && !loading && (
-          <CameraCapture onCapture={handleCapture} loading={loading} />
+          <CameraCapture onCapture={handleCapture} loading={loading} apiUrl={API_URL} />
         )}
 
         {/* Loading State */}
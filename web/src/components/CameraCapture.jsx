@@ -16,11 +16,24 @@ import {
   Fullscreen
 } from 'lucide-react'
 
-function CameraCapture({ onCapture, loading }) {
+// Live predictions: at most one frame in flight, sent every FRAME_INTERVAL_MS
+const FRAME_INTERVAL_MS = 100
+const FRAME_TIMEOUT_MS = 2000
+const MODEL_NAMES = { cnn: 'CNN', random_forest: 'Random Forest' }
+
+// ws(s):// URL of the API camera stream, also for relative API URLs like /api
+const streamUrl = (apiUrl) => {
+  const url = new URL(`${apiUrl}/ws/stream`, window.location.href)
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:'
+  return url.toString()
+}
+
+function CameraCapture({ onCapture, loading, apiUrl }) {
   const [mode, setMode] = useState('upload') // 'upload' or 'camera'
   const [cameraActive, setCameraActive] = useState(false)
   const [cameraState, setCameraState] = useState('idle') // 'idle' | 'requesting' | 'denied' | 'not-supported' | 'active'
   const [stream, setStream] = useState(null)
+  const [liveResult, setLiveResult] = useState(null) // last /ws/stream message
   const videoRef = useRef(null)
   const canvasRef = useRef(null)
   const fileInputRef = useRef(null)
@@ -65,6 +78,7 @@ function CameraCapture({ onCapture, loading }) {
     }
     setCameraActive(false)
     setCameraState('idle')
+    setLiveResult(null)
   }, [stream])
 
   // Cleanup on unmount
@@ -76,6 +90,51 @@ function CameraCapture({ onCapture, loading }) {
     }
   }, [stream])
 
+  // Live predictions over /ws/stream while the camera is on
+  useEffect(() => {
+    if (!cameraActive) return
+
+    const socket = new WebSocket(streamUrl(apiUrl))
+    const frameCanvas = document.createElement('canvas')
+    let sentAt = null // time the frame in flight was sent
+    let timer = null
+
+    const sendFrame = () => {
+      const video = videoRef.current
+      if (socket.readyState !== WebSocket.OPEN || !video?.videoWidth) return
+      if (sentAt !== null && Date.now() - sentAt < FRAME_TIMEOUT_MS) return
+
+      frameCanvas.width = video.videoWidth
+      frameCanvas.height = video.videoHeight
+      frameCanvas.getContext('2d').drawImage(video, 0, 0)
+      sentAt = Date.now()
+      frameCanvas.toBlob((blob) => {
+        if (blob && socket.readyState === WebSocket.OPEN) {
+          socket.send(blob)
+        } else {
+          sentAt = null
+        }
+      }, 'image/jpeg', 0.8)
+    }
+
+    socket.onopen = () => {
+      timer = setInterval(sendFrame, FRAME_INTERVAL_MS)
+    }
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data)
+      if (message.type === 'prediction' || message.type === 'error') {
+        sentAt = null
+        setLiveResult(message)
+      }
+    }
+    socket.onclose = () => clearInterval(timer)
+
+    return () => {
+      clearInterval(timer)
+      socket.close()
+    }
+  }, [cameraActive, apiUrl])
+
   // Capture photo from camera
   const capturePhoto = () => {
     if (!videoRef.current || !canvasRef.current) return
@@ -192,6 +251,30 @@ function CameraCapture({ onCapture, loading }) {
               </div>
             )}
 
+            {/* Live prediction from the camera stream */}
+            {cameraActive && liveResult && (
+              <div className="absolute bottom-0 inset-x-0 bg-black/70 px-4 py-2 text-sm">
+                {liveResult.type === 'error' ? (
+                  <p className="text-red-400">{liveResult.error}</p>
+                ) : !liveResult.circle ? (
+                  <p className="text-gray-300">Koin tidak terdeteksi</p>
+                ) : (
+                  Object.entries(liveResult.predictions).map(([name, prediction]) => (
+                    <div key={name} className="flex justify-between gap-4">
+                      <span className="text-gray-400">{MODEL_NAMES[name] || name}</span>
+                      {prediction.error ? (
+                        <span className="text-red-400">Error</span>
+                      ) : (
+                        <span className="text-green-400 font-semibold">
+                          {prediction.label.replace('Koin ', '')} ({(prediction.confidence * 100).toFixed(1)}%)
+                        </span>
+                      )}
+                    </div>
+                  ))
+                )}
+              </div>
+            )}
+
             {/* Camera state overlays */}
             {mode === 'camera' && !cameraActive && (
               <div className="absolute inset-0 flex items-center justify-center bg-gray-800">